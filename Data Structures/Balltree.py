@@ -1,110 +1,292 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
 
-from .Heaps import N_ary_heap, Infinite_N_ary_heap
+# The directory's name is not a valid package name, so when it is on sys.path rather than imported as a package, Heaps is a top-level module.
+if __package__:
+    from .Heaps import N_ary_heap, Infinite_N_ary_heap
+else:
+    from Heaps import N_ary_heap, Infinite_N_ary_heap
 
 
-class _Balltree_node:
+# The arrays that make up a Balltree, which are placed in shared memory to be built or searched by several processes.
+_TREE_ARRAYS = ('_points', '_indices', '_radii', '_ends', '_left_children', '_right_children')
 
-    def __init__(self, coordinates, split_dimension, point_count=1, parent=None, radius=None, left_child=None, right_child=None):
-        self.coordinates = coordinates
-        self.split_dimension = split_dimension
-        self.parent = parent
-        self.radius = radius
-        self.left_child = left_child
-        self.right_child = right_child
 
-    
-    def attach_left_child(self, left_child):
-        
-        left_child.parent = self
-        self.left_child = left_child
+def _share_arrays(arrays):
+    """
+    Copy each of arrays, a dict of arrays by name, into a new shared memory block. Return the blocks, which must be closed and unlinked once they are no longer needed, 
+    a layout of (block name, shape, dtype) by name from which other processes can attach to them with _attach_arrays, and the shared arrays by name.
+    """
 
-    
-    def attach_right_child(self, right_child):
-        
-        right_child.parent = self
-        self.right_child = right_child
+    blocks = []
+    layout = {}
+    shared_arrays = {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        blocks.append(block)
+        shared_arrays[name] = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+        shared_arrays[name][...] = array
+        layout[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, layout, shared_arrays
 
-    
-    def set_radius(self, radius):
-        
-        self.radius = radius
 
-    
-    def is_leaf(self):
+def _attach_arrays(layout):
+    """Return the arrays in the shared memory blocks in layout by name, along with the blocks, which must be closed once the arrays are deleted."""
+
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in layout.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+    return arrays, blocks
+
+
+def _attach_tree(layout):
+    """Return a Balltree whose arrays are views of the shared memory blocks in layout, along with the blocks, which must be closed once the tree is deleted."""
+
+    arrays, blocks = _attach_arrays(layout)
+    tree = Balltree.__new__(Balltree)
+    for name in _TREE_ARRAYS:
+        setattr(tree, name, arrays[name])
+    tree._shared_state = None
+    return tree, blocks
+
+
+def _release_blocks(blocks, unlink=False):
+    """Close each of blocks, and unlink them too if unlink is True."""
+
+    for block in blocks:
+        block.close()
+        if unlink:
+            block.unlink()
+
+
+def _generate_shared_subtree(layout, start, end, spread_of, leaf_size):
+    """Build the subtree of the points in [start, end) of the Balltree in the shared memory blocks in layout. Run in a worker process."""
+
+    tree, blocks = _attach_tree(layout)
+    tree.generate_Balltree(start, end, spread_of, leaf_size=leaf_size)
+    # The views into the blocks must be released before the blocks can be closed.
+    del tree
+    _release_blocks(blocks)
 
-        return self.left_child is None and self.right_child is None
+
+# The Balltree searched by a query_parallel worker process, and its shared memory blocks, attached once when the worker starts.
+_worker_tree = None
+_worker_blocks = None
+
+
+def _attach_worker_tree(layout):
+    """Attach the Balltree in the shared memory blocks in layout for the lifetime of a query_parallel worker process."""
+
+    global _worker_tree, _worker_blocks
+    _worker_tree, _worker_blocks = _attach_tree(layout)
+
+
+def _query_shared_chunk(query_layout, start, end, k, min_distance):
+    """
+    Search the worker's Balltree for the targets in rows [start, end) of the shared targets in query_layout, 
+    writing the results into the same rows of its shared distances and indices. Run in a query_parallel worker process.
+    """
+
+    arrays, query_blocks = _attach_arrays(query_layout)
+    arrays['distances'][start:end], arrays['indices'][start:end] = _worker_tree.query_batch(arrays['targets'][start:end], k, min_distance)
+    # The views into the blocks must be released before the blocks can be closed.
+    del arrays
+    _release_blocks(query_blocks)
+
+
+def _shut_down_shared_state(executor, blocks):
+    """Shut down the process pool of query_parallel, then close and unlink the shared memory blocks holding the tree."""
+
+    executor.shutdown()
+    _release_blocks(blocks, unlink=True)
 
 
 class Balltree:
-    """A binary tree of _Balltree_node objects to support the k_nearest_neighbors_search method."""
+    """
+    A binary tree of balls over a set of points to support the k_nearest_neighbors_search method.
+
+    The tree is stored in flat arrays rather than as node objects. The points are reordered so that each subtree is a contiguous slice of self._points, 
+    and each node is identified by the position of its pivot point, the first of its slice. The root is node 0. For the node at start:
+        - self._points[start] is the pivot point, the center of the node's ball.
+        - self._indices[start] is the index of the pivot point in the array the tree was built from.
+        - self._radii[start] is the radius of the ball, the greatest distance from the pivot point to a point in the subtree.
+        - self._ends[start] is the end of the subtree's slice, so that the subtree holds the points in self._points[start:self._ends[start]].
+        - self._left_children[start] and self._right_children[start] are the left and right children, or -1 if there is no such child.
+
+    A node without children is a leaf, which holds every point in its slice, up to leaf_size of them. Any other node holds only its pivot point.
+    """
 
-    def __init__(self, array, spread_of=5, median_of=5):
+    # When built in parallel, the top of the tree is split until there are this many subtrees for each process, so that the pool can balance their sizes.
+    _SUBTREES_PER_JOB = 4
+
+    # When searched in parallel, the targets are split into this many chunks for each process. 
+    # query_batch walks the tree once per chunk however many targets it holds, so more chunks only add walks.
+    _CHUNKS_PER_JOB = 1
+
+    def __init__(self, array, spread_of=5, median_of=5, leaf_size=40, n_jobs=1):
         """
-        Recursively constructs a binary tree of _Balltree_node objects whose root node is stored as self.root by making the first call to generate_Balltree.
+        Constructs the arrays of a binary tree over the points in array by calling generate_Balltree on all of them.
         
         Args:
             array (np.ndarray): The array to be made into a balltree. Assumed to be of shape (number of points, number of dimensions for each point).
             spread_of (int, optional): The maximum number of points to check to estimate the spread of a subset of points along a particular dimension. Defaults to 5.
-            median_of (int, optional): The maximum number of points to check to estimate the median of a subset of points along a particular dimension. Defaults to 5.
+            median_of (int, optional): Ignored, since the median is now found exactly. Kept so that existing calls remain valid. Defaults to 5.
+            leaf_size (int, optional): The greatest number of points in a leaf. Subsets of at most leaf_size points are not split further. Defaults to 40.
+            n_jobs (int, optional): The number of processes to build the tree with, or -1 for one per CPU. 
+                If more than 1, the top of the tree is built serially and its subtrees are built by a process pool in shared memory. Defaults to 1.
+
+        Raises:
+            TypeError: Raised if leaf_size is not of type int.
+            ValueError: Raised if leaf_size is not positive.
+            TypeError: Raised if n_jobs is not of type int.
+            ValueError: Raised if n_jobs is neither positive nor -1.
         """
 
-        self.root = self.generate_Balltree(array, spread_of, median_of)
+        # Validate leaf_size.
+        if not isinstance(leaf_size, int):
+            raise TypeError(f"leaf_size must be of type int.\n"
+                            f"type(leaf_size): {type(leaf_size)}.")
+        if leaf_size < 1:
+            raise ValueError(f"leaf_size must be positive.\n"
+                             f"leaf_size: {leaf_size}.")
+
+        # Validate n_jobs.
+        if not isinstance(n_jobs, int):
+            raise TypeError(f"n_jobs must be of type int.\n"
+                            f"type(n_jobs): {type(n_jobs)}.")
+        if n_jobs < 1 and n_jobs != -1:
+            raise ValueError(f"n_jobs must be either positive or -1.\n"
+                             f"n_jobs: {n_jobs}.")
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+
+        # The points are copied once and then reordered in place along with their indices.
+        self._points = np.array(array)
+        n_points = len(self._points)
+
+        self._indices = np.arange(n_points)
+        self._radii = np.empty(n_points)
+        self._ends = np.empty(n_points, np.int64)
+        self._left_children = np.full(n_points, -1, np.int64)
+        self._right_children = np.full(n_points, -1, np.int64)
+
+        # The state kept between calls to query_parallel: the layout of the copy of the arrays in shared memory, 
+        # the number of processes and the process pool attached to it, and the finalizer that releases them.
+        self._shared_state = None
+
+        if n_jobs > 1 and n_points > leaf_size:
+            self._generate_Balltree_parallel(n_jobs, spread_of, leaf_size)
+        else:
+            self.generate_Balltree(0, n_points, spread_of, median_of, leaf_size)
 
 
-    @staticmethod
-    def generate_Balltree(array, spread_of=5, median_of=5):
+    def generate_Balltree(self, start, end, spread_of=5, median_of=5, leaf_size=40):
         """
-        Recursively constructs a Balltree of _Balltree_node objects generated from array and returns the root.
+        Constructs the subtree of the points in self._points[start:end], reordering them and self._indices[start:end] in place, and returns its root, i.e. start.
+        Subsets waiting to be made into subtrees are kept on an explicit stack rather than in recursive calls, so the depth of the tree is not limited by the recursion limit.
+
+        Each subset is split at the exact median of its widest dimension, found with np.argpartition in O(n), 
+        so that the tree is balanced and the whole build takes O(n log n) time.
         
         Args:
-            array (np.ndarray): The array to be made into a balltree. Assumed to be of shape (number of points, number of dimensions for each point).
+            start (int): The position of the subtree's first point among the reordered points.
+            end (int): The position after the subtree's last point among the reordered points.
             spread_of (int, optional): The maximum number of points to check to estimate the spread of a subset of points along a particular dimension. Defaults to 5.
-            median_of (int, optional): The maximum number of points to check to estimate the median of a subset of points along a particular dimension. Defaults to 5.
+            median_of (int, optional): Ignored, since the median is now found exactly. Defaults to 5.
+            leaf_size (int, optional): The greatest number of points in a leaf. Defaults to 40.
         
         Returns:
-            _Balltree_node: The root of the constructed balltree.
+            int: The root of the constructed subtree.
         """
 
-        # Determine pivot, or split point.
+        root = start
+        stack = [(start, end)]
+        while stack:
+            stack.extend(self._make_node(*stack.pop(), spread_of, leaf_size))
 
-        pivot_dimension = Balltree._find_widest_dimension_approx(array, spread_of=spread_of)
-        pivot_value = Balltree._find_median_approx(array, pivot_dimension, median_of=median_of)
-        pivot_column = array[:, pivot_dimension]
-        # TODO: Possible improvement: use the same sample points to find the median as to find the widest dimension.
+        return root
 
-        # Make this_node.
 
-        pivot_points = array[pivot_column == pivot_value]
-        pivot_coordinates = pivot_points[0]
-        this_node = _Balltree_node(pivot_coordinates, pivot_dimension)
+    def _generate_Balltree_parallel(self, n_jobs, spread_of, leaf_size):
+        """
+        Construct the tree with n_jobs processes. The arrays are moved into shared memory, and the top of the tree is split serially, 
+        largest subset first, until there are _SUBTREES_PER_JOB subsets per process. The subtrees of those subsets are then built by a process pool, 
+        each worker writing straight into the shared arrays. Since nodes are identified by position, the subtrees need no stitching, 
+        and the arrays are copied back out of shared memory once every worker has finished.
+        """
 
-        # Partition array into left_array and right_array, reduced by the pivot point.
+        blocks, layout, shared_arrays = _share_arrays({name: getattr(self, name) for name in _TREE_ARRAYS})
+        for name, shared_array in shared_arrays.items():
+            setattr(self, name, shared_array)
+        del shared_arrays
+        try:
+            subsets = [(0, len(self._points))]
+            while subsets and len(subsets) < n_jobs * self._SUBTREES_PER_JOB:
+                subsets.sort(key=lambda subset: subset[1] - subset[0])
+                subsets.extend(self._make_node(*subsets.pop(), spread_of, leaf_size))
 
-        left_array = array[pivot_column <= pivot_value]
-        right_array = array[pivot_column > pivot_value]
-        # Remove the first element of pivot_points from left_array.
-        for index, point in enumerate(left_array):
-            if point[pivot_dimension] == pivot_value:
-                break
-        left_array = np.append(left_array[:index], left_array[index + 1:], axis=0) # Side effect: breaks alias, makes copy.
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                futures = [executor.submit(_generate_shared_subtree, layout, start, end, spread_of, leaf_size) for start, end in subsets]
+                for future in futures:
+                    future.result()
 
-        # Recursively make and attach children, terminating each child if it has size 0.
+        finally:
+            # Copy the arrays out of shared memory, even if a worker failed, so that the views into the blocks are released.
+            for name in _TREE_ARRAYS:
+                setattr(self, name, np.array(getattr(self, name)))
+            _release_blocks(blocks, unlink=True)
 
-        if left_array.size > 0:
-            left_child = Balltree.generate_Balltree(left_array, spread_of, median_of)
-            this_node.attach_left_child(left_child)
 
-        if right_array.size > 0:
-            right_child = Balltree.generate_Balltree(right_array, spread_of, median_of)
-            this_node.attach_right_child(right_child)
+    def _make_node(self, start, end, spread_of, leaf_size):
+        """
+        Make the node of the points in self._points[start:end], reordering them and self._indices[start:end] in place, 
+        and return the (start, end) of each of its children still to be made.
+        """
 
-        # Compute and set radius as the largest distance from the pivot point to another point in array.
-        
-        radius = np.sqrt(max(map(lambda point: np.sum((point - pivot_coordinates)**2), array)))
-        this_node.set_radius(radius)
+        points = self._points[start:end]
+        self._ends[start] = end
+
+        # Make a leaf of a small enough subset, pivoting on the point nearest its centroid to keep the ball small.
+
+        if end - start <= leaf_size:
+            pivot_index = np.argmin(np.sum((points - np.mean(points, axis=0))**2, axis=1))
+            order = np.arange(end - start)
+            order[[0, pivot_index]] = order[[pivot_index, 0]]
+
+        # Otherwise, split the subset at the median along its widest dimension. 
+        # The median becomes the pivot point at start, followed by the points before it and then those after it.
+
+        else:
+            pivot_dimension = Balltree._find_widest_dimension_approx(points, spread_of=spread_of)
+            median_index = (end - start) // 2
+            partition = np.argpartition(points[:, pivot_dimension], median_index)
+            order = np.concatenate((partition[median_index:median_index + 1], partition[:median_index], partition[median_index + 1:]))
 
-        return this_node
+        self._points[start:end] = points[order]
+        self._indices[start:end] = self._indices[start:end][order]
+
+        # Compute and set radius as the largest distance from the pivot point to another point in the subset.
+
+        self._radii[start] = np.sqrt(np.max(np.sum((self._points[start:end] - self._points[start])**2, axis=1)))
+
+        # Return the children, terminating each child if it has size 0. 
+        # The left subtree's slice follows the pivot point, and the right subtree's slice follows the left's.
+
+        children = []
+        if end - start > leaf_size:
+            if median_index > 0:
+                self._left_children[start] = start + 1
+                children.append((start + 1, start + 1 + median_index))
+            if start + 1 + median_index < end:
+                self._right_children[start] = start + 1 + median_index
+                children.append((start + 1 + median_index, end))
+        return children
 
 
     @staticmethod
@@ -112,7 +294,7 @@ class Balltree:
         """Return up to n_indices random indices into the 0th dimension of array."""
         
         try:
-            point_indices = np.random.choice(range(len(array)), n_indices, replace=False)
+            point_indices = np.random.choice(len(array), n_indices, replace=False)
         except ValueError:
             # len(array) < n_indices.
             point_indices = np.arange(len(array))
@@ -134,21 +316,6 @@ class Balltree:
         return np.argmax(np.ptp(array_sample, axis=0))
 
 
-    @staticmethod
-    def _find_median_approx(array, dimension, median_of=5):
-        """
-        Return the median of median_of randomly chosen dimension-th coordinates in array.
-        Always takes the median of an odd number of points.
-        Assumes array's 0th and 1st dimensions correspond to points and dimensions respectively.
-        """
-        
-        point_indices = Balltree._get_sample_indices(array, n_indices=median_of)
-        if point_indices.size % 2 == 0:
-            point_indices = np.random.choice(point_indices, size=point_indices.size - 1, replace=False)
-
-        return np.median(array[point_indices, dimension])
-
-
     @staticmethod
     def _distance(point_x, point_y):
         """Return the quadratic sum of the two coordinates point_x and point_y."""
@@ -160,7 +327,7 @@ class Balltree:
         """
         Create and return a max-first priority queue (search_heap) with capacity k to store all encountered nearest neighbors to target within min_distance.
 
-        Recursively follows the tree starting at self.root by making the first call to _k_nearest_neighbors_recursive. 
+        Follows the tree starting at the root node by calling _k_nearest_neighbors_search_iterative. 
         
         The tree is searched selectively, terminating recursion at nodes whose subtree cannot contain viable neighbors, 
         i.e. neighbors that are within min_distance of target, and that are nearer than those already encountered if k neighbors have already been found.
@@ -173,7 +340,7 @@ class Balltree:
         Raises:
             TypeError: Raised if target has values of types other than float or int.
             ValueError: Raised if target is not 1-dimensional.
-            ValueError: raised if target does not have the same length as the coordinates stored in self.root.
+            ValueError: raised if target does not have the same length as the coordinates of the points in self.
             TypeError: Raised if k is not of type int.
             ValueError: Raised if k is not positive.
             TypeError: Raised if min_distance is neither None nor of type float or int.
@@ -184,16 +351,7 @@ class Balltree:
         """
 
         # Validate inputs.
-        target = np.array(target)
-        if target.dtype not in [float, int]:
-            raise TypeError(f"target must have values of type int or float.\n"
-                            f"target.dtype: {target.dtype}.")
-        if target.ndim != 1:
-            raise ValueError(f"target must be 1-dimensional.\n"
-                             f"target.ndim: {target.ndim}.")
-        if len(target) != len(self.root.coordinates):
-            raise ValueError(f"target must have the same length as the coordinates in self, the Balltree.\n"
-                             f"len(target): {len(taraget)}, len(self.root.coordinates): {len(self.root.coordinates)}.")
+        target = self._validate_target(target)
         if k is not None:
             if not isinstance(k, int):
                 raise TypeError(f"k must of type int or NoneType.\n"
@@ -213,70 +371,473 @@ class Balltree:
         if k is None:
             search_heap = Infinite_N_ary_heap(heap_type='max', satellites=True)
         else:
-            search_heap = N_ary_heap(capacity=k, heap_type='max', satellites=True)
+            search_heap = N_ary_heap(capacity=k, heap_type='max', satellite_dtype=(self._points.dtype, len(target)))
+
+        return self._k_nearest_neighbors_search_iterative(target, search_heap, min_distance)
+
+
+    def _validate_target(self, target):
+        """Validate target as a point of self, raising the errors documented by k_nearest_neighbors_search, and return it as an array."""
+
+        target = np.array(target)
+        if target.dtype not in [float, int]:
+            raise TypeError(f"target must have values of type int or float.\n"
+                            f"target.dtype: {target.dtype}.")
+        if target.ndim != 1:
+            raise ValueError(f"target must be 1-dimensional.\n"
+                             f"target.ndim: {target.ndim}.")
+        if len(target) != self._points.shape[1]:
+            raise ValueError(f"target must have the same length as the coordinates in self, the Balltree.\n"
+                             f"len(target): {len(target)}, number of coordinates: {self._points.shape[1]}.")
 
-        # Call recursive helper function on self.root.
-        return self._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, self.root)
+        return target
 
 
     @staticmethod
-    def _k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node):
+    def _push_leaf(target, search_heap, min_distance, leaf_points):
+        """Push the points in leaf_points that are within min_distance of target, and nearer than the farthest in search_heap if it is full, to search_heap."""
+
+        leaf_distances = np.sqrt(np.sum((leaf_points - target)**2, axis=1))
+        is_viable = np.ones(len(leaf_points), bool) if min_distance is None else leaf_distances <= min_distance
+        if search_heap.is_full():
+            is_viable &= leaf_distances < search_heap.peek()
+        if not np.any(is_viable):
+            return
+
+        if isinstance(search_heap, Infinite_N_ary_heap):
+            # An object satellite array holds each point as a separate satellite.
+            search_heap.push_many(leaf_distances[is_viable], list(leaf_points[is_viable]))
+        else:
+            search_heap.push_many(leaf_distances[is_viable], leaf_points[is_viable])
+
+
+    def _k_nearest_neighbors_search_iterative(self, target, search_heap, min_distance):
         """
-        Recursively add the nearest neighbors to target in the subtree rooted at node to search_heap and return that search_heap.
+        Add the nearest neighbors to target in self to search_heap and return that search_heap.
 
-        Selectively explore the subtree, terminating recursion at nodes whose subtree cannot contain viable neighbors, 
+        Selectively explore the tree, skipping nodes whose subtree cannot contain viable neighbors, 
         i.e. neighbors that are within min_distance of target, and that are nearer than those already encountered if k neighbors have already been found.
+        The nodes still to be explored are kept on a stack along with their distance from target, with the farther child of each node pushed before the nearer one, 
+        so that the nearer ball is explored first, as a recursive search would.
         """
 
-        target_to_node_distance = Balltree._distance(target, node.coordinates)
-
-        # If the ball centered on this node may contain a viable nearest neighbor, 
-        # check the point at this node and recurse on this node's children, 
-        # if they exist, starting with the nearer one.
-
-        # There may be a viable nearest neighbor in the ball centered on this node if: 
-            # this ball overlaps the space within min_distance of target, 
-            # and if either 
-                # the search_heap is not full 
-                # or 
-                # the distance between this ball and target is less than the greatest distance stored in the search_heap.
-
-        if (
-            min_distance is None or target_to_node_distance - node.radius <= min_distance
-            and
-            (
-               not search_heap.is_full() 
-               or 
-               target_to_node_distance - node.radius < search_heap.peek() 
-            )
-        ):
+        stack = [(0, Balltree._distance(target, self._points[0]))]
+        while stack:
+            node, target_to_node_distance = stack.pop()
+            node_radius = self._radii[node]
+            left_child = self._left_children[node]
+            right_child = self._right_children[node]
+
+            # There may be a viable nearest neighbor in the ball centered on this node if: 
+                # this ball overlaps the space within min_distance of target, 
+                # and if either 
+                    # the search_heap is not full 
+                    # or 
+                    # the distance between this ball and target is less than the greatest distance stored in search_heap, 
+                    # which may have fallen since the node was pushed.
+            if min_distance is not None and target_to_node_distance - node_radius > min_distance:
+                continue
+            if search_heap.is_full() and target_to_node_distance - node_radius >= search_heap.peek():
+                continue
+
+            # If node is a leaf, push every point in it within min_distance of target to search_heap at once.
+            if left_child == -1 and right_child == -1:
+                Balltree._push_leaf(target, search_heap, min_distance, self._points[node:self._ends[node]])
+                continue
 
             # If node is within min_distance of target, push it to search_heap.
 
             # Note: if search_heap.is_full() and target_to_node_distance is not less than the greatest distance currently in search_heap, 
             # then it will be discarded.
             if min_distance is None or target_to_node_distance <= min_distance:
-                search_heap.push(target_to_node_distance, node.coordinates)
-
-            # Recurse on both children if they exist, starting with the nearer one.
-
-            # If node has both a left and a right child, recurse on the nearer one and then the further one.
-            if node.left_child is not None and node.right_child is not None:
-                # Calculate the distance to each child.
-                target_to_left_child_distance = Balltree._distance(target, node.left_child.coordinates)
-                target_to_right_child_distance = Balltree._distance(target, node.right_child.coordinates)
-                # Recurse on the nearer child first.
-                if target_to_left_child_distance <= target_to_right_child_distance:
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.left_child)
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.right_child)
-                else:
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.right_child)
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.left_child)
-            # Otherwise, recurse on any extant child, terminating recursion when both children are None.
-            else:
-                if node.left_child is not None:
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.left_child)
-                if node.right_child is not None:
-                    Balltree._k_nearest_neighbors_search_recursive(target, search_heap, min_distance, node.right_child)
+                search_heap.push(target_to_node_distance, self._points[node])
+
+            # Push the extant children with their distances, the farther one first so that the nearer one is explored first.
+            children = [(child, Balltree._distance(target, self._points[child])) for child in (left_child, right_child) if child != -1]
+            if len(children) == 2 and children[0][1] <= children[1][1]:
+                children.reverse()
+            stack.extend(children)
 
         return search_heap
+
+
+    def query_radius(self, target, r, return_distance=False, sort=False):
+        """
+        Return the indices of every point in self within r of target, in the array the tree was built from.
+
+        Unlike k_nearest_neighbors_search with k=None, no heap is used. The hits are gathered from _radius_search, 
+        which takes every point of a ball lying entirely within r of target as one contiguous slice, without visiting the nodes under it.
+
+        Args:
+            target (np.ndarray, seq): The coordinates of the point around which to search.
+            r (float): The greatest distance from target of a point returned.
+            return_distance (bool, optional): Whether to also return the distance from target of each point. Defaults to False.
+            sort (bool, optional): Whether to order the points by increasing distance from target. Defaults to False.
+
+        Raises:
+            TypeError: Raised if target has values of types other than float or int.
+            ValueError: Raised if target is not 1-dimensional.
+            ValueError: raised if target does not have the same length as the coordinates of the points in self.
+            TypeError: Raised if r is not of type float or int.
+            ValueError: Raised if r is negative.
+
+        Returns:
+            np.ndarray, tuple: The indices of the points within r of target, or (indices, distances) if return_distance is True.
+        """
+
+        target = self._validate_radius(target, r)
+
+        positions = []
+        distances = []
+        for hit_positions, hit_distances in self._radius_search(target, r):
+            positions.append(hit_positions)
+            if return_distance or sort:
+                # A ball taken whole has no distances computed yet.
+                if hit_distances is None:
+                    hit_distances = np.sqrt(np.sum((self._points[hit_positions.start:hit_positions.stop] - target)**2, axis=1))
+                distances.append(hit_distances)
+
+        positions = np.concatenate(positions) if positions else np.empty(0, np.int64)
+        distances = np.concatenate(distances) if distances else np.empty(0)
+
+        if sort:
+            order = np.argsort(distances, kind='stable')
+            positions = positions[order]
+            distances = distances[order]
+
+        indices = self._indices[positions]
+        if return_distance:
+            return indices, distances
+        return indices
+
+
+    def count_radius(self, target, r):
+        """
+        Return the number of points in self within r of target.
+
+        A ball lying entirely within r of target is counted by the length of its slice, so neither its nodes nor its points are visited.
+
+        Args:
+            target (np.ndarray, seq): The coordinates of the point around which to count.
+            r (float): The greatest distance from target of a point counted.
+
+        Raises:
+            TypeError: Raised if target has values of types other than float or int.
+            ValueError: Raised if target is not 1-dimensional.
+            ValueError: raised if target does not have the same length as the coordinates of the points in self.
+            TypeError: Raised if r is not of type float or int.
+            ValueError: Raised if r is negative.
+
+        Returns:
+            int: The number of points within r of target.
+        """
+
+        target = self._validate_radius(target, r)
+
+        return sum(len(hit_positions) for hit_positions, _ in self._radius_search(target, r))
+
+
+    def _validate_radius(self, target, r):
+        """Validate the arguments of query_radius and count_radius, raising the errors they document, and return target as an array."""
+
+        target = self._validate_target(target)
+        if not isinstance(r, (float, int)):
+            raise TypeError(f"r must be of type int or float.\n"
+                            f"type(r): {type(r)}.")
+        if r < 0:
+            raise ValueError(f"r must be nonnegative.\n"
+                             f"r: {r}.")
+
+        return target
+
+
+    def _radius_search(self, target, r):
+        """
+        Yield (positions, distances) for each group of points in self within r of target, where positions holds their positions in self._points 
+        and distances is an array of their distances from target. For a ball lying entirely within r, positions is the range of its slice 
+        and distances is None, so that the ball is taken whole without computing them.
+
+        Balls not overlapping the space within r of target are skipped, and the rest are explored with a stack of nodes and their distances from target.
+        """
+
+        stack = [(0, Balltree._distance(target, self._points[0]))]
+        while stack:
+            node, target_to_node_distance = stack.pop()
+            node_radius = self._radii[node]
+
+            # Skip a ball entirely outside r, and take a ball entirely within r whole.
+            if target_to_node_distance - node_radius > r:
+                continue
+            if target_to_node_distance + node_radius <= r:
+                yield range(node, self._ends[node]), None
+                continue
+
+            left_child = self._left_children[node]
+            right_child = self._right_children[node]
+
+            # If node is a leaf, take the points in it within r of target.
+            if left_child == -1 and right_child == -1:
+                leaf_distances = np.sqrt(np.sum((self._points[node:self._ends[node]] - target)**2, axis=1))
+                is_hit = leaf_distances <= r
+                if np.any(is_hit):
+                    yield node + np.flatnonzero(is_hit), leaf_distances[is_hit]
+                continue
+
+            # Otherwise, node holds only its pivot point.
+            if target_to_node_distance <= r:
+                yield np.array([node]), np.array([target_to_node_distance])
+
+            stack.extend((child, Balltree._distance(target, self._points[child])) for child in (left_child, right_child) if child != -1)
+
+
+    def query_batch(self, targets, k, min_distance=None):
+        """
+        Return the k nearest neighbors in self of each of the targets, within min_distance, as dense arrays.
+
+        The targets are searched together, so that the distances from a node to every target still searching it are computed in one vectorized operation. 
+        At each node, the targets are split by which child is nearer to them, and each group descends into its nearer child before its farther one. 
+        Targets therefore travel down the tree in spatially coherent groups, and each sees its nearer ball first as in k_nearest_neighbors_search.
+
+        Args:
+            targets (np.ndarray, seq): The coordinates of the points whose nearest neighbors are returned, of shape (m, number of dimensions).
+            k (int): The number of nearest neighbors to search for.
+            min_distance (float, optional): The minimum distance from a target to consider as a nearest neighbor, or None to provide no upper-limit. Defaults to None.
+
+        Raises:
+            TypeError: Raised if targets has values of types other than float or int.
+            ValueError: Raised if targets is not 2-dimensional.
+            ValueError: Raised if targets does not have the same number of columns as the length of the coordinates of the points in self.
+            TypeError: Raised if k is not of type int.
+            ValueError: Raised if k is not positive.
+            TypeError: Raised if min_distance is neither None nor of type float or int.
+            ValueError: Raised of min_distance is negative.
+
+        Returns:
+            tuple: (distances, indices), arrays of shape (m, k) holding, in ascending order of distance, the distance to each neighbor 
+                and its index in the array the tree was built from. Rows with fewer than k neighbors are padded with np.inf and -1.
+        """
+
+        targets = self._validate_batch(targets, k, min_distance)
+
+        # The k best distances and indices found so far for each target, in no particular order, 
+        # and the greatest of each target's best distances, beyond which nothing can be a viable neighbor.
+        distances = np.full((len(targets), k), np.inf)
+        indices = np.full((len(targets), k), -1, np.int64)
+        bounds = np.full(len(targets), np.inf if min_distance is None else float(min_distance))
+
+        self._query_batch_iterative(targets, min_distance, distances, indices, bounds)
+
+        order = np.argsort(distances, axis=1, kind='stable')
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+
+    def query_parallel(self, targets, k, min_distance=None, n_jobs=-1):
+        """
+        Return the k nearest neighbors in self of each of the targets, within min_distance, as dense arrays, searching with n_jobs processes.
+
+        The first call copies the tree's arrays into shared memory and starts a pool of n_jobs processes, each attaching to the shared tree once. 
+        Both are kept for later calls with the same n_jobs until close is called or the tree is deleted, so a call pays no process start-up. 
+        The targets and the output arrays are placed in shared memory too. The targets are split into _CHUNKS_PER_JOB contiguous chunks per process, 
+        each searched with query_batch by a worker that writes its rows of the output in place, so no tree or result is pickled.
+
+        Args:
+            targets (np.ndarray, seq): The coordinates of the points whose nearest neighbors are returned, of shape (m, number of dimensions).
+            k (int): The number of nearest neighbors to search for.
+            min_distance (float, optional): The minimum distance from a target to consider as a nearest neighbor, or None to provide no upper-limit. Defaults to None.
+            n_jobs (int, optional): The number of processes to search with, or -1 for one per CPU. If 1, query_batch is called directly. Defaults to -1.
+
+        Raises:
+            TypeError: Raised if targets has values of types other than float or int.
+            ValueError: Raised if targets is not 2-dimensional.
+            ValueError: Raised if targets does not have the same number of columns as the length of the coordinates of the points in self.
+            TypeError: Raised if k is not of type int.
+            ValueError: Raised if k is not positive.
+            TypeError: Raised if min_distance is neither None nor of type float or int.
+            ValueError: Raised of min_distance is negative.
+            TypeError: Raised if n_jobs is not of type int.
+            ValueError: Raised if n_jobs is neither positive nor -1.
+
+        Returns:
+            tuple: (distances, indices), as returned by query_batch.
+        """
+
+        targets = self._validate_batch(targets, k, min_distance)
+
+        # Validate n_jobs.
+        if not isinstance(n_jobs, int):
+            raise TypeError(f"n_jobs must be of type int.\n"
+                            f"type(n_jobs): {type(n_jobs)}.")
+        if n_jobs < 1 and n_jobs != -1:
+            raise ValueError(f"n_jobs must be either positive or -1.\n"
+                             f"n_jobs: {n_jobs}.")
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+
+        if n_jobs == 1 or len(targets) < 2:
+            return self.query_batch(targets, k, min_distance)
+
+        executor = self._get_executor(n_jobs)
+
+        query_blocks, query_layout, query_arrays = _share_arrays({
+            'targets': targets, 
+            'distances': np.empty((len(targets), k)), 
+            'indices': np.empty((len(targets), k), np.int64),
+        })
+        try:
+            chunk_bounds = np.linspace(0, len(targets), min(n_jobs * self._CHUNKS_PER_JOB, len(targets)) + 1).astype(int)
+            futures = [executor.submit(_query_shared_chunk, query_layout, start, end, k, min_distance) 
+                       for start, end in zip(chunk_bounds[:-1], chunk_bounds[1:])]
+            for future in futures:
+                future.result()
+            distances = np.array(query_arrays['distances'])
+            indices = np.array(query_arrays['indices'])
+        finally:
+            # The views into the blocks must be released before the blocks can be closed.
+            del query_arrays
+            _release_blocks(query_blocks, unlink=True)
+
+        return distances, indices
+
+
+    def _get_executor(self, n_jobs):
+        """
+        Return the process pool of n_jobs workers attached to the tree in shared memory, 
+        copying the tree into shared memory and starting the pool if there is none yet, or if the pool has a different number of workers.
+        """
+
+        if self._shared_state is not None and self._shared_state[1] != n_jobs:
+            self.close()
+
+        if self._shared_state is None:
+            blocks, layout, _ = _share_arrays({name: getattr(self, name) for name in _TREE_ARRAYS})
+            executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach_worker_tree, initargs=(layout,))
+            # Shut down the pool and unlink the blocks when close is called, the tree is deleted, or the interpreter exits.
+            finalizer = weakref.finalize(self, _shut_down_shared_state, executor, blocks)
+            self._shared_state = (layout, n_jobs, executor, finalizer)
+
+        return self._shared_state[2]
+
+
+    def close(self):
+        """Shut down the process pool of query_parallel and free the shared memory holding the tree. The tree remains usable, and query_parallel starts them again."""
+
+        if self._shared_state is not None:
+            self._shared_state[3]()
+            self._shared_state = None
+
+
+    def __getstate__(self):
+        """Return the attributes to pickle or copy, leaving out the shared memory and process pool of query_parallel, which are released along with this tree alone."""
+
+        state = dict(self.__dict__)
+        state['_shared_state'] = None
+        return state
+
+
+    def _validate_batch(self, targets, k, min_distance):
+        """Validate the arguments of query_batch, raising the errors it documents, and return targets as an array."""
+
+        targets = np.array(targets)
+        if targets.dtype not in [float, int]:
+            raise TypeError(f"targets must have values of type int or float.\n"
+                            f"targets.dtype: {targets.dtype}.")
+        if targets.ndim != 2:
+            raise ValueError(f"targets must be 2-dimensional.\n"
+                             f"targets.ndim: {targets.ndim}.")
+        if targets.shape[1] != self._points.shape[1]:
+            raise ValueError(f"targets must have as many columns as the length of the coordinates in self, the Balltree.\n"
+                             f"targets.shape[1]: {targets.shape[1]}, number of coordinates: {self._points.shape[1]}.")
+        if not isinstance(k, int):
+            raise TypeError(f"k must of type int.\n"
+                            f"type(k): {type(k)}.")
+        if k < 1:
+            raise ValueError(f"k must be positive.\n"
+                            f"k: {k}.")
+        if min_distance is not None:
+            if not isinstance(min_distance, (float, int)):
+                raise TypeError(f"min_distance must be of type int or float.\n"
+                                f"type(min_distance): {type(min_distance)}.")
+            if min_distance < 0:
+                raise ValueError(f"min_distance must be nonnegative.\n"
+                                f"min_distance: {min_distance}.")
+
+        return targets
+
+
+    def _query_batch_iterative(self, targets, min_distance, distances, indices, bounds):
+        """
+        Offer the points in self to every target, updating their rows of distances, indices and bounds in place.
+
+        Each entry of the stack is a node, the indices of the targets to search it for, and their distances to it. 
+        Targets whose bound, the lesser of min_distance and the distance to their farthest neighbor, is less than the distance between them and the node's ball are dropped. 
+        The entries for a node's children are pushed in reverse of the order in which they are to be searched.
+        """
+
+        target_indices = np.arange(len(targets))
+        stack = [(0, target_indices, np.sqrt(np.sum((targets - self._points[0])**2, axis=1)))]
+        while stack:
+            node, target_indices, target_to_node_distances = stack.pop()
+
+            # Drop the targets for which the ball centered on this node cannot contain a viable nearest neighbor.
+            viable = target_to_node_distances - self._radii[node] <= bounds[target_indices]
+            target_indices = target_indices[viable]
+            target_to_node_distances = target_to_node_distances[viable]
+            if target_indices.size == 0:
+                continue
+
+            # If node is a leaf, merge the distances to every point in it into each target's neighbors at once.
+            left_child = self._left_children[node]
+            right_child = self._right_children[node]
+            if left_child == -1 and right_child == -1:
+                self._offer_leaf(targets, target_indices, node, min_distance, distances, indices, bounds)
+                continue
+
+            # Replace each target's farthest neighbor with the point at this node, if it is nearer and within min_distance.
+            farthest_slots = np.argmax(distances[target_indices], axis=1)
+            is_nearer = target_to_node_distances < distances[target_indices, farthest_slots]
+            if min_distance is not None:
+                is_nearer &= target_to_node_distances <= min_distance
+            nearer_target_indices = target_indices[is_nearer]
+            distances[nearer_target_indices, farthest_slots[is_nearer]] = target_to_node_distances[is_nearer]
+            indices[nearer_target_indices, farthest_slots[is_nearer]] = self._indices[node]
+            # Once a target holds k neighbors, its bound is the distance to the farthest of them.
+            bounds[nearer_target_indices] = np.minimum(bounds[nearer_target_indices], np.max(distances[nearer_target_indices], axis=1))
+
+            # Search both children if they exist, each group of targets descending into its nearer child first.
+            target_points = targets[target_indices]
+            children = [child for child in (left_child, right_child) if child != -1]
+            if len(children) == 1:
+                stack.append((children[0], target_indices, np.sqrt(np.sum((target_points - self._points[children[0]])**2, axis=1))))
+                continue
+
+            left_distances = np.sqrt(np.sum((target_points - self._points[left_child])**2, axis=1))
+            right_distances = np.sqrt(np.sum((target_points - self._points[right_child])**2, axis=1))
+            is_left_nearer = left_distances <= right_distances
+            is_right_nearer = ~is_left_nearer
+
+            # Searched in the order: left for the targets nearer to it, right for the targets nearer to it, then each child for the remaining targets.
+            stack.append((left_child, target_indices[is_right_nearer], left_distances[is_right_nearer]))
+            stack.append((right_child, target_indices[is_left_nearer], right_distances[is_left_nearer]))
+            stack.append((right_child, target_indices[is_right_nearer], right_distances[is_right_nearer]))
+            stack.append((left_child, target_indices[is_left_nearer], left_distances[is_left_nearer]))
+
+
+    def _offer_leaf(self, targets, target_indices, node, min_distance, distances, indices, bounds):
+        """
+        Merge the points of the leaf at node into the rows of distances and indices of the targets at target_indices, 
+        keeping the k nearest of each row's current neighbors and the leaf's points within min_distance, and update their bounds.
+        """
+
+        leaf_points = self._points[node:self._ends[node]]
+        leaf_distances = np.sqrt(np.sum((targets[target_indices][:, np.newaxis, :] - leaf_points)**2, axis=2))
+        if min_distance is not None:
+            leaf_distances[leaf_distances > min_distance] = np.inf
+
+        k = distances.shape[1]
+        candidate_distances = np.concatenate((distances[target_indices], leaf_distances), axis=1)
+        leaf_indices = np.where(np.isinf(leaf_distances), -1, self._indices[node:self._ends[node]])
+        candidate_indices = np.concatenate((indices[target_indices], leaf_indices), axis=1)
+        nearest = np.argpartition(candidate_distances, k - 1, axis=1)[:, :k]
+        distances[target_indices] = np.take_along_axis(candidate_distances, nearest, axis=1)
+        indices[target_indices] = np.take_along_axis(candidate_indices, nearest, axis=1)
+        bounds[target_indices] = np.minimum(bounds[target_indices], np.max(distances[target_indices], axis=1))
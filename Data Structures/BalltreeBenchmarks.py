@@ -0,0 +1,258 @@
+"""
+This file contains timing benchmarks for the Balltree in Balltree.py.
+
+Each benchmark prints a table of its measurements and returns them as a list of dictionaries.
+Running this module executes every benchmark with its default arguments.
+"""
+
+from time import perf_counter
+import numpy as np
+
+# The directory's name is not a valid package name, so when this module is run as a script, its neighbours are imported as top-level modules.
+if __package__:
+    from .Balltree import Balltree
+    from .HeapBenchmarks import _time, _print_table
+else:
+    from Balltree import Balltree
+    from HeapBenchmarks import _time, _print_table
+
+
+def _get_depth(tree):
+    """Return the number of nodes on the longest path from the root of tree to a leaf."""
+
+    depth = 0
+    stack = [(0, 1)]
+    while stack:
+        node, node_depth = stack.pop()
+        depth = max(depth, node_depth)
+        stack.extend((int(child), node_depth + 1) for child in (tree._left_children[node], tree._right_children[node]) if child != -1)
+    return depth
+
+
+def benchmark_query_batch(n_points=(10**3, 10**4), n_targets=1000, k=10, n_dimensions=3, seed=0):
+    """
+    Compare query_batch with one call to k_nearest_neighbors_search per target, on uniformly random points and targets.
+
+    Args:
+        n_points (seq, optional): The numbers of points in the trees. Defaults to (1e3, 1e4).
+        n_targets (int, optional): The number of targets queried. Defaults to 1e3.
+        k (int, optional): The number of nearest neighbors to search for. Defaults to 10.
+        n_dimensions (int, optional): The number of dimensions of the points. Defaults to 3.
+        seed (int, optional): The seed for the random points. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each number of points.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in n_points:
+        tree = Balltree(rng.random((size, n_dimensions)))
+        targets = rng.random((n_targets, n_dimensions))
+
+        def search_each():
+            for target in targets:
+                tree.k_nearest_neighbors_search(target, k)
+
+        search_time = _time(search_each)
+        batch_time = _time(tree.query_batch, targets, k)
+
+        rows.append({
+            'points': size,
+            'per-target us/query': 1e6 * search_time / n_targets,
+            'query_batch us/query': 1e6 * batch_time / n_targets,
+            'speedup': search_time / batch_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def _count_nodes(tree):
+    """Return the number of nodes in tree."""
+
+    n_nodes = 0
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        n_nodes += 1
+        stack.extend(int(child) for child in (tree._left_children[node], tree._right_children[node]) if child != -1)
+    return n_nodes
+
+
+def benchmark_leaf_size(n_points=10**4, leaf_sizes=(1, 10, 40, 160), n_targets=1000, k=10, n_dimensions=3, seed=0):
+    """
+    Measure the build time, the number of nodes, and the query times of k_nearest_neighbors_search and query_batch for several leaf sizes.
+
+    Args:
+        n_points (int, optional): The number of points in the trees. Defaults to 1e4.
+        leaf_sizes (seq, optional): The leaf sizes compared. Defaults to (1, 10, 40, 160).
+        n_targets (int, optional): The number of targets queried. Defaults to 1e3.
+        k (int, optional): The number of nearest neighbors to search for. Defaults to 10.
+        n_dimensions (int, optional): The number of dimensions of the points. Defaults to 3.
+        seed (int, optional): The seed for the random points. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each leaf size.
+    """
+
+    rng = np.random.default_rng(seed)
+    points = rng.random((n_points, n_dimensions))
+    targets = rng.random((n_targets, n_dimensions))
+    rows = []
+
+    for leaf_size in leaf_sizes:
+        start = perf_counter()
+        tree = Balltree(points, leaf_size=leaf_size)
+        build_time = perf_counter() - start
+
+        def search_each():
+            for target in targets:
+                tree.k_nearest_neighbors_search(target, k)
+
+        rows.append({
+            'leaf_size': leaf_size,
+            'nodes': _count_nodes(tree),
+            'build s': build_time,
+            'per-target us/query': 1e6 * _time(search_each) / n_targets,
+            'query_batch us/query': 1e6 * _time(tree.query_batch, targets, k) / n_targets,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_build(n_points=(10**5, 10**6, 10**7), leaf_size=40, n_jobs=(1,), n_dimensions=3, seed=0):
+    """
+    Measure the time taken to build a Balltree on uniformly random points with each number of processes, and the depth of the tree built.
+
+    Args:
+        n_points (seq, optional): The numbers of points in the trees. Defaults to 1e5 through 1e7.
+        leaf_size (int, optional): The greatest number of points in a leaf. Defaults to 40.
+        n_jobs (seq, optional): The numbers of processes to build with, as accepted by Balltree. Defaults to (1,).
+        n_dimensions (int, optional): The number of dimensions of the points. Defaults to 3.
+        seed (int, optional): The seed for the random points. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each number of points.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in n_points:
+        points = rng.random((size, n_dimensions))
+
+        for jobs in n_jobs:
+            start = perf_counter()
+            tree = Balltree(points, leaf_size=leaf_size, n_jobs=jobs)
+            build_time = perf_counter() - start
+
+            rows.append({
+                'points': size,
+                'n_jobs': jobs,
+                'build s': build_time,
+                'us/point': 1e6 * build_time / size,
+                'depth': _get_depth(tree),
+            })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_query_parallel(n_points=10**5, n_targets=10**4, k=10, n_jobs=(1, 2, 4), n_dimensions=3, seed=0):
+    """
+    Compare query_parallel with each number of processes to query_batch, on uniformly random points and targets.
+    For each number of processes, a first call to query_parallel, which copies the tree into shared memory and starts the process pool, is made before timing.
+
+    Args:
+        n_points (int, optional): The number of points in the tree. Defaults to 1e5.
+        n_targets (int, optional): The number of targets queried. Defaults to 1e4.
+        k (int, optional): The number of nearest neighbors to search for. Defaults to 10.
+        n_jobs (seq, optional): The numbers of processes to search with, as accepted by query_parallel. Defaults to (1, 2, 4).
+        n_dimensions (int, optional): The number of dimensions of the points. Defaults to 3.
+        seed (int, optional): The seed for the random points. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each number of processes.
+    """
+
+    rng = np.random.default_rng(seed)
+    tree = Balltree(rng.random((n_points, n_dimensions)))
+    targets = rng.random((n_targets, n_dimensions))
+    batch_time = _time(tree.query_batch, targets, k)
+    rows = []
+
+    for jobs in n_jobs:
+        tree.query_parallel(targets[:4 * jobs], k, n_jobs=jobs)
+        parallel_time = _time(tree.query_parallel, targets, k, n_jobs=jobs)
+        rows.append({
+            'n_jobs': jobs,
+            'query_batch us/query': 1e6 * batch_time / n_targets,
+            'query_parallel us/query': 1e6 * parallel_time / n_targets,
+            'speedup': batch_time / parallel_time,
+        })
+
+    tree.close()
+    _print_table(rows)
+    return rows
+
+
+def benchmark_radius(n_points=10**5, radii=(0.01, 0.05, 0.2), n_targets=100, n_dimensions=3, seed=0):
+    """
+    Compare k_nearest_neighbors_search with k=None and min_distance=r to query_radius and count_radius, on uniformly random points and targets.
+
+    Args:
+        n_points (int, optional): The number of points in the tree. Defaults to 1e5.
+        radii (seq, optional): The radii searched. Defaults to (0.01, 0.05, 0.2).
+        n_targets (int, optional): The number of targets queried for each radius. Defaults to 100.
+        n_dimensions (int, optional): The number of dimensions of the points. Defaults to 3.
+        seed (int, optional): The seed for the random points. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each radius.
+    """
+
+    rng = np.random.default_rng(seed)
+    tree = Balltree(rng.random((n_points, n_dimensions)))
+    targets = rng.random((n_targets, n_dimensions))
+    rows = []
+
+    for r in radii:
+        def search_each():
+            for target in targets:
+                tree.k_nearest_neighbors_search(target, None, r)
+
+        def query_each():
+            for target in targets:
+                tree.query_radius(target, r)
+
+        def count_each():
+            for target in targets:
+                tree.count_radius(target, r)
+
+        search_time = _time(search_each)
+        query_time = _time(query_each)
+        count_time = _time(count_each)
+
+        rows.append({
+            'r': r,
+            'mean hits': np.mean([tree.count_radius(target, r) for target in targets]),
+            'search us/query': 1e6 * search_time / n_targets,
+            'query_radius us/query': 1e6 * query_time / n_targets,
+            'count_radius us/query': 1e6 * count_time / n_targets,
+            'query speedup': search_time / query_time,
+            'count speedup': search_time / count_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+if __name__ == "__main__":
+    benchmark_query_batch()
+    benchmark_leaf_size()
+    benchmark_build(n_jobs=(1, -1))
+    benchmark_query_parallel()
+    benchmark_radius()
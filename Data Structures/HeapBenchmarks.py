@@ -0,0 +1,646 @@
+"""
+This file contains timing benchmarks for the heaps in Heaps.py.
+
+Each benchmark prints a table of its measurements and returns them as a list of dictionaries.
+Running this module executes every benchmark with its default arguments.
+"""
+
+from time import perf_counter
+import heapq
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+# The directory's name is not a valid package name, so when this module is run as a script, Heaps is imported as a top-level module.
+if __package__:
+    from .Heaps import N_ary_heap, Infinite_N_ary_heap, Concurrent_N_ary_heap, Persistent_N_ary_heap, CalendarQueue, RadixHeap, Pairing_heap, top_k, merge_sorted
+else:
+    from Heaps import N_ary_heap, Infinite_N_ary_heap, Concurrent_N_ary_heap, Persistent_N_ary_heap, CalendarQueue, RadixHeap, Pairing_heap, top_k, merge_sorted
+
+
+def _time(function, *args, **kwargs):
+    """Return the number of seconds taken to call function(*args, **kwargs)."""
+
+    start = perf_counter()
+    function(*args, **kwargs)
+    return perf_counter() - start
+
+
+def _print_table(rows):
+    """Print a list of dictionaries with identical keys as an aligned table."""
+
+    columns = list(rows[0].keys())
+    widths = [max(len(column), *(len(f"{row[column]:.4g}" if isinstance(row[column], float) else str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        cells = [f"{row[column]:.4g}" if isinstance(row[column], float) else str(row[column]) for column in columns]
+        print('  '.join(cell.rjust(width) for cell, width in zip(cells, widths)))
+
+
+def benchmark_batched_push_pop(sizes=(10**3, 10**4, 10**5, 10**6, 10**7), n_ary=2, satellites=False, seed=0):
+    """
+    Compare the throughput of per-call push and pop with push_many and pop_many on N_ary_heap and Infinite_N_ary_heap.
+
+    Args:
+        sizes (seq, optional): The numbers of elements to push and then pop. Defaults to 1e3 through 1e7.
+        n_ary (int, optional): The branching factor of the heaps. Defaults to 2.
+        satellites (bool, optional): If True, each key is pushed with a satellite. Defaults to False.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each combination of heap class and size.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        keys = rng.random(size)
+        new_satellites = np.arange(size) if satellites else None
+
+        for heap_class in (N_ary_heap, Infinite_N_ary_heap):
+
+            def make_heap():
+                if heap_class is N_ary_heap:
+                    return N_ary_heap(size, n_ary=n_ary, satellites=satellites)
+                return Infinite_N_ary_heap(n_ary=n_ary, satellites=satellites)
+
+            # Per-call.
+            heap = make_heap()
+            if satellites:
+                push_time = _time(lambda: [heap.push(key, satellite) for key, satellite in zip(keys, new_satellites)])
+            else:
+                push_time = _time(lambda: [heap.push(key) for key in keys])
+            pop_time = _time(lambda: [heap.pop() for _ in range(size)])
+
+            # Batched.
+            heap = make_heap()
+            push_many_time = _time(heap.push_many, keys, new_satellites)
+            pop_many_time = _time(heap.pop_many, size)
+
+            rows.append({
+                'heap': heap_class.__name__,
+                'size': size,
+                'push/s': size / push_time,
+                'push_many/s': size / push_many_time,
+                'pop/s': size / pop_time,
+                'pop_many/s': size / pop_many_time,
+            })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_top_k(size=10**7, ks=(10, 100, 1000, 10000), chunk_size=4096, seed=0):
+    """
+    Compare top_k with heapq.nsmallest when selecting the k smallest values of a generator.
+
+    Args:
+        size (int, optional): The number of values generated. Defaults to 1e7.
+        ks (seq, optional): The numbers of values to select. Defaults to 10 through 1e4.
+        chunk_size (int, optional): The chunk size passed to top_k. Defaults to 4096.
+        seed (int, optional): The seed for the random values. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each k.
+    """
+
+    values = np.random.default_rng(seed).random(size)
+    rows = []
+
+    for k in ks:
+        top_k_time = _time(top_k, (value for value in values), k, chunk_size=chunk_size)
+        heapq_time = _time(heapq.nsmallest, k, (value for value in values))
+
+        rows.append({
+            'size': size,
+            'k': k,
+            'top_k (s)': top_k_time,
+            'heapq.nsmallest (s)': heapq_time,
+            'speedup': heapq_time / top_k_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_concurrent_push(thread_counts=(1, 2, 4, 8), pushes_per_thread=10**5, buffer_size=256, n_ary=2, jit=False, seed=0):
+    """
+    Compare Concurrent_N_ary_heap with an N_ary_heap guarded by a single global lock, 
+    with several producer threads pushing while one consumer thread pops.
+    Push throughput is measured until the last producer finishes, and total throughput until the consumer has popped every value.
+
+    Args:
+        thread_counts (seq, optional): The numbers of producer threads. Defaults to 1 through 8.
+        pushes_per_thread (int, optional): The number of keys pushed by each producer. Defaults to 1e5.
+        buffer_size (int, optional): The buffer size of the Concurrent_N_ary_heap. Defaults to 256.
+        n_ary (int, optional): The branching factor of the heaps. Defaults to 2.
+        jit (bool, optional): Whether both heaps sift with numba kernels. Defaults to False.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each number of producer threads.
+    """
+
+    rows = []
+
+    for n_threads in thread_counts:
+        keys = np.random.default_rng(seed).random((n_threads, pushes_per_thread))
+        capacity = n_threads * pushes_per_thread
+
+        def run(push, pop):
+            # Producers push every key while the consumer pops until every key has been popped.
+            producers = [threading.Thread(target=lambda thread_keys=thread_keys: [push(key) for key in thread_keys]) for thread_keys in keys]
+            consumer = threading.Thread(target=_drain, args=(pop, capacity))
+            start = perf_counter()
+            for thread in producers + [consumer]:
+                thread.start()
+            for thread in producers:
+                thread.join()
+            push_time = perf_counter() - start
+            consumer.join()
+            return push_time, perf_counter() - start
+
+        # Global lock.
+        heap = N_ary_heap(capacity, n_ary=n_ary, jit=jit)
+        lock = threading.Lock()
+        def locked_push(key):
+            with lock:
+                heap.push(key)
+        def locked_pop():
+            with lock:
+                return heap.pop()
+        locked_push_time, locked_time = run(locked_push, locked_pop)
+
+        # Per-thread buffers.
+        concurrent_heap = Concurrent_N_ary_heap(capacity, n_ary=n_ary, buffer_size=buffer_size, jit=jit)
+        concurrent_push_time, concurrent_time = run(concurrent_heap.push, concurrent_heap.pop)
+
+        rows.append({
+            'threads': n_threads,
+            'values': capacity,
+            'global lock push/s': capacity / locked_push_time,
+            'buffered push/s': capacity / concurrent_push_time,
+            'global lock total/s': capacity / locked_time,
+            'buffered total/s': capacity / concurrent_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_merge_sorted(run_counts=(2, 8, 32, 128, 512, 1024), total_size=10**6, n_arys=(2, 4, 8), block_size=4096, seed=0):
+    """
+    Compare merge_sorted with heapq.merge when merging sorted runs of random floats of equal length.
+    merge_sorted is given the runs as np.ndarrays and heapq.merge is given them as lists.
+
+    Args:
+        run_counts (seq, optional): The numbers of runs to merge. Defaults to 2 through 1024.
+        total_size (int, optional): The total number of values across all runs. Defaults to 1e6.
+        n_arys (seq, optional): The branching factors used by merge_sorted. Defaults to 2, 4 and 8.
+        block_size (int, optional): The block size passed to merge_sorted. Defaults to 4096.
+        seed (int, optional): The seed for the random values. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each number of runs.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for n_runs in run_counts:
+        runs = np.sort(rng.random((n_runs, total_size // n_runs)), axis=1)
+        run_lists = runs.tolist()
+
+        row = {'runs': n_runs, 'values': runs.size, 'heapq.merge (s)': _time(lambda: sum(1 for _ in heapq.merge(*run_lists)))}
+        for n_ary in n_arys:
+            row[f'n_ary={n_ary} (s)'] = _time(lambda: sum(1 for _ in merge_sorted(runs, n_ary=n_ary, block_size=block_size)))
+        rows.append(row)
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_n_ary_sweep(n_arys=(2, 4, 8, 16), sizes=(10**3, 10**4, 10**5, 10**6, 10**7, 10**8), dtypes=(float, np.int64), 
+                          mixes=('push', 'pop', 'replace', 'push_pop'), n_operations=10**4, jit=False, profile_path=None, seed=0):
+    """
+    Measure the time per operation of N_ary_heap for every combination of branching factor, size, dtype and operation mix.
+
+    Each measurement starts from a heap of the given size, built from sorted keys since a sorted array is a valid heap, 
+    and times n_operations operations of the mix: 'push' pushes, 'pop' pops, 'replace' replaces the root, 
+    and 'push_pop' alternates pushes and pops. The size therefore stays within n_operations of the nominal size.
+
+    Args:
+        n_arys (seq, optional): The branching factors to measure. Defaults to 2, 4, 8 and 16.
+        sizes (seq, optional): The sizes of heap to measure. Defaults to 1e3 through 1e8.
+        dtypes (seq, optional): The dtypes of heap to measure. Defaults to float and np.int64.
+        mixes (seq, optional): The operation mixes to measure, any of 'push', 'pop', 'replace' and 'push_pop'. Defaults to all four.
+        n_operations (int, optional): The number of operations timed for each measurement. Defaults to 1e4.
+        jit (bool, optional): If True, the heaps sift with the compiled kernels. Defaults to False.
+        profile_path (str, NoneType, optional): If provided, the measurements are also written to this path as a profile for n_ary='auto'. 
+            Pass N_ARY_PROFILE_PATH to replace the default profile. Defaults to None.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each combination of dtype, size, mix and branching factor.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for dtype in dtypes:
+        for size in sizes:
+            if np.dtype(dtype).kind == 'f':
+                keys = np.sort(rng.random(size)).astype(dtype)
+                new_keys = rng.random(n_operations).astype(dtype)
+            else:
+                keys = np.sort(rng.integers(0, 2**31, size)).astype(dtype)
+                new_keys = rng.integers(0, 2**31, n_operations).astype(dtype)
+
+            for mix in mixes:
+                for n_ary in n_arys:
+                    # Fill the heap directly, since heapify would dominate the time for the largest sizes.
+                    heap = N_ary_heap(size + n_operations, dtype=dtype, n_ary=n_ary, jit=jit)
+                    heap._key_array[:size] = keys
+                    heap._size = size
+
+                    if mix == 'push':
+                        operations = lambda: [heap.push(key) for key in new_keys]
+                    elif mix == 'pop':
+                        operations = lambda: [heap.pop() for _ in range(n_operations)]
+                    elif mix == 'replace':
+                        operations = lambda: [heap.replace(key) for key in new_keys]
+                    elif mix == 'push_pop':
+                        operations = lambda: [heap.push(key) if index % 2 == 0 else heap.pop() for index, key in enumerate(new_keys)]
+                    else:
+                        raise ValueError(f"mix must be 'push', 'pop', 'replace' or 'push_pop'.\n"
+                                         f"mix: {mix}.")
+
+                    rows.append({
+                        'dtype': np.dtype(dtype).name,
+                        'size': size,
+                        'mix': mix,
+                        'n_ary': n_ary,
+                        'jit': bool(jit),
+                        'us/op': 1e6 * _time(operations) / n_operations,
+                    })
+
+    _print_table(rows)
+    if profile_path is not None:
+        with open(profile_path, 'w') as profile_file:
+            json.dump(rows, profile_file, indent=1)
+    return rows
+
+
+def benchmark_persistent_push_pop(sizes=(10**3, 10**4, 10**5, 10**6), n_ary=2, jit=False, directory=None, seed=0):
+    """
+    Compare the push and pop throughput of Persistent_N_ary_heap with N_ary_heap, and time flushing, closing and reopening the file.
+
+    Args:
+        sizes (seq, optional): The numbers of elements to push and then pop. Defaults to 1e3 through 1e6.
+        n_ary (int, optional): The branching factor of the heaps. Defaults to 2.
+        jit (bool, optional): If True, the heaps sift with the compiled kernels. Defaults to False.
+        directory (str, NoneType, optional): The directory for the heap files. If None, a temporary directory is used. Defaults to None.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each size.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    with tempfile.TemporaryDirectory(dir=directory) as heap_directory:
+        path = os.path.join(heap_directory, 'heap.bin')
+
+        for size in sizes:
+            keys = rng.random(size)
+
+            heap = N_ary_heap(size, n_ary=n_ary, jit=jit)
+            push_time = _time(lambda: [heap.push(key) for key in keys])
+            pop_time = _time(lambda: [heap.pop() for _ in range(size)])
+
+            persistent_heap = Persistent_N_ary_heap(path, size, n_ary=n_ary, jit=jit)
+            persistent_push_time = _time(lambda: [persistent_heap.push(key) for key in keys])
+            flush_time = _time(persistent_heap.flush)
+            close_time = _time(persistent_heap.close)
+            open_time = _time(lambda: Persistent_N_ary_heap.open(path, jit=jit))
+            persistent_heap = Persistent_N_ary_heap.open(path, jit=jit)
+            persistent_pop_time = _time(lambda: [persistent_heap.pop() for _ in range(size)])
+            persistent_heap.close()
+
+            rows.append({
+                'size': size,
+                'push/s': size / push_time,
+                'persistent push/s': size / persistent_push_time,
+                'pop/s': size / pop_time,
+                'persistent pop/s': size / persistent_pop_time,
+                'flush (s)': flush_time,
+                'close (s)': close_time,
+                'open (s)': open_time,
+            })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_heapify(sizes=(10**5, 10**6, 10**7, 10**8), n_ary=2, seed=0):
+    """
+    Time N_ary_heap.heapify with and without copying the input, against heapq.heapify on a list of the same keys.
+    heapq is skipped above 1e7 keys, where the list alone would take several gigabytes.
+
+    Args:
+        sizes (seq, optional): The numbers of keys to heapify. Defaults to 1e5 through 1e8.
+        n_ary (int, optional): The branching factor of the heaps. Defaults to 2.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each size.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        keys = rng.random(size)
+
+        copy_time = _time(N_ary_heap.heapify, keys, n_ary=n_ary)
+        no_copy_time = _time(N_ary_heap.heapify, np.copy(keys), n_ary=n_ary, copy=False)
+        heapq_time = float('nan')
+        if size <= 10**7:
+            key_list = keys.tolist()
+            heapq_time = _time(heapq.heapify, key_list)
+
+        rows.append({
+            'size': size,
+            'heapify (s)': copy_time,
+            'heapify copy=False (s)': no_copy_time,
+            'heapq.heapify (s)': heapq_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_calendar_queue(sizes=(10**3, 10**4, 10**5, 10**6), n_operations=10**5, far_fraction=0.01, n_ary=4, seed=0):
+    """
+    Compare CalendarQueue with N_ary_heap on the hold model of a timer workload: 
+    with size timers pending, each operation pops the earliest timer and schedules a new one a random delay after it.
+    Delays are exponential with a mean of size, so that timers stay about one time unit apart, 
+    except that a far_fraction of them are a thousand times longer and end up in the spill heap.
+
+    Args:
+        sizes (seq, optional): The numbers of pending timers. Defaults to 1e3 through 1e6.
+        n_operations (int, optional): The number of hold operations timed for each size. Defaults to 1e5.
+        far_fraction (float, optional): The fraction of delays that are far in the future. Defaults to 0.01.
+        n_ary (int, optional): The branching factor of the N_ary_heap. Defaults to 4.
+        seed (int, optional): The seed for the random delays. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each size.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        initial_keys = rng.uniform(0, size, size)
+        delays = rng.exponential(size, n_operations)
+        delays[rng.random(n_operations) < far_fraction] *= 1000
+        delays = delays.tolist()
+
+        def hold(queue):
+            for delay in delays:
+                queue.push(queue.pop() + delay)
+
+        heap = N_ary_heap.heapify(initial_keys, capacity=size + 1, n_ary=n_ary)
+        heap_time = _time(hold, heap)
+
+        calendar_queue = CalendarQueue()
+        for key in initial_keys.tolist():
+            calendar_queue.push(key)
+        calendar_time = _time(hold, calendar_queue)
+
+        rows.append({
+            'size': size,
+            'N_ary_heap us/op': 1e6 * heap_time / n_operations,
+            'CalendarQueue us/op': 1e6 * calendar_time / n_operations,
+            'speedup': heap_time / calendar_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def _random_adjacency_map(n_vertices, mean_degree, max_weight, rng):
+    """Return a random directed adjacencyMap, in the form used by Graph objects, with integer weights from 1 to max_weight."""
+
+    n_edges = n_vertices * mean_degree
+    sources = rng.integers(0, n_vertices, n_edges).tolist()
+    targets = rng.integers(0, n_vertices, n_edges).tolist()
+    weights = rng.integers(1, max_weight + 1, n_edges).tolist()
+    adjacency_map = {key: set() for key in range(n_vertices)}
+    for source, target, weight in zip(sources, targets, weights):
+        adjacency_map[source].add((target, weight))
+    return adjacency_map
+
+
+def _record_shortest_path_trace(adjacency_map, source):
+    """
+    Run Dijkstra's algorithm with lazy deletion from source, 
+    and return the queue operations it makes, (distance, key) for a push and None for a pop, with the largest number of pending keys.
+    """
+
+    distances = {source: 0}
+    queue = [(0, source)]
+    trace = [(0, source)]
+    max_size = 1
+    while queue:
+        distance, key = heapq.heappop(queue)
+        trace.append(None)
+        if distance > distances[key]:
+            continue
+        for adjacent_key, weight in adjacency_map[key]:
+            new_distance = distance + weight
+            if new_distance < distances.get(adjacent_key, new_distance + 1):
+                distances[adjacent_key] = new_distance
+                heapq.heappush(queue, (new_distance, adjacent_key))
+                trace.append((new_distance, adjacent_key))
+                max_size = max(max_size, len(queue))
+    return trace, max_size
+
+
+def benchmark_radix_heap(n_vertices=(10**3, 10**4, 10**5, 10**6), mean_degree=8, max_weights=(10, 10**4), n_ary=4, graph=None, seed=0):
+    """
+    Compare RadixHeap with N_ary_heap(dtype=int) by replaying the push and pop operations of Dijkstra's algorithm on random graphs with integer weights.
+    Replaying a recorded trace times only the queues, and gives every queue the same operations.
+
+    Args:
+        n_vertices (seq, optional): The numbers of vertices in the random graphs. Defaults to 1e3 through 1e6.
+        mean_degree (int, optional): The mean number of edges leaving each vertex. Defaults to 8.
+        max_weights (seq, optional): The largest edge weights, drawn uniformly from 1. Defaults to (10, 1e4).
+        n_ary (int, optional): The branching factor of the N_ary_heap. Defaults to 4.
+        graph (Graph, optional): If provided, its adjacencyMap is used from its smallest key instead of the random graphs. Defaults to None.
+        seed (int, optional): The seed for the random graphs. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each graph.
+    """
+
+    rng = np.random.default_rng(seed)
+    if graph is not None:
+        graphs = [(len(graph.adjacencyMap), None, graph.adjacencyMap)]
+    else:
+        graphs = [(size, max_weight, _random_adjacency_map(size, mean_degree, max_weight, rng)) for size in n_vertices for max_weight in max_weights]
+    rows = []
+
+    for size, max_weight, adjacency_map in graphs:
+        trace, max_size = _record_shortest_path_trace(adjacency_map, min(adjacency_map))
+
+        def replay(queue):
+            for operation in trace:
+                if operation is None:
+                    queue.pop(get_satellite=True)
+                else:
+                    queue.push(*operation)
+
+        heap_time = _time(replay, N_ary_heap(max_size, dtype=int, n_ary=n_ary, satellites=True))
+        radix_time = _time(replay, RadixHeap(satellites=True))
+
+        rows.append({
+            'vertices': size,
+            'max weight': max_weight,
+            'operations': len(trace),
+            'N_ary_heap us/op': 1e6 * heap_time / len(trace),
+            'RadixHeap us/op': 1e6 * radix_time / len(trace),
+            'speedup': heap_time / radix_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_meld(shard_counts=(2, 8, 32, 128), shard_size=10**4, n_ary=2, jit=False, seed=0):
+    """
+    Compare merging the partial heaps of several shards into one: Pairing_heap.meld on heaps sharing a node pool, 
+    pushing every key of the other shards into the first N_ary_heap, and N_ary_heap.heapify on the concatenated keys.
+    Each merged heap is then drained, to show what the O(1) meld costs the pops that follow.
+
+    Args:
+        shard_counts (seq, optional): The numbers of shards merged. Defaults to (2, 8, 32, 128).
+        shard_size (int, optional): The number of keys in each shard. Defaults to 1e4.
+        n_ary (int, optional): The branching factor of the N_ary_heaps. Defaults to 2.
+        jit (bool, optional): Whether the heaps use their numba-compiled kernels. Defaults to False.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each shard count.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for n_shards in shard_counts:
+        shard_keys = [rng.random(shard_size) for _ in range(n_shards)]
+        total_size = n_shards * shard_size
+
+        pairing_heaps = [Pairing_heap(initial_capacity=total_size, jit=jit)]
+        pairing_heaps += [Pairing_heap(share_pool_with=pairing_heaps[0], jit=jit) for _ in range(n_shards - 1)]
+        for heap, keys in zip(pairing_heaps, shard_keys):
+            for key in keys.tolist():
+                heap.push(key)
+
+        def meld_all(heaps):
+            for heap in heaps[1:]:
+                heaps[0].meld(heap)
+
+        meld_time = _time(meld_all, pairing_heaps)
+        meld_drain_time = _time(_drain, pairing_heaps[0].pop, total_size)
+
+        heaps = [N_ary_heap(total_size, n_ary=n_ary, jit=jit)] + [N_ary_heap.heapify(keys, n_ary=n_ary, jit=jit) for keys in shard_keys[1:]]
+        heaps[0].push_many(shard_keys[0])
+
+        def push_all(heaps):
+            for heap in heaps[1:]:
+                for key in heap.get_keys().tolist():
+                    heaps[0].push(key)
+
+        push_time = _time(push_all, heaps)
+        heapify_time = _time(lambda: N_ary_heap.heapify(np.concatenate([heap.get_keys() for heap in heaps[1:]] + [shard_keys[0]]), n_ary=n_ary, jit=jit))
+        heap_drain_time = _time(_drain, heaps[0].pop, total_size)
+
+        rows.append({
+            'shards': n_shards,
+            'meld s': meld_time,
+            'push all s': push_time,
+            'heapify s': heapify_time,
+            'Pairing_heap drain s': meld_drain_time,
+            'N_ary_heap drain s': heap_drain_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def benchmark_sorted_export(sizes=(10**5, 10**6, 10**7), n_ary=2, seed=0):
+    """
+    Compare exporting the sorted keys and typed satellites of a heap with heapsort(get_satellites=True), 
+    which builds an object array of pairs, and with to_sorted_arrays, with and without copies.
+
+    Args:
+        sizes (seq, optional): The numbers of values in the heaps. Defaults to 1e5 through 1e7.
+        n_ary (int, optional): The branching factor of the heaps. Defaults to 2.
+        seed (int, optional): The seed for the random keys. Defaults to 0.
+
+    Returns:
+        list: A dictionary of measurements for each size.
+    """
+
+    rng = np.random.default_rng(seed)
+    rows = []
+
+    for size in sizes:
+        keys = rng.random(size)
+        satellites = np.arange(size)
+
+        heap = N_ary_heap.heapify(keys, satellites, n_ary=n_ary, satellite_dtype=np.int64)
+        heapsort_time = _time(heap.heapsort, get_satellites=True)
+        heap = N_ary_heap.heapify(keys, satellites, n_ary=n_ary, satellite_dtype=np.int64)
+        copy_time = _time(heap.to_sorted_arrays, copy=True)
+        heap = N_ary_heap.heapify(keys, satellites, n_ary=n_ary, satellite_dtype=np.int64)
+        view_time = _time(heap.to_sorted_arrays)
+
+        rows.append({
+            'size': size,
+            'heapsort s': heapsort_time,
+            'to_sorted_arrays copy s': copy_time,
+            'to_sorted_arrays view s': view_time,
+        })
+
+    _print_table(rows)
+    return rows
+
+
+def _drain(pop, num_values):
+    """Call pop until it has returned num_values values that are not None."""
+
+    n_popped = 0
+    while n_popped < num_values:
+        if pop() is not None:
+            n_popped += 1
+
+
+if __name__ == "__main__":
+    benchmark_batched_push_pop()
+    benchmark_top_k()
+    benchmark_concurrent_push()
+    benchmark_merge_sorted()
+    benchmark_n_ary_sweep()
+    benchmark_persistent_push_pop()
+    benchmark_heapify()
+    benchmark_calendar_queue()
+    benchmark_radix_heap()
+    benchmark_meld()
+    benchmark_sorted_export()
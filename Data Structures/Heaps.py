@@ -1,13 +1,225 @@
+import ast
+import json
+import operator
+import os
+import tempfile
+import threading
+import weakref
+from bisect import bisect_right
+from itertools import islice
+from time import perf_counter
 import numpy as np
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
+r"""
+   _____   _    __   _       _  __                               _       
+  / ____| (_)  / _| | |     | |/ /                              | |      
+ | (___    _  | |_  | |_    | ' /    ___   _ __   _ __     ___  | |  ___ 
+  \___ \  | | |  _| | __|   |  <    / _ \ | '__| | '_ \   / _ \ | | / __|
+  ____) | | | | |   | |_    | . \  |  __/ | |    | | | | |  __/ | | \__ \
+ |_____/  |_| |_|    \__|   |_|\_\  \___| |_|    |_| |_|  \___| |_| |___/
+                                                                         
+                                                                         
+"""
+
+def _jit(function):
+    """Compile function with numba if it is installed, otherwise return it unchanged."""
+
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@_jit
+def _exchange_rows(satellite_rows, index_x, index_y):
+    """Exchange rows index_x and index_y of satellite_rows, a 2-d byte view of a typed satellite array with one row per satellite."""
+
+    for column in range(satellite_rows.shape[1]):
+        satellite_byte = satellite_rows[index_x, column]
+        satellite_rows[index_x, column] = satellite_rows[index_y, column]
+        satellite_rows[index_y, column] = satellite_byte
+
+
+@_jit
+def _sift_up_kernel(key_array, satellite_rows, this_index, n_ary, is_min):
+    """Compiled equivalent of N_ary_heap._sift_up over key_array and the byte rows of its satellites."""
+
+    while this_index > 0:
+
+        parent_index = (this_index - 1) // n_ary
+        this_key = key_array[this_index]
+        parent_key = key_array[parent_index]
+
+        # Check whether parent_key is at least as extreme as this_key.
+        if is_min:
+            is_more_extreme = this_key < parent_key
+        else:
+            is_more_extreme = this_key > parent_key
+        if not is_more_extreme:
+            return
+
+        key_array[this_index] = parent_key
+        key_array[parent_index] = this_key
+        _exchange_rows(satellite_rows, this_index, parent_index)
+        this_index = parent_index
+
+
+@_jit
+def _sift_down_kernel(key_array, satellite_rows, this_index, size, n_ary, is_min):
+    """Compiled equivalent of N_ary_heap._sift_down over key_array and the byte rows of its satellites."""
+
+    while True:
+
+        # Find the extremum child, or return if this is a leaf node.
+        left_child_index = n_ary * this_index + 1
+        if left_child_index >= size:
+            return
+        extremum_child_index = left_child_index
+        extremum_child_key = key_array[left_child_index]
+        for child_index in range(left_child_index + 1, min(left_child_index + n_ary, size)):
+            child_key = key_array[child_index]
+            if is_min:
+                is_more_extreme = child_key < extremum_child_key
+            else:
+                is_more_extreme = child_key > extremum_child_key
+            if is_more_extreme:
+                extremum_child_index = child_index
+                extremum_child_key = child_key
+
+        # Check whether this_key is at least as extreme as extremum_child_key.
+        this_key = key_array[this_index]
+        if is_min:
+            is_more_extreme = extremum_child_key < this_key
+        else:
+            is_more_extreme = extremum_child_key > this_key
+        if not is_more_extreme:
+            return
+
+        key_array[this_index] = extremum_child_key
+        key_array[extremum_child_index] = this_key
+        _exchange_rows(satellite_rows, this_index, extremum_child_index)
+        this_index = extremum_child_index
+
+
+r"""
+  ____                                  _       _                     ______                  _                  
+ |  _ \                                | |     (_)                   |  ____|                | |                 
+ | |_) |  _ __    __ _   _ __     ___  | |__    _   _ __     __ _    | |__      __ _    ___  | |_    ___    _ __ 
+ |  _ <  | '__|  / _` | | '_ \   / __| | '_ \  | | | '_ \   / _` |   |  __|    / _` |  / __| | __|  / _ \  | '__|
+ | |_) | | |    | (_| | | | | | | (__  | | | | | | | | | | | (_| |   | |      | (_| | | (__  | |_  | (_) | | |   
+ |____/  |_|     \__,_| |_| |_|  \___| |_| |_| |_| |_| |_|  \__, |   |_|       \__,_|  \___|  \__|  \___/  |_|   
+                                                             __/ |                                               
+                                                            |___/                                                
+"""
+
+# The branching factor profile written by HeapBenchmarks.benchmark_n_ary_sweep and read when a heap is created with n_ary='auto'.
+N_ARY_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'n_ary_profile.json')
+
+# Used by n_ary='auto' when there is no profile, or no measurements for the dtype. 
+# A 4-ary heap halves the depth of a binary heap while its children still share a cache line.
+_DEFAULT_AUTO_N_ARY = 4
+
+# Loaded profiles, by path, along with the modification time of the file when it was loaded.
+_n_ary_profiles = {}
+
+
+def load_n_ary_profile(path=None):
+    """
+    Return the measurements in the branching factor profile at path as a list of dictionaries, or an empty list if there is no such file.
+    Each measurement has the keys 'dtype', 'size', 'mix', 'n_ary', 'jit' and 'us/op'. The file is only read again once it changes.
+
+    Args:
+        path (str, NoneType, optional): The path of the profile. If None, N_ARY_PROFILE_PATH is used. Defaults to None.
+
+    Returns:
+        list: The measurements in the profile.
+    """
+
+    if path is None:
+        path = N_ARY_PROFILE_PATH
+    if not os.path.exists(path):
+        return []
+
+    modified_time = os.path.getmtime(path)
+    if path not in _n_ary_profiles or _n_ary_profiles[path][0] != modified_time:
+        with open(path) as profile_file:
+            _n_ary_profiles[path] = (modified_time, json.load(profile_file))
+
+    return _n_ary_profiles[path][1]
+
+
+def choose_n_ary(dtype=float, size=1, jit=False, path=None):
+    """
+    Return the branching factor with the lowest total time per operation across every operation mix in the profile, 
+    for the measured size nearest to size on a log scale and for the given dtype and jit setting.
+
+    Args:
+        dtype (type, optional): The dtype of the heap. Defaults to float.
+        size (int, optional): The expected size of the heap. Defaults to 1.
+        jit (bool, optional): Whether the heap sifts with the compiled kernels. Defaults to False.
+        path (str, NoneType, optional): The path of the profile. If None, N_ARY_PROFILE_PATH is used. Defaults to None.
+
+    Returns:
+        int: The chosen branching factor, or _DEFAULT_AUTO_N_ARY if the profile has no measurements for dtype and jit.
+    """
+
+    dtype_name = np.dtype(dtype).name
+    measurements = [row for row in load_n_ary_profile(path) if row['dtype'] == dtype_name and row['jit'] == bool(jit)]
+    if not measurements:
+        return _DEFAULT_AUTO_N_ARY
+
+    nearest_size = min({row['size'] for row in measurements}, key=lambda measured_size: abs(np.log(measured_size) - np.log(max(size, 1))))
+    total_times = {}
+    for row in measurements:
+        if row['size'] == nearest_size:
+            total_times[row['n_ary']] = total_times.get(row['n_ary'], 0.0) + row['us/op']
+
+    return min(total_times, key=total_times.get)
+
+
+
+class _View_anchor:
+    """
+    A read-only array interface over an array of a heap, from which N_ary_heap._make_view builds the views it returns. 
+    Every array derived from such a view, e.g. by slicing, keeps the anchor alive through its base, 
+    so the heap can tell whether any of them is still referenced from a weak reference to the anchor.
+    """
+
+    def __init__(self, array):
+        self._array = array
+        interface = dict(array.__array_interface__)
+        interface['data'] = (interface['data'][0], True)
+        self.__array_interface__ = interface
+
+
 
 class N_ary_heap:
     """
-    An implicit tree structure backed by two 1-d np.ndarrays, _key_array and _satellite_array.
+    An implicit tree structure backed by two np.ndarrays, _key_array and _satellite_array.
     The tree is complete, and the maximum number of children of each node can be specified on creation.
+    Satellites are stored in an object array unless a satellite_dtype is given, in which case they are stored contiguously, 
+    one (possibly multi-dimensional or structured) element of satellite_dtype per key.
     """
+
+    # The batched methods switch to bulk strategies once a batch is at least 1 / ratio of the size of the heap.
+    _REHEAPIFY_RATIO = 1
+    _BULK_POP_RATIO = 64
+
+    # The methods whose calls are counted when instrumentation is enabled.
+    _INSTRUMENTED_EVENTS = ('push', 'push_many', 'pop', 'pop_many', 'replace', 'poll')
+
+    # Levels with at least this many parent nodes are sifted down with vectorized operations by _reheapify.
+    # Below it, the overhead of the numpy calls outweighs sifting each node down in turn.
+    _VECTORIZED_LEVEL_SIZE = 64
+
+    # Passed to the sift kernels in place of satellite rows when there are none to move.
+    _NO_SATELLITE_ROWS = np.empty((0, 0), np.uint8)
     
-    def __init__(self, capacity, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False):
+    def __init__(self, capacity, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False, satellite_dtype=None, jit=False):
         """
         Create an empty heap.
         
@@ -16,8 +228,13 @@ class N_ary_heap:
             heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
             overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
             dtype (type, optional): The dtype of the heap. Defaults to float.
-            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            n_ary (int, str, optional): The maximum number of children for each node, or the branching factor of the tree. 
+                If 'auto', it is chosen by choose_n_ary from the measured profile for dtype and capacity. Defaults to 2.
             satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): Anything accepted by np.dtype, e.g. np.int64, [('id', int), ('weight', float)], or (float, 3) 
+                for a block of 3 floats per key. If provided, satellites are stored in a typed array rather than an object array and satellites is overridden to True. Defaults to None.
+            jit (bool, optional): If True, _sift_up and _sift_down are replaced by numba-compiled kernels working on the same arrays. 
+                Falls back to the pure-Python methods if numba is not installed or satellites are stored in an object array. Defaults to False.
             
         Raises:
             TypeError: Raised if capacity is not of type int.
@@ -26,8 +243,9 @@ class N_ary_heap:
             TypeError: Raised if overflow_off is not of type str.
             ValueError: Raised if overflow_off is not 'head' or 'tail'.
             TypeError: Raised if dtype is not a type.
-            TypeError: Raised if n_ary is not of type int.
+            TypeError: Raised if n_ary is neither of type int nor 'auto'.
             ValueError: Raised if n_ary is not positive.
+            TypeError: Raised if satellite_dtype is neither None nor interpretable as a np.dtype.
         """
 
         # Validate inputs.
@@ -58,7 +276,9 @@ class N_ary_heap:
             raise TypeError(f"dtype must be a type.\n"
                             f"type(dtype): {type(dtype)}.")
 
-        # Validate n_ary.
+        # Validate n_ary. The profile is looked up for the backend actually used, which is pure Python when numba is missing.
+        if n_ary == 'auto':
+            n_ary = choose_n_ary(dtype, capacity, N_ary_heap._uses_kernels(jit, satellites, satellite_dtype))
         if not isinstance(n_ary, int):
             raise TypeError(f"n_ary must be of type int.\n"
                             f"type(n_ary): {type(n_ary)}.")
@@ -66,17 +286,60 @@ class N_ary_heap:
             raise ValueError(f"n_ary must be at least 1.\n"
                             f"n_ary: {n_ary}.")
 
+        # Validate satellite_dtype.
+        if satellite_dtype is not None:
+            try:
+                satellite_dtype = np.dtype(satellite_dtype)
+            except TypeError:
+                raise TypeError(f"satellite_dtype must be either None or interpretable as a np.dtype.\n"
+                                f"satellite_dtype: {satellite_dtype}.")
+            satellites = True # Override satellites to True if satellite_dtype is provided.
+
         # Set attributes.
 
         self._heap_type = heap_type
         self._overflow_off = overflow_off
-        self._key_array = np.full(capacity, np.nan, dtype)
+        self._key_array = self._allocate(capacity, dtype)
+        self._satellite_dtype = satellite_dtype
         if satellites:
-            self._satellite_array = np.full(capacity, np.nan, object)
+            self._satellite_array = self._allocate_satellites(capacity)
         else:
             self._satellite_array = None
+        # Elements of multi-dimensional and structured satellite arrays are views, so they must be exchanged and returned as copies.
+        self._satellite_rows = satellite_dtype is not None and (satellite_dtype.shape != () or satellite_dtype.fields is not None)
+        self._dtype = dtype
         self._n_ary = n_ary
         self._size = 0
+        # Weak references to the read-only views returned by get_keys_view, get_satellites_view and to_sorted_arrays. 
+        # The heap cannot be modified while any of them is still referenced.
+        self._views = []
+
+        # Bind the comparison once rather than checking self._heap_type on every call.
+        self._is_more_extreme = operator.lt if heap_type == 'min' else operator.gt
+
+        # Select the sift backend.
+        self._jit = N_ary_heap._uses_kernels(jit, satellites, satellite_dtype)
+        if self._jit:
+            self._sift_up = self._sift_up_jit
+            self._sift_down = self._sift_down_jit
+
+
+    @staticmethod
+    def _uses_kernels(jit, satellites, satellite_dtype):
+        """Return True if a heap created with jit, satellites and satellite_dtype sifts with the compiled kernels, which need numba and typed satellites."""
+
+        return bool(jit) and numba is not None and (not satellites or satellite_dtype is not None)
+
+
+    @staticmethod
+    def _allocate(size, dtype):
+        """Return an array of size elements of dtype, filled with np.nan where dtype can hold it and with zeros otherwise."""
+
+        dtype = np.dtype(dtype)
+        if dtype.kind in 'fcO':
+            return np.full(size, np.nan, dtype)
+        else:
+            return np.zeros(size, dtype)
 
 
     def __str__(self):
@@ -212,22 +475,10 @@ class N_ary_heap:
         return n_complete_nodes
 
 
-    def _is_more_extreme(self, challenger, incumbent):
-        """Return True if challenger is more extreme than incumbent in the direction indicated by self._heap_type, else return False."""
-
-        if self._heap_type == 'min':
-            return challenger < incumbent
-        elif self._heap_type == 'max':
-            return challenger > incumbent
-        else:
-            raise RuntimeError(f"self._heap_type must be either 'min' or 'max'.\n"
-                               f"self._heap_type: {self._heap_type}.")
-
-
     def _get_parent(self, child_index):
         """Returns the index for the parent of the child at child_index. If child_index == 0, returns 0."""
 
-        return int((child_index - 1) / self._n_ary)
+        return (child_index - 1) // self._n_ary if child_index > 0 else 0
 
 
     def _get_child(self, this_index, child_number=0):
@@ -277,7 +528,27 @@ class N_ary_heap:
         self._key_array[index_x], self._key_array[index_y] = self._key_array[index_y], self._key_array[index_x]
         # Exchange satellites.
         if self._satellite_array is not None:
-            self._satellite_array[index_x], self._satellite_array[index_y] = self._satellite_array[index_y], self._satellite_array[index_x]
+            if self._satellite_rows:
+                self._satellite_array[[index_x, index_y]] = self._satellite_array[[index_y, index_x]]
+            else:
+                self._satellite_array[index_x], self._satellite_array[index_y] = self._satellite_array[index_y], self._satellite_array[index_x]
+
+
+    def _get_satellite(self, index):
+        """Return the satellite at index, copied if it would otherwise be a view into self._satellite_array, or None if satellites are not stored."""
+
+        if self._satellite_array is None:
+            return None
+        elif self._satellite_rows:
+            return self._satellite_array[index].copy()
+        else:
+            return self._satellite_array[index]
+
+
+    def _allocate_satellites(self, size):
+        """Return an empty array able to hold size satellites, of object dtype unless self._satellite_dtype is provided."""
+
+        return self._allocate(size, object if self._satellite_dtype is None else self._satellite_dtype)
 
         
     def _sift_up(self, this_index):
@@ -335,6 +606,27 @@ class N_ary_heap:
             this_index = extremum_child_index
 
 
+    def _get_satellite_rows(self):
+        """Return a 2-d byte view of self._satellite_array with one row per satellite, for exchanging satellites in the sift kernels."""
+
+        if self._satellite_array is None:
+            return self._NO_SATELLITE_ROWS
+
+        return self._satellite_array.view(np.uint8).reshape(len(self._satellite_array), -1)
+
+
+    def _sift_up_jit(self, this_index):
+        """Equivalent to _sift_up, performed by a compiled kernel. Bound in place of _sift_up when the heap is created with jit=True."""
+
+        _sift_up_kernel(self._key_array, self._get_satellite_rows(), this_index, self._n_ary, self._heap_type == 'min')
+
+
+    def _sift_down_jit(self, this_index):
+        """Equivalent to _sift_down, performed by a compiled kernel. Bound in place of _sift_down when the heap is created with jit=True."""
+
+        _sift_down_kernel(self._key_array, self._get_satellite_rows(), this_index, self._size, self._n_ary, self._heap_type == 'min')
+
+
     def _force_overflow(self, num_overflow):
         """Force the overflow of up to num_overflow nodes."""
 
@@ -350,13 +642,170 @@ class N_ary_heap:
                                f"num_overflow: {num_overflow}, self.get_size(): {self.get_size()}.")
 
         if self._overflow_off == 'head':
-            for _ in range(min(self.get_size(), num)):
+            for _ in range(num_overflow):
                 self.pop()
         elif self._overflow_off == 'tail':
             self.poll(num_overflow)
         else:
             raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
-                                 f"overflow_off: {overflow_off}.")
+                                 f"overflow_off: {self._overflow_off}.")
+
+
+    def _reheapify(self):
+        """
+        Restore the heap property over the whole heap by sifting down every parent node, starting from the last.
+
+        The parents are processed one level at a time from the bottom up. The subtrees of the nodes in a level are disjoint, 
+        so a level with at least _VECTORIZED_LEVEL_SIZE nodes is sifted down all at once by _sift_down_level, 
+        and only the few nodes in the upper levels are sifted down one at a time.
+        """
+
+        if self._size < 2:
+            return
+
+        # The last parent node is the parent of the last node.
+        n_parent_nodes = self._get_parent(self._size - 1) + 1
+
+        # Subclasses that mirror exchanges elsewhere, and instrumented heaps, need every exchange to go through _exchange_values.
+        if getattr(self._exchange_values, '__func__', None) is not N_ary_heap._exchange_values:
+            for index in reversed(range(n_parent_nodes)):
+                self._sift_down(index)
+            return
+
+        # The range of indices of each level that contains parent nodes.
+        levels = []
+        level_start, level_width = 0, 1
+        while level_start < n_parent_nodes:
+            levels.append((level_start, min(level_start + level_width, n_parent_nodes)))
+            level_start += level_width
+            level_width *= self._n_ary
+
+        for level_start, level_stop in reversed(levels):
+            if level_stop - level_start >= self._VECTORIZED_LEVEL_SIZE:
+                self._sift_down_level(level_start, level_stop)
+            else:
+                for index in reversed(range(level_start, level_stop)):
+                    self._sift_down(index)
+
+
+    def _sift_down_level(self, start, stop):
+        """
+        Sift down every node with an index in [start, stop) at once, where the nodes are all in the same level. 
+        Each step compares every node still moving with its children in a few vectorized operations, 
+        and exchanges it with its extremum child if that child is more extreme.
+        """
+
+        key_array = self._key_array
+        satellite_array = self._satellite_array
+        size = self._size
+        child_offsets = np.arange(1, self._n_ary + 1)
+        select_extremum = np.argmin if self._heap_type == 'min' else np.argmax
+
+        nodes = np.arange(start, stop)
+        while nodes.size > 0:
+            # Nodes that have become leaves stop moving.
+            nodes = nodes[self._n_ary * nodes + 1 < size]
+            if nodes.size == 0:
+                break
+
+            # Missing children of the last parent take the key of its first child, which always exists, so they are never selected over it.
+            children = self._n_ary * nodes[:, np.newaxis] + child_offsets
+            child_keys = key_array[np.minimum(children, size - 1)]
+            child_keys = np.where(children < size, child_keys, child_keys[:, :1])
+            extremum_columns = select_extremum(child_keys, axis=1)
+            rows = np.arange(nodes.size)
+            extremum_children = children[rows, extremum_columns]
+
+            # Exchange the nodes whose extremum child is more extreme, and follow them down.
+            moving = self._is_more_extreme(child_keys[rows, extremum_columns], key_array[nodes])
+            nodes = nodes[moving]
+            extremum_children = extremum_children[moving]
+            node_keys = key_array[nodes]
+            key_array[nodes] = key_array[extremum_children]
+            key_array[extremum_children] = node_keys
+            if satellite_array is not None:
+                node_satellites = satellite_array[nodes]
+                satellite_array[nodes] = satellite_array[extremum_children]
+                satellite_array[extremum_children] = node_satellites
+            nodes = extremum_children
+
+
+    def _sort_values(self):
+        """
+        Sort the keys, and satellites if they are stored, in place with self._heap_type first.
+        A sorted array satisfies the heap property, so the heap remains valid.
+        """
+
+        order = np.argsort(self._key_array[:self._size], kind='stable')
+        if self._heap_type == 'max':
+            order = order[::-1]
+
+        self._key_array[:self._size] = self._key_array[order]
+        if self._satellite_array is not None:
+            self._satellite_array[:self._size] = self._satellite_array[order]
+
+
+    def _most_extreme_indices(self, keys, num_indices):
+        """Return the indices of the num_indices most extreme values in keys in the direction indicated by self._heap_type, in no particular order."""
+
+        if num_indices >= len(keys):
+            return np.arange(len(keys))
+
+        if self._heap_type == 'min':
+            return np.argpartition(keys, num_indices - 1)[:num_indices]
+        else:
+            return np.argpartition(keys, len(keys) - num_indices)[len(keys) - num_indices:]
+
+
+    def _least_extreme_indices(self, keys, num_indices):
+        """Return the indices of the num_indices least extreme values in keys in the direction indicated by self._heap_type, in no particular order."""
+
+        if num_indices >= len(keys):
+            return np.arange(len(keys))
+
+        if self._heap_type == 'min':
+            return np.argpartition(keys, len(keys) - num_indices)[len(keys) - num_indices:]
+        else:
+            return np.argpartition(keys, num_indices - 1)[:num_indices]
+
+
+    def _get_least_extreme_leaf(self):
+        """Return the index of the least extreme value in the heap, which is always a leaf."""
+
+        first_leaf = self._get_parent(self._size - 1) + 1 if self._size > 1 else 0
+        leaf_keys = self._key_array[first_leaf:self._size]
+        if self._heap_type == 'min':
+            return first_leaf + int(np.argmax(leaf_keys))
+        else:
+            return first_leaf + int(np.argmin(leaf_keys))
+
+
+    def _validate_batch(self, keys, satellites=None):
+        """
+        Return keys as a flat np.ndarray of the heap's dtype, and satellites as a sequence of matching length or None.
+        This is the single validation pass shared by the batched methods.
+        """
+
+        keys = np.asarray(keys, dtype=self._dtype).ravel()
+
+        if satellites is not None:
+            if self._satellite_array is None:
+                raise ValueError(f"satellites cannot be pushed to a heap that does not store satellites.")
+            if len(satellites) != keys.size:
+                raise ValueError(f"satellites must have the same length as keys.\n"
+                                 f"len(satellites): {len(satellites)}, keys.size: {keys.size}.")
+            if self._satellite_dtype is None:
+                # Fill an object array element by element so that sequence-valued satellites are not broadcast.
+                satellite_array = np.empty(keys.size, object)
+                for index, satellite in enumerate(satellites):
+                    satellite_array[index] = satellite
+                satellites = satellite_array
+            else:
+                satellites = np.asarray(satellites, self._satellite_array.dtype)
+        elif self._satellite_array is not None:
+            satellites = self._allocate_satellites(keys.size)
+
+        return keys, satellites
 
     '''
       _    _                         __  __          _     _                   _       
@@ -394,6 +843,93 @@ class N_ary_heap:
             return np.copy(self._satellite_array[:self._size])
 
 
+    def get_keys_view(self):
+        """
+        Returns a read-only view of the keys stored in the underlying self._key_array, without copying them. 
+        Until neither the view nor any array derived from it, such as a slice, is referenced, any method that would modify the heap raises a BufferError.
+        
+        Returns:
+            np.ndarray: A read-only view of the keys in self.
+        """
+
+        return self._make_view(self._key_array[:self._size])
+
+
+    def get_satellites_view(self):
+        """
+        Returns a read-only view of the satellites stored in the underlying self._satellite_array, without copying them, or None if it is None. 
+        Until neither the view nor any array derived from it, such as a slice, is referenced, any method that would modify the heap raises a BufferError.
+        
+        Returns:
+            np.ndarray, NoneType: A read-only view of the satellites in self, or None if satellites are not stored.
+        """
+
+        if self._satellite_array is None:
+            return None
+        else:
+            return self._make_view(self._satellite_array[:self._size])
+
+
+    def to_sorted_arrays(self, min_or_max_first=None, copy=False):
+        """
+        Sorts the heap in place and returns its keys and satellites as two parallel arrays of their own dtypes, 
+        rather than concatenating them into an object array like heapsort. A sorted array satisfies the heap property, so the heap remains valid. 
+        Unless copy is True, the arrays are read-only views of the heap, and any method that would modify the heap raises a BufferError until they are no longer referenced.
+
+        Args:
+            min_or_max_first (str, NoneType, optional): Either 'min' or 'max', determining whether the arrays are ascending or descending. 
+                If None, the heap_type is assumed. A descending view of a min heap, or vice versa, is a reversed view rather than a copy. Defaults to None.
+            copy (bool, optional): If True, the arrays are writeable copies that do not block modification of the heap. Defaults to False.
+
+        Raises:
+            TypeError: Raised if min_or_max_first is neither of type str nor None.
+            ValueError: Raised if min_or_max_first is not 'min', 'max', or None.
+            BufferError: Raised if a view of the heap is still referenced, since sorting would change it.
+
+        Returns:
+            tuple: (keys, satellites), where satellites is None if satellites are not stored.
+        """
+
+        # Validate min_or_max_first.
+        if min_or_max_first is None:
+            min_or_max_first = self._heap_type
+        elif not isinstance(min_or_max_first, str):
+            raise TypeError(f"min_or_max_first must be of type str or NoneType.\n"
+                            f"type(min_or_max_first): {type(min_or_max_first)}.")
+        if min_or_max_first not in ['min', 'max']:
+            raise ValueError(f"min_or_max_first must be either 'min', 'max', or None.\n"
+                             f"min_or_max_first: {min_or_max_first}.")
+
+        self._check_views()
+        self._sort_values()
+
+        step = 1 if min_or_max_first == self._heap_type else -1
+        keys = self._key_array[:self._size][::step]
+        satellites = self._satellite_array[:self._size][::step] if self._satellite_array is not None else None
+        if copy:
+            return np.copy(keys), np.copy(satellites) if satellites is not None else None
+        return self._make_view(keys), self._make_view(satellites) if satellites is not None else None
+
+
+    def _make_view(self, array):
+        """Return a read-only view of array, which blocks modification of the heap for as long as it, or any array derived from it, is referenced."""
+
+        anchor = _View_anchor(array)
+        self._views.append(weakref.ref(anchor))
+        return np.asarray(anchor)
+
+
+    def _check_views(self):
+        """Raise a BufferError if a view returned by get_keys_view, get_satellites_view or to_sorted_arrays, or an array derived from one, is still referenced."""
+
+        if not self._views:
+            return
+        self._views = [view for view in self._views if view() is not None]
+        if self._views:
+            raise BufferError(f"The heap cannot be modified while a view of it is referenced.\n"
+                              f"Number of views referenced: {len(self._views)}.")
+
+
     def get_size(self):
         """
         Returns the size of the heap, i.e. the number of stored values.
@@ -439,6 +975,8 @@ class N_ary_heap:
             dtype, tuple: The root of the heap, or None if the heap is empty. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
         """
 
+        self._check_views()
+
         if self.is_empty():
             return None
         
@@ -446,7 +984,7 @@ class N_ary_heap:
         root_key = self._key_array[0]
         root = root_key
         if get_satellite:
-            root_satellite = self._satellite_array[0]
+            root_satellite = self._get_satellite(0)
             root = (root_key, root_satellite)
 
         # Exchange the root with the last item in the heap, 
@@ -459,6 +997,61 @@ class N_ary_heap:
         return root
 
 
+    def pop_many(self, num_pop, get_satellites=False):
+        """
+        Removes and returns up to num_pop values from the root, in the order that repeated calls to pop would return them.
+
+        If num_pop is large compared to the size of the heap, the heap is sorted once in place and the head is removed in bulk,
+        which is cheaper than sifting down after each pop. A sorted array satisfies the heap property, so the remainder is still a heap.
+
+        Args:
+            num_pop (int): The maximum number of values to pop, minimum 1.
+            get_satellites (bool, optional): If True, rather than just the popped keys, a tuple is returned
+                whose second value is an array of the corresponding satellites, or None if satellites are not stored. Defaults to False.
+
+        Raises:
+            TypeError: Raised if num_pop is not of type int.
+            ValueError: Raised if num_pop is not positive.
+
+        Returns:
+            np.ndarray, tuple: The popped keys, most extreme first. If get_satellites is True, this is (popped_keys, popped_satellites).
+        """
+
+        self._check_views()
+
+        # Validate inputs.
+        if not isinstance(num_pop, int):
+            raise TypeError(f"num_pop must be of type int.\n"
+                            f"type(num_pop): {type(num_pop)}.")
+        if num_pop < 1:
+            raise ValueError(f"num_pop must be positive.\n"
+                            f"num_pop: {num_pop}.")
+
+        num_pop = min(num_pop, self._size)
+
+        if num_pop * self._BULK_POP_RATIO >= self._size:
+            # Sort once, then shift the remainder to the front of the array.
+            self._sort_values()
+            popped_keys = np.copy(self._key_array[:num_pop])
+            self._key_array[:self._size - num_pop] = self._key_array[num_pop:self._size]
+            popped_satellites = None
+            if self._satellite_array is not None:
+                popped_satellites = np.copy(self._satellite_array[:num_pop])
+                self._satellite_array[:self._size - num_pop] = self._satellite_array[num_pop:self._size]
+            self._size -= num_pop
+        else:
+            # Pop one at a time.
+            popped_keys = np.empty(num_pop, self._dtype)
+            popped_satellites = self._allocate_satellites(num_pop) if self._satellite_array is not None else None
+            for index in range(num_pop):
+                if popped_satellites is None:
+                    popped_keys[index] = self.pop()
+                else:
+                    popped_keys[index], popped_satellites[index] = self.pop(get_satellite=True)
+
+        return (popped_keys, popped_satellites) if get_satellites else popped_keys
+
+
     def replace(self, new_key, new_satellite=None, get_satellite=False):
         """
         Replaces the root with new_value and sifts it down. Returns the old root.
@@ -473,6 +1066,8 @@ class N_ary_heap:
             dtype, tuple: The root at insertion time. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
         """
 
+        self._check_views()
+
         if self.is_empty():
             root = None
             self.push(new_key, new_satellite)
@@ -481,7 +1076,7 @@ class N_ary_heap:
             root_key = self._key_array[0]
             root = root_key
             if get_satellite:
-                root_satellite = self._satellite_array[0]
+                root_satellite = self._get_satellite(0)
                 root = (root_key, root_satellite)
             # Override the values at the root and restore the heap property.
             self._key_array[0] = new_key
@@ -512,7 +1107,7 @@ class N_ary_heap:
             root_key = self._key_array[0]
             root = root_key
             if get_satellite:
-                root_satellite = self._satellite_array[0] if self._satellite_array is not None else None
+                root_satellite = self._get_satellite(0)
                 root = (root_key, root_satellite)
             
             return root
@@ -521,8 +1116,8 @@ class N_ary_heap:
     def peek_tail(self, num_peek=1, unpack_single=True, tail_first=True, get_satellite=False):
         """
         If the heap is empty, return None. Otherwise, 
-        perform heapsort in place with self._heap_type at the root, 
-        then returns the last item or items in the heap.
+        return the num_peek least extreme items in the heap without reordering it. 
+        They are selected with np.argpartition in O(n) and only the selection is sorted.
 
         Args:
             num_peek (int): The number of values to peek, minimum 1. Defaults to 1.
@@ -532,7 +1127,7 @@ class N_ary_heap:
                 whose second value is the satellite(s) corresponding to the tail key(s), or None if satellites are not stored. Defaults to False.
         
         Returns:
-            dtype, np.ndarray, tuple, NoneType: A copy of the tail of the sorted self._key_array. 
+            dtype, np.ndarray, tuple, NoneType: A copy of the tail of the sorted heap. 
                 If get_satellite is False, this is just np.ndarray(tail_keys). Otherwise, this is tuple(tail_keys, tail_satellites). 
                 If num_peek == 1 and unpack_single, then this is just dtype(tail_key) or tuple(tail_key, tail_satellite).
         """
@@ -551,43 +1146,52 @@ class N_ary_heap:
         if self.is_empty():
             return None
 
-        self.heapsort()
+        return self._gather_tail(self._get_tail_indices(num_peek), unpack_single, tail_first, get_satellite)
 
-        # Set tail to either tail_keys or (tail_keys, tail_satellites).
-        tail_keys = np.copy(self._key_array[-num_peek:])
-        tail = tail_keys
-        if get_satellite:
-            tail_satellites = np.copy(self._satellite_array[-num_peek:]) if self._satellite_array is not None else None
-            tail = (tail_keys, tail_satellites)
 
-        # Flip tail if necessary.
+    def _get_tail_indices(self, num_tail):
+        """Return the indices of the num_tail least extreme values in the heap in sorted order, i.e. with the least extreme last."""
+
+        keys = np.asarray(self._key_array[:self._size])
+        tail_indices = self._least_extreme_indices(keys, num_tail)
+
+        order = np.argsort(keys[tail_indices], kind='stable')
+        if self._heap_type == 'max':
+            order = order[::-1]
+
+        return tail_indices[order]
+
+
+    def _gather_tail(self, tail_indices, unpack_single=True, tail_first=True, get_satellite=False):
+        """Return copies of the keys, and satellites if get_satellite is True, at tail_indices, formatted as described in peek_tail."""
+
         if tail_first:
-            if get_satellite:
-                tail[0] = np.flip(tail[0])
-                tail[1] = np.flip(tail[1])
-            else:
-                tail = np.flip(tail)
+            tail_indices = tail_indices[::-1]
+
+        tail_keys = np.asarray(self._key_array[:self._size])[tail_indices]
+        tail_satellites = None
+        if self._satellite_array is not None:
+            tail_satellites = self._allocate_satellites(len(tail_indices))
+            for tail_index, index in enumerate(tail_indices):
+                tail_satellites[tail_index] = self._get_satellite(index)
 
         # Unpack unary arrays if appropriate.
-        if unpack_single and num_peek == 1:
-            if get_satellite:
-                tail[0] = tail[0][0]
-                tail[1] = tail[1][0]
-            else:
-                tail = tail[0]
-        
-        return tail
+        if unpack_single and len(tail_indices) == 1:
+            tail_keys = tail_keys[0]
+            tail_satellites = tail_satellites[0] if tail_satellites is not None else None
+
+        return (tail_keys, tail_satellites) if get_satellite else tail_keys
 
 
     def poll(self, poll_off=1, unpack_single=True, tail_first=True, get_satellite=False):
         """
         If the heap is empty, return None. Otherwise, 
-        perform heapsort in place with self._heap_type at the root, 
-        remove the last items in the heap and return them.
+        remove the poll_off least extreme items in the heap and return them. 
+        They are selected as in peek_tail, and exactly those items are removed before the heap is rebuilt bottom-up in O(n).
 
         Args:
             poll_off (int): The number of values to poll, minimum 1. Defaults to 1.
-            unpack_single (bool): If True and num_peek == 1, then return the single value rather than a list. Defaults to True.
+            unpack_single (bool): If True and poll_off == 1, then return the single value rather than a list. Defaults to True.
             tail_first (bool): If True, returns values in tail-first order, else in sorted order. Defaults to True.
             get_satellite (bool, optional): If True, rather than just the tail key(s), a tuple is returned 
                 whose second value is the satellite(s) corresponding to the tail key(s), or None if satellites are not stored. Defaults to False.
@@ -597,6 +1201,8 @@ class N_ary_heap:
                 a tuple containing the last key(s) and the last satellite(s), or None if the heap was empty.
         """
 
+        self._check_views()
+
         # Validate inputs.
         if not isinstance(poll_off, int):
             raise TypeError(f"poll_off must be of type int.\n"
@@ -605,11 +1211,34 @@ class N_ary_heap:
             raise ValueError(f"poll_off must be positive.\n"
                             f"poll_off: {poll_off}.")
 
-        tail = self.peek_tail(poll_off, unpack_single, tail_first) # Note: sorts self._key_array.
-        self._size -= poll_off
+        if poll_off > self.get_size():
+            raise RuntimeError(f"poll_off must not exceed the current size of the heap.\n"
+                               f"poll_off: {poll_off}, self.get_size(): {self.get_size()}.")
+
+        if self.is_empty():
+            return None
+
+        # Return and remove the same items, since with tied keys another selection of the tail may differ.
+        tail_indices = self._get_tail_indices(poll_off)
+        tail = self._gather_tail(tail_indices, unpack_single, tail_first, get_satellite)
+        self._remove_indices(tail_indices)
         return tail
 
 
+    def _remove_indices(self, indices):
+        """Remove the values at indices from the heap, compacting the rest to the front of the arrays and restoring the heap property."""
+
+        is_kept = np.ones(self._size, bool)
+        is_kept[indices] = False
+        new_size = self._size - len(indices)
+
+        self._key_array[:new_size] = np.asarray(self._key_array[:self._size])[is_kept]
+        if self._satellite_array is not None:
+            self._satellite_array[:new_size] = self._satellite_array[:self._size][is_kept]
+        self._size = new_size
+        self._reheapify()
+
+
     def push(self, new_key, new_satellite=None, get_satellite=False):
         """
         Inserts new_key into the heap and restores the heap property. 
@@ -630,6 +1259,8 @@ class N_ary_heap:
             dtype, tuple, NoneType: If the heap overflowed then the discarded value is returned, else None is returned.
         """
 
+        self._check_views()
+
         if self._size < len(self._key_array):
             # Add new_key to the first available space in the array, sift up, and increment size.
             self._key_array[self._size] = new_key
@@ -639,81 +1270,183 @@ class N_ary_heap:
             return None
         else:
             # Already at capacity. Discard and return a value.
-            if self._overflow_off == 'head':
-                # If the root is not more extreme than new_key, do not insert new_key.
-                if not self._is_more_extreme(self._key_array[0], new_key):
-                    return (new_key, new_satellite) if get_satellite else new_key
-                else:
-                    # Pop and return the root, replacing it with new_key and restoring the heap property.
-                    return self.replace(new_key, new_satellite, get_satellite)
-            elif self._overflow_off == 'tail':
-                # Perform heapsort in place with self._heap_type first, 
-                # then replace the last item if it is less extreme than new_key.
-                tail = self.peek_tail() # Note: sorts self._key_array.
-                # If the tail is at least as extreme as new_key, do not insert new_key.
-                if not self._is_more_extreme(new_key, tail):
-                    return (new_key, new_satellite) if get_satellite else new_key
-                else:
-                    # Replace the tail of self._key_array with the new_key and return the polled tail.
-                    self._size -= 1
-                    self.push(new_key, new_satellite)
-                    return tail
-            else:
-                raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
-                                 f"overflow_off: {overflow_off}.")
-    
-    
-    def heapsort(self, min_or_max_first=None, get_satellites=False):
+            discarded_key, discarded_satellite = self._push_into_full(new_key, new_satellite)
+            return (discarded_key, discarded_satellite) if get_satellite else discarded_key
+
+
+    def _push_into_full(self, new_key, new_satellite=None):
         """
-        Performs heapsort in place and returns a copy of the sorted array, possibly reversed based on min_or_max_first.
-        
-        Args:
-            min_or_max_first (bool, NoneType, optional): Determines whether the returned array is ascending or descending. 
-            If None, the heap_type is assumed. Does not affect the resultant state of the underlying heap. Defaults to None.
-            get_satellites (bool, optional): If True, rather than just the sorted keys, a 2D array is returned 
-                whose values along the 2nd dimension are a key and its corresponding satellite. Defaults to False.
+        Push new_key into the full heap, discarding a value based on self._overflow_off as described in push, 
+        and return the discarded (key, satellite), whose satellite is None if satellites are not stored.
         """
 
-        # Validate min_or_max_first.
-        if min_or_max_first is None:
-            min_or_max_first = self._heap_type
-        elif not isinstance(min_or_max_first, str):
-            raise TypeError(f"min_or_max_first must be of type str or NoneType.\n"
-                            f"type(min_or_max_first): {type(min_or_max_first)}.")
-        if min_or_max_first not in ['min', 'max', None]:
-            raise ValueError(f"min_or_max_first must be either 'min', 'max', or None.\n"
-                             f"min_or_max_first: {min_or_max_first}.")
-
-        # Sort in self._heap_type-last order.
-        actual_size = self._size
-        while not self.is_empty():
-            self._exchange_values(0, self._size - 1)
-            self._size -= 1
-            self._sift_down(0)
-        self._size = actual_size
-        
-        if min_or_max_first != self._heap_type:
-            output = np.copy(self._key_array[:self._size])
-            if get_satellites:
-                satellites = np.copy(self._satellite_array[:self._size])
-                output = np.concatenate((np.expand_dims(output, 1), np.expand_dims(satellites, 1)), axis=1)
+        if self._overflow_off == 'head':
+            # If the root is not more extreme than new_key, do not insert new_key.
+            if not self._is_more_extreme(self._key_array[0], new_key):
+                return new_key, new_satellite
+            # Pop and return the root, replacing it with new_key and restoring the heap property.
+            return self.replace(new_key, new_satellite, get_satellite=True)
+        elif self._overflow_off == 'tail':
+            # The least extreme value is always a leaf, so find it among the leaves without reordering the heap.
+            tail_index = self._get_least_extreme_leaf()
+            tail_key = self._key_array[tail_index]
+            # If the tail is at least as extreme as new_key, do not insert new_key.
+            if not self._is_more_extreme(new_key, tail_key):
+                return new_key, new_satellite
+            # Replace the tail with new_key, restore the heap property, and return the discarded tail.
+            tail = (tail_key, self._get_satellite(tail_index))
+            self._key_array[tail_index] = new_key
+            if self._satellite_array is not None: self._satellite_array[tail_index] = new_satellite
+            self._sift_up(tail_index)
+            return tail
+        else:
+            raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
+                             f"overflow_off: {self._overflow_off}.")
+
+
+    def push_many(self, new_keys, new_satellites=None, get_satellites=False):
+        """
+        Inserts every key in new_keys into the heap and restores the heap property, validating the batch only once.
+
+        Keys are appended to the free space in the array. If the batch is large compared to the heap,
+        the whole heap is rebuilt bottom-up in O(n), otherwise each appended key is sifted up.
+
+        If the batch does not fit, the overflow is resolved as though each key were pushed in turn:
+        the values that would be discarded based on self._overflow_off are discarded and returned.
+        If the overflow is large compared to the capacity, the survivors are selected in bulk with np.argpartition.
+
+        Args:
+            new_keys (np.ndarray, seq): The keys to be inserted.
+            new_satellites (seq, NoneType, optional): The corresponding satellites to be inserted, or None. Defaults to None.
+            get_satellites (bool, optional): If True, the discarded satellites are also returned. Defaults to False.
+
+        Raises:
+            ValueError: Raised if new_satellites is provided but satellites are not stored.
+            ValueError: Raised if new_satellites does not have the same length as new_keys.
+
+        Returns:
+            np.ndarray, tuple: The discarded keys, which is empty if nothing overflowed. If get_satellites is True, this is (discarded_keys, discarded_satellites).
+        """
+
+        self._check_views()
+
+        new_keys, new_satellites = self._validate_batch(new_keys, new_satellites)
+
+        # Fill the free space in the array.
+        n_fit = min(len(self._key_array) - self._size, new_keys.size)
+        old_size = self._size
+        self._key_array[old_size:old_size + n_fit] = new_keys[:n_fit]
+        if self._satellite_array is not None:
+            self._satellite_array[old_size:old_size + n_fit] = new_satellites[:n_fit]
+        self._size += n_fit
+
+        if n_fit * self._REHEAPIFY_RATIO >= old_size:
+            self._reheapify()
+        else:
+            for index in range(old_size, self._size):
+                self._sift_up(index)
+
+        # Resolve any overflow.
+        overflow_keys = new_keys[n_fit:]
+        overflow_satellites = new_satellites[n_fit:] if new_satellites is not None else None
+        if overflow_keys.size == 0:
+            discarded_keys = overflow_keys
+            discarded_satellites = overflow_satellites
+        elif overflow_keys.size >= self._size:
+            discarded_keys, discarded_satellites = self._push_overflow_in_bulk(overflow_keys, overflow_satellites)
+        else:
+            discarded_keys = np.empty_like(overflow_keys)
+            discarded_satellites = self._allocate_satellites(overflow_keys.size) if overflow_satellites is not None else None
+            # The heap is full, so each value is resolved directly, which always yields the discarded (key, satellite).
+            for index in range(overflow_keys.size):
+                if overflow_satellites is None:
+                    discarded_keys[index], _ = self._push_into_full(overflow_keys[index])
+                else:
+                    discarded_keys[index], discarded_satellites[index] = self._push_into_full(overflow_keys[index], overflow_satellites[index])
+
+        return (discarded_keys, discarded_satellites) if get_satellites else discarded_keys
+
+
+    def _push_overflow_in_bulk(self, overflow_keys, overflow_satellites=None):
+        """
+        Merge overflow_keys into a full heap, keeping the same values that pushing them one at a time would keep,
+        and return the discarded keys and satellites.
+        """
+
+        all_keys = np.concatenate((self._key_array[:self._size], overflow_keys))
+        all_satellites = None
+        if self._satellite_array is not None:
+            all_satellites = np.concatenate((self._satellite_array[:self._size], overflow_satellites))
+
+        # Overflowing off the head discards the most extreme values, and overflowing off the tail discards the least extreme values.
+        if self._overflow_off == 'head':
+            kept = self._least_extreme_indices(all_keys, self._size)
+        elif self._overflow_off == 'tail':
+            kept = self._most_extreme_indices(all_keys, self._size)
+        else:
+            raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
+                             f"overflow_off: {self._overflow_off}.")
+        discarded = np.ones(all_keys.size, bool)
+        discarded[kept] = False
+
+        self._key_array[:self._size] = all_keys[kept]
+        if all_satellites is not None:
+            self._satellite_array[:self._size] = all_satellites[kept]
+        self._reheapify()
+
+        return all_keys[discarded], all_satellites[discarded] if all_satellites is not None else None
+
+
+    def heapsort(self, min_or_max_first=None, get_satellites=False):
+        """
+        Performs heapsort in place and returns a copy of the sorted array, possibly reversed based on min_or_max_first.
         
-        # Restore heap property.
-        self._key_array[:self._size] = np.flip(self._key_array[:self._size])
+        Args:
+            min_or_max_first (bool, NoneType, optional): Determines whether the returned array is ascending or descending. 
+            If None, the heap_type is assumed. Does not affect the resultant state of the underlying heap. Defaults to None.
+            get_satellites (bool, optional): If True, rather than just the sorted keys, a 2D array is returned 
+                whose values along the 2nd dimension are a key and its corresponding satellite. Defaults to False.
+        """
+
+        self._check_views()
+
+        # Validate min_or_max_first.
+        if min_or_max_first is None:
+            min_or_max_first = self._heap_type
+        elif not isinstance(min_or_max_first, str):
+            raise TypeError(f"min_or_max_first must be of type str or NoneType.\n"
+                            f"type(min_or_max_first): {type(min_or_max_first)}.")
+        if min_or_max_first not in ['min', 'max', None]:
+            raise ValueError(f"min_or_max_first must be either 'min', 'max', or None.\n"
+                             f"min_or_max_first: {min_or_max_first}.")
+
+        # Sort in self._heap_type-first order, which also satisfies the heap property.
+        # Keys and satellites are permuted together with a single argsort rather than by repeated exchanges.
+        self._sort_values()
+
+        output = np.copy(self._key_array[:self._size])
+        if get_satellites:
+            satellites = np.copy(self._satellite_array[:self._size])
+            if self._satellite_rows:
+                # Multi-dimensional and structured satellites cannot be concatenated with the keys directly.
+                paired = np.empty((self._size, 2), object)
+                paired[:, 0] = output
+                for index, satellite in enumerate(satellites):
+                    paired[index, 1] = satellite
+                output = paired
+            else:
+                output = np.concatenate((np.expand_dims(output, 1), np.expand_dims(satellites, 1).astype(object)), axis=1)
 
-        if min_or_max_first == self._heap_type:
-            output = np.copy(self._key_array[:self._size])
-            if get_satellites:
-                satellites = np.copy(self._satellite_array[:self._size])
-                output = np.concatenate((np.expand_dims(output, 1), np.expand_dims(satellites, 1)), axis=1)
+        if min_or_max_first != self._heap_type:
+            output = np.flip(output, axis=0)
         
         return output
 
 
     @classmethod
-    def heapify(cls, key_array, satellite_array=None, capacity=None, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False):
+    def heapify(cls, key_array, satellite_array=None, capacity=None, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False, satellite_dtype=None, jit=False, copy=True):
         """
-        Construct a heap from array. Its capacity is set to the size of the array.
+        Construct a heap from array in O(n). Its capacity is set to the size of the array unless capacity is provided.
         
         Args:
             key_array (np.ndarray): The array of keys to be made into a heap.
@@ -722,18 +1455,23 @@ class N_ary_heap:
             heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
             overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
             dtype (type, optional): The dtype of the heap. Defaults to float.
-            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            n_ary (int, str, optional): The maximum number of children for each node, or the branching factor of the tree, or 'auto'. Defaults to 2.
             satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Overridden to True if satellite_array is provided. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            jit (bool, optional): If True, sifting is done by numba-compiled kernels where possible. Defaults to False.
+            copy (bool, optional): If False, the heap takes ownership of key_array and satellite_array and heapifies them in place 
+                wherever they are already flat contiguous arrays of the right dtype and the capacity equals their size. Defaults to True.
 
         Returns:
             N_ary_heap: The heap constructed from key_array and optionally satellite_array.
         """
 
         # Validate inputs.
-        key_array = np.array(key_array, dtype=dtype).flatten() # Side effect: breaks alias.
+        key_array = cls._adopt_array(key_array, dtype, copy)
         if satellite_array is not None:
             satellites = True # Override satellites to True if satellite_array is provided.
-            satellite_array = np.array(satellite_array).flatten() # Side effect: breaks alias.
+            satellite_array = cls._adopt_array(satellite_array, object if satellite_dtype is None else np.dtype(satellite_dtype).base, copy,
+                                               np.dtype(satellite_dtype).shape if satellite_dtype is not None else ())
         if capacity is None:
             capacity = key_array.size
         if not isinstance(capacity, int):
@@ -743,27 +1481,42 @@ class N_ary_heap:
             raise ValueError(f"capacity must be positive.\n"
                             f"capacity: {capacity}.")
 
-        # Make empty heap capable of holding the entire key_array.
-        heap = N_ary_heap(key_array.size, heap_type, overflow_off, dtype, n_ary, satellites)
-
-        # Manually override heap attributes.
+        # Make an empty heap, then give it the arrays rather than allocating and filling its own.
+        if n_ary == 'auto':
+            n_ary = choose_n_ary(dtype, capacity, N_ary_heap._uses_kernels(jit, satellites, satellite_dtype))
+        heap = N_ary_heap(1, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, jit)
         heap._key_array = key_array
-        heap._satellite_array = satellite_array
+        if satellite_array is not None:
+            heap._satellite_array = satellite_array
+        elif satellites:
+            heap._satellite_array = heap._allocate_satellites(key_array.size)
         heap._size = key_array.size
 
         # Heapify the underlying key_array.
-        n_complete_levels = heap._n_complete_levels()
-        n_incomplete_nodes = heap.get_size() - heap._n_complete_nodes()
-        largest_complete_level_size = heap._n_ary ** (n_complete_levels - 1)
-        n_parent_nodes = int(heap.get_size() - n_incomplete_nodes - largest_complete_level_size + np.ceil([n_incomplete_nodes / heap._n_ary]).item(0))
-        for index in reversed(range(n_parent_nodes)):
-            heap._sift_down(index)
+        heap._reheapify()
 
-        heap.change_capacity(capacity)
+        if capacity != key_array.size:
+            heap.change_capacity(capacity)
 
         return heap
 
 
+    @staticmethod
+    def _adopt_array(array, dtype, copy, item_shape=()):
+        """
+        Return array as an array of dtype with one row of item_shape per element, 
+        which is array itself if copy is False and it already has that form, and a copy otherwise.
+        """
+
+        if not copy and isinstance(array, np.ndarray) and array.dtype == np.dtype(dtype) and array.ndim == 1 + len(item_shape) \
+                and array.shape[1:] == tuple(item_shape) and array.flags.c_contiguous and array.flags.writeable:
+            return array
+
+        if np.dtype(dtype) == np.dtype(object):
+            return np.array(array, dtype=object).flatten() # Side effect: breaks alias.
+        return np.array(array, dtype=dtype).reshape((-1,) + tuple(item_shape)) # Side effect: breaks alias.
+
+
     def change_capacity(self, new_capacity):
         """
         Reassign the underlying self._key_array, and self._satellite_array if it is not None, to an array of the desired size.
@@ -778,6 +1531,8 @@ class N_ary_heap:
             ValueError: Raised if new_capacity is not positive.
         """
 
+        self._check_views()
+
         # Validate inputs.
         if not isinstance(new_capacity, int):
             raise TypeError(f"new_capacity must be of type int.\n"
@@ -787,14 +1542,144 @@ class N_ary_heap:
                             f"new_capacity: {new_capacity}.")
         
         if new_capacity >= len(self._key_array):
-            self._key_array = np.concatenate((self._key_array, np.full(new_capacity, np.nan, self._key_array.dtype)))
+            n_new = new_capacity - len(self._key_array)
+            self._key_array = np.concatenate((self._key_array, self._allocate(n_new, self._key_array.dtype)))
             if self._satellite_array is not None: 
-                self._satellite_array = np.concatenate((self._satellite_array, np.full(new_capacity, np.nan, self._satellite_array.dtype)))
+                self._satellite_array = np.concatenate((self._satellite_array, self._allocate_satellites(n_new)))
 
         else:
-            self._force_overflow(self.get_size() - new_capacity)
-            self._key_array = self._key_array[:self._size]
-            if self._satellite_array is not None: self._satellite_array = self._satellite_array[:self._size]
+            if self._size > new_capacity:
+                self._force_overflow(self._size - new_capacity)
+            # Copy rather than slice, so that the memory of the larger arrays is released.
+            self._key_array = np.copy(self._key_array[:new_capacity])
+            if self._satellite_array is not None: self._satellite_array = np.copy(self._satellite_array[:new_capacity])
+
+
+    def enable_instrumentation(self):
+        """
+        Start recording, for this heap only, the number of calls to each of _INSTRUMENTED_EVENTS, the number of values discarded on overflow,
+        the number of key comparisons and value exchanges, and a histogram of the number of exchanges made by each call to _sift_up or _sift_down.
+        Only calls made from outside the heap are counted, e.g. pop_many on a small batch counts one pop_many and no pops, 
+        and a push into a full heap counts one push and no replace. Comparisons and exchanges are counted wherever they happen.
+        Any previous counts are reset.
+
+        The counters are kept by wrappers bound to the instance in place of the methods they count, 
+        so a heap that is not instrumented runs exactly the same code as before and pays nothing.
+        While instrumented, sifting is always done by the interpreted methods, even if the heap was created with jit=True, 
+        and heapify-style rebuilds sift one node at a time rather than one level at a time.
+        """
+
+        self.disable_instrumentation()
+
+        counters = {event: 0 for event in self._INSTRUMENTED_EVENTS}
+        counters.update(overflow=0, comparisons=0, exchanges=0)
+        sift_depths = {}
+        self._instrumentation_counters = counters
+        self._instrumentation_sift_depths = sift_depths
+
+        # The number of counted methods currently running, so that only the outermost call of each operation is counted.
+        depth = [0]
+
+        def count_calls(event, method):
+            def counted_method(*args, **kwargs):
+                if depth[0] == 0:
+                    counters[event] += 1
+                depth[0] += 1
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    depth[0] -= 1
+            return counted_method
+
+        for event in self._INSTRUMENTED_EVENTS:
+            setattr(self, event, count_calls(event, getattr(self, event)))
+
+        # Count overflow as the number of values that were offered to the heap but are not in it afterwards.
+        # Only the outermost call counts, so that push_many pushing one value at a time is not counted twice.
+        def count_overflow(method, count_values):
+            def counted_method(*args, **kwargs):
+                if depth[0] > 0:
+                    return method(*args, **kwargs)
+                overflow = counters['overflow']
+                expected_size = self._size + count_values(*args, **kwargs)
+                output = method(*args, **kwargs)
+                counters['overflow'] = overflow + expected_size - self._size
+                return output
+            return counted_method
+
+        self.push = count_overflow(self.push, lambda *args, **kwargs: 1)
+        self.push_many = count_overflow(self.push_many, lambda new_keys, *args, **kwargs: np.size(new_keys))
+
+        is_more_extreme = self._is_more_extreme
+        def counted_is_more_extreme(key_x, key_y):
+            counters['comparisons'] += 1
+            return is_more_extreme(key_x, key_y)
+        self._is_more_extreme = counted_is_more_extreme
+
+        exchange_values = self._exchange_values
+        def counted_exchange_values(index_x, index_y):
+            counters['exchanges'] += 1
+            exchange_values(index_x, index_y)
+        self._exchange_values = counted_exchange_values
+
+        def record_depth(sift):
+            def recorded_sift(this_index):
+                exchanges = counters['exchanges']
+                sift(this_index)
+                depth = counters['exchanges'] - exchanges
+                sift_depths[depth] = sift_depths.get(depth, 0) + 1
+            return recorded_sift
+
+        # Bind the interpreted sifts of the class, since compiled kernels cannot be counted.
+        self._sift_up = record_depth(type(self)._sift_up.__get__(self))
+        self._sift_down = record_depth(type(self)._sift_down.__get__(self))
+
+
+    def disable_instrumentation(self):
+        """Stop recording, and restore the uninstrumented methods. The counts recorded so far remain available from get_instrumentation."""
+
+        for name in self._INSTRUMENTED_EVENTS + ('_exchange_values', '_sift_up', '_sift_down'):
+            self.__dict__.pop(name, None)
+
+        self._is_more_extreme = operator.lt if self._heap_type == 'min' else operator.gt
+        if self._jit:
+            self._sift_up = self._sift_up_jit
+            self._sift_down = self._sift_down_jit
+
+
+    def is_instrumented(self):
+        """
+        Returns True if this heap is recording instrumentation, else returns False.
+
+        Returns:
+            bool: True if instrumentation is enabled, False otherwise.
+        """
+
+        return '_exchange_values' in self.__dict__
+
+
+    def get_instrumentation(self, as_json=False):
+        """
+        Returns the counts recorded since instrumentation was last enabled.
+
+        Args:
+            as_json (bool, optional): If True, the counts are returned as a JSON string rather than a dict. Defaults to False.
+
+        Raises:
+            RuntimeError: Raised if instrumentation has never been enabled on this heap.
+
+        Returns:
+            dict, str: The number of calls to each of _INSTRUMENTED_EVENTS, and of 'overflow', 'comparisons' and 'exchanges', 
+                along with 'sift_depth_histogram', a dict from the number of exchanges made by a sift to the number of sifts that made them.
+        """
+
+        if not hasattr(self, '_instrumentation_counters'):
+            raise RuntimeError(f"instrumentation has not been enabled on this heap.")
+
+        instrumentation = dict(self._instrumentation_counters)
+        instrumentation['sift_depth_histogram'] = dict(sorted(self._instrumentation_sift_depths.items()))
+
+        return json.dumps(instrumentation) if as_json else instrumentation
 
 '''
   _        _         _              ____                             _      _____           _              _                     
@@ -808,8 +1693,18 @@ class N_ary_heap:
 '''
 
 class Infinite_N_ary_heap(N_ary_heap):
+    """
+    An N_ary_heap without a maximum capacity. The keys and satellites are kept in arrays like those of N_ary_heap, 
+    whose capacity doubles whenever they are full, so pushes remain amortized O(1) apart from sifting.
+    If shrink is True, the capacity is also halved whenever the heap falls to a quarter of it, 
+    so that a heap that has been drained does not hold on to its peak memory.
+    """
+
+    # The capacity is halved when the size falls to 1 / _SHRINK_RATIO of it. Halving at a quarter rather than a half prevents 
+    # alternating pushes and pops at the boundary from reallocating every time.
+    _SHRINK_RATIO = 4
 
-    def __init__(self, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=True):
+    def __init__(self, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=True, satellite_dtype=None, initial_capacity=16, shrink=False, jit=False, expected_size=None):
         """
         Create an empty heap.
         
@@ -817,70 +1712,90 @@ class Infinite_N_ary_heap(N_ary_heap):
             heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
             overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
             dtype (type, optional): The dtype of the heap. Defaults to float.
-            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            n_ary (int, str, optional): The maximum number of children for each node, or the branching factor of the tree. 
+                If 'auto', it is chosen by choose_n_ary from the measured profile for dtype and expected_size. Defaults to 2.
             satellites (bool, optional): If False, satellite data is not stored alongside the corresponding keys. Defaults to True.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            initial_capacity (int, optional): The initial capacity of the underlying arrays, below which they are never shrunk. Defaults to 16.
+            shrink (bool, optional): If True, the underlying arrays are halved whenever the heap falls to a quarter of their capacity. Defaults to False.
+            jit (bool, optional): If True, sifting is done by numba-compiled kernels where possible. Defaults to False.
+            expected_size (int, NoneType, optional): The size the heap is expected to grow to, for which n_ary='auto' is chosen. 
+                None is interpreted as initial_capacity. Defaults to None.
             
         Raises:
+            TypeError: Raised if initial_capacity is not of type int.
+            ValueError: Raised if initial_capacity is not positive.
             ValueError: Raised if heap_type is not 'min' or 'max'.
             TypeError: Raised if overflow_off is not of type str.
             ValueError: Raised if overflow_off is not 'head' or 'tail'.
             TypeError: Raised if dtype is not a type.
-            TypeError: Raised if n_ary is not of type int.
+            TypeError: Raised if n_ary is neither of type int nor 'auto'.
             ValueError: Raised if n_ary is not positive.
+            TypeError: Raised if satellite_dtype is neither None nor interpretable as a np.dtype.
+            TypeError: Raised if expected_size is neither None nor of type int.
+            ValueError: Raised if expected_size is not positive.
         """
 
-        super().__init__(1, heap_type, overflow_off, dtype, n_ary, satellites)
-        self._key_array = []
-        if self._satellite_array is not None: self._satellite_array = []
-        self._key_list = self._key_array # Aliasing for clarity.
-        self._satellite_list = self._satellite_array # Aliasing for clarity.
+        super().__init__(initial_capacity, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, jit)
+        self._initial_capacity = initial_capacity
+        self._shrink = shrink
+
+        # Validate expected_size.
+        if expected_size is None:
+            expected_size = initial_capacity
+        if not isinstance(expected_size, int):
+            raise TypeError(f"expected_size must be of type int or NoneType.\n"
+                            f"type(expected_size): {type(expected_size)}.")
+        if expected_size < 1:
+            raise ValueError(f"expected_size must be positive.\n"
+                            f"expected_size: {expected_size}.")
+
+        # The heap grows past its initial capacity, so n_ary='auto' is chosen again for the size it is expected to reach.
+        if n_ary == 'auto':
+            self._n_ary = choose_n_ary(dtype, expected_size, self._jit)
 
 
     def _force_overflow(self, num_overflow):
         """Not implemented in Infinite_N_ary_heap."""
 
         raise NotImplementedError(f"_force_overflow is not implemented in Infinite_N_ary_heap.")
-    
 
-    def get_keys(self):
-        """
-        Returns the keys stored in the underlying self._key_array, not a copy.
-        
-        Returns:
-            list: The keys in self.
-        """
-        
-        return self._key_array[:self.get_size()]
 
-    
-    def get_satellites(self):
-        """
-        Returns the satellites stored in the underlying self._satellite_array, or None if it is None. Not a copy.
-        
-        Returns:
-            list, NoneType: A copy of the satellites in self, or None if satellites are not stored.
-        """
+    def _reserve(self, min_capacity):
+        """Grow the underlying arrays geometrically until they can hold at least min_capacity values."""
 
-        if self._satellite_array is None:
-            return None
-        else:
-            return self._satellite_array[:self.get_size()]
+        capacity = len(self._key_array)
+        if min_capacity > capacity:
+            self.change_capacity(max(2 * capacity, min_capacity))
+
+
+    def _release(self):
+        """Halve the underlying arrays while the heap occupies at most a quarter of them, if shrinking is enabled."""
+
+        if not self._shrink:
+            return
+
+        capacity = len(self._key_array)
+        new_capacity = capacity
+        while new_capacity // 2 >= self._initial_capacity and self._size * self._SHRINK_RATIO <= new_capacity:
+            new_capacity //= 2
+        if new_capacity < capacity:
+            self.change_capacity(new_capacity)
 
 
     def push(self, new_key, new_satellite=None):
         """
-        Inserts new_value into the heap and restores the heap property. 
+        Inserts new_value into the heap and restores the heap property, doubling the capacity first if the heap is full.
         
         Args:
             new_key (dtype): The key to be inserted.
             new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
         """
 
-        # Add new_key and new_satellite to the first available space in the array, sift up, and increment size.
-        self._key_list.append(new_key)
-        if self._satellite_list is not None: self._satellite_list.append(new_satellite)
-        self._size += 1
-        self._sift_up(self._size - 1)
+        self._check_views()
+
+        self._reserve(self._size + 1)
+        super().push(new_key, new_satellite)
 
 
     def pop(self, get_satellite=False):
@@ -894,21 +1809,61 @@ class Infinite_N_ary_heap(N_ary_heap):
         Returns:
             dtype, tuple: The root of the heap, or None if the heap is empty.
         """
+
+        self._check_views()
     
         root = super().pop(get_satellite)
-
-        if root is not None:
-            del self._key_list[-1]
-            if self._satellite_list is not None: del self._satellite_list[-1]
+        self._release()
         
         return root
 
+
+    def push_many(self, new_keys, new_satellites=None):
+        """
+        Inserts every key in new_keys into the heap and restores the heap property, growing the capacity at most once.
+
+        If the batch is large compared to the heap, the whole heap is rebuilt bottom-up in O(n), otherwise each appended key is sifted up.
+
+        Args:
+            new_keys (np.ndarray, seq): The keys to be inserted.
+            new_satellites (seq, NoneType, optional): The corresponding satellites to be inserted, or None. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellites is provided but satellites are not stored.
+            ValueError: Raised if new_satellites does not have the same length as new_keys.
+        """
+
+        self._check_views()
+
+        self._reserve(self._size + np.size(new_keys))
+        super().push_many(new_keys, new_satellites)
+
+
+    def pop_many(self, num_pop, get_satellites=False):
+        """
+        Removes and returns up to num_pop values from the root, in the order that repeated calls to pop would return them.
+
+        Args:
+            num_pop (int): The maximum number of values to pop, minimum 1.
+            get_satellites (bool, optional): If True, rather than just the popped keys, a tuple is returned
+                whose second value is an array of the corresponding satellites, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            np.ndarray, tuple: The popped keys, most extreme first. If get_satellites is True, this is (popped_keys, popped_satellites).
+        """
+
+        self._check_views()
+
+        popped = super().pop_many(num_pop, get_satellites)
+        self._release()
+
+        return popped
+
     
     def poll(self, poll_off=1, unpack_single=True, tail_first=True, get_satellite=False):
         """
         If the heap is empty, return None. Otherwise, 
-        perform heapsort in place with self._heap_type at the root, 
-        remove the last items in the heap and return them.
+        remove the poll_off least extreme items in the heap and return them.
 
         Args:
             poll_off (int): The number of values to poll, minimum 1. Defaults to 1.
@@ -918,13 +1873,14 @@ class Infinite_N_ary_heap(N_ary_heap):
                 whose second value is the satellite corresponding to the tail key, or None if satellites are not stored. Defaults to False.
         
         Returns:
-            (dtype, tuple, list, NoneType): The last_key in the sorted heap, a list of the last_items, 
-                a tuple containing last_key(s) and last_satellite(s), or None if the heap was empty.
+            (dtype, np.ndarray, tuple, NoneType): The last key in the sorted heap, a np.ndarray containing the last keys, 
+                a tuple containing the last key(s) and the last satellite(s), or None if the heap was empty.
         """
 
+        self._check_views()
+
         tail = super().poll(poll_off, unpack_single, tail_first, get_satellite)
-        del self._key_list[-poll_off:]
-        if self._satellite_list is not None: del self._satellite_list[-poll_off:]
+        self._release()
 
         return tail
 
@@ -944,42 +1900,2818 @@ class Infinite_N_ary_heap(N_ary_heap):
 
     def change_capacity(self, new_capacity):
         """
-        Not implemented in Infinite_N_ary_heap.
+        Reassign the underlying arrays to arrays of the desired size. 
+        The capacity of an Infinite_N_ary_heap only bounds its memory until the next resize, so no values are ever discarded.
         
         Args:
-            new_capacity (int): The new capacity of the heap.
+            new_capacity (int): The new capacity of the underlying arrays.
         
         Raises:
-            NotImplementedError: This method raises a NotImplementedError in the Infinite_N_ary_heap subclass.
+            TypeError: Raised if new_capacity is not of type int.
+            ValueError: Raised if new_capacity is not positive.
+            ValueError: Raised if new_capacity is less than the size of the heap.
         """
 
-        raise NotImplementedError(f"change_capacity is not implemented in Infinite_N_ary_heap.")
+        self._check_views()
+
+        if isinstance(new_capacity, int) and new_capacity < self._size:
+            raise ValueError(f"new_capacity must not be less than the size of an Infinite_N_ary_heap.\n"
+                             f"new_capacity: {new_capacity}, self.get_size(): {self._size}.")
+
+        super().change_capacity(new_capacity)
 
 
     @classmethod
-    def heapify(cls, key_array, satellite_array=None, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=True):
+    def heapify(cls, key_array, satellite_array=None, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=True, satellite_dtype=None, shrink=False, jit=False):
         """
         Construct a heap from array.
         
         Args:
             key_array (np.ndarray): The array of keys to be made into a heap.
             satellite_array (np.ndarray, NoneType, optional): The array of satellites corresponding to the keys in key_array, or None if there are no such satellites. Defaults to None.
-            capacity (int, NoneType, optional): The capacity of the new array. None is interpreted as the size of array. Defaults to None.
             heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
             overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
             dtype (type, optional): The dtype of the heap. Defaults to float.
-            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            n_ary (int, str, optional): The maximum number of children for each node, or the branching factor of the tree. 
+                If 'auto', it is chosen by choose_n_ary from the measured profile for dtype and the size of key_array. Defaults to 2.
             satellites (bool, optional): If False, satellite data is not stored alongside the corresponding keys. Defaults to True.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            shrink (bool, optional): If True, the underlying arrays are halved whenever the heap falls to a quarter of their capacity. Defaults to False.
+            jit (bool, optional): If True, sifting is done by numba-compiled kernels where possible. Defaults to False.
 
         Returns:
             Infinite_N_ary_heap: The heap constructed from array.
         """
 
-        heap = super().heapify(key_array, satellite_array, key_array.size, heap_type, overflow_off, dtype, n_ary, satellites)
+        array_heap = N_ary_heap.heapify(key_array, satellite_array, None, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, jit)
 
-        heap._key_array = list(heap._key_array)
-        if heap._satellite_array is not None: heap._satellite_array = list(heap._satellite_array)
-        heap._key_list = heap._key_array # Aliasing for clarity.
-        heap._satellite_list = heap._satellite_array # Aliasing for clarity.
+        # Adopt the arrays of the heapified N_ary_heap, with the branching factor they were heapified with.
+        heap = cls(heap_type, overflow_off, dtype, array_heap._n_ary, array_heap._satellite_array is not None, satellite_dtype, shrink=shrink, jit=jit)
+        heap._key_array = array_heap._key_array
+        heap._satellite_array = array_heap._satellite_array
+        heap._size = array_heap._size
 
         return heap
+
+'''
+  _____               _                            _      _____           _              _                     
+ |_   _|             | |                          | |    / ____|         | |            | |                    
+   | |    _ __     __| |   ___  __  __   ___    __| |   | (___    _   _  | |__     ___  | |   __ _   ___   ___ 
+   | |   | '_ \   / _` |  / _ \ \ \/ /  / _ \  / _` |    \___ \  | | | | | '_ \   / __| | |  / _` | / __| / __|
+  _| |_  | | | | | (_| | |  __/  >  <  |  __/ | (_| |    ____) | | |_| | | |_) | | (__  | | | (_| | \__ \ \__ \
+ |_____| |_| |_|  \__,_|  \___| /_/\_\  \___|  \__,_|   |_____/   \__,_| |_.__/   \___| |_|  \__,_| |___/ |___/
+                                                                                                               
+                                                                                                               
+'''
+
+class Indexed_N_ary_heap(N_ary_heap):
+    """
+    An N_ary_heap in which every value is identified by an integer handle, so that values already in the heap can be found, re-keyed, and removed.
+    _handle_array holds the handle of the value at each position in _key_array, and _position_array holds the position of each handle, or -1 if it is not in the heap.
+    """
+
+    # Bulk pops shift keys and satellites without their handles, so values are always popped one at a time.
+    _BULK_POP_RATIO = 0
+
+    def __init__(self, capacity, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False, satellite_dtype=None, n_handles=None):
+        """
+        Create an empty heap.
+        
+        Args:
+            capacity (int): The capacity of the underlying array.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            n_handles (int, NoneType, optional): Handles must be in range(n_handles). None is interpreted as capacity. Defaults to None.
+            
+        Raises:
+            TypeError: Raised if capacity is not of type int.
+            ValueError: Raised if capacity is not positive.
+            ValueError: Raised if heap_type is not 'min' or 'max'.
+            TypeError: Raised if overflow_off is not of type str.
+            ValueError: Raised if overflow_off is not 'head' or 'tail'.
+            TypeError: Raised if dtype is not a type.
+            TypeError: Raised if n_ary is not of type int.
+            ValueError: Raised if n_ary is not positive.
+            TypeError: Raised if satellite_dtype is neither None nor interpretable as a np.dtype.
+            TypeError: Raised if n_handles is neither None nor of type int.
+            ValueError: Raised if n_handles is not positive.
+        """
+
+        super().__init__(capacity, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype)
+
+        # Validate n_handles.
+        if n_handles is None:
+            n_handles = capacity
+        if not isinstance(n_handles, int):
+            raise TypeError(f"n_handles must be of type int or NoneType.\n"
+                            f"type(n_handles): {type(n_handles)}.")
+        if n_handles < 1:
+            raise ValueError(f"n_handles must be positive.\n"
+                            f"n_handles: {n_handles}.")
+
+        self._handle_array = np.full(capacity, -1, np.int64)
+        self._position_array = np.full(n_handles, -1, np.int64)
+
+
+    def _exchange_values(self, index_x, index_y):
+        """Exchange the values (keys, satellites, and handles) at index_x and index_y, and update the positions of their handles."""
+
+        super()._exchange_values(index_x, index_y)
+        # Exchange handles.
+        handle_x = self._handle_array[index_y]
+        handle_y = self._handle_array[index_x]
+        self._handle_array[index_x] = handle_x
+        self._handle_array[index_y] = handle_y
+        # Update positions.
+        self._position_array[handle_x] = index_x
+        self._position_array[handle_y] = index_y
+
+
+    def _sort_values(self):
+        """Sort the keys, satellites, and handles in place with self._heap_type first, and update the positions of the handles."""
+
+        order = np.argsort(self._key_array[:self._size], kind='stable')
+        if self._heap_type == 'max':
+            order = order[::-1]
+
+        self._key_array[:self._size] = self._key_array[order]
+        if self._satellite_array is not None:
+            self._satellite_array[:self._size] = self._satellite_array[order]
+        self._handle_array[:self._size] = self._handle_array[order]
+        self._position_array[self._handle_array[:self._size]] = np.arange(self._size)
+
+
+    def _validate_handle(self, handle):
+        """Raise an error if handle is not an int in range(len(self._position_array))."""
+
+        if not isinstance(handle, (int, np.integer)):
+            raise TypeError(f"handle must be of type int.\n"
+                            f"type(handle): {type(handle)}.")
+        if not 0 <= handle < len(self._position_array):
+            raise ValueError(f"handle must be in range(n_handles).\n"
+                             f"handle: {handle}, n_handles: {len(self._position_array)}.")
+
+
+    def _get_position(self, handle):
+        """Return the position of handle in the heap, raising a KeyError if it is not in the heap."""
+
+        self._validate_handle(handle)
+        position = self._position_array[handle]
+        if position == -1:
+            raise KeyError(f"handle is not in the heap.\n"
+                           f"handle: {handle}.")
+
+        return position
+
+
+    @staticmethod
+    def _append_handle(value, handle, get_satellite, get_handle):
+        """Return value, extended with handle if get_handle is True. value is a key, or a (key, satellite) tuple if get_satellite is True."""
+
+        if not get_handle:
+            return value
+        if get_satellite:
+            return (*value, handle)
+        return (value, handle)
+
+
+    def _set_values(self, index, key, satellite, handle):
+        """Overwrite the values at index with key, satellite, and handle, releasing the handle previously at index."""
+
+        old_handle = self._handle_array[index]
+        if old_handle != -1 and self._position_array[old_handle] == index:
+            self._position_array[old_handle] = -1
+        self._key_array[index] = key
+        if self._satellite_array is not None: self._satellite_array[index] = satellite
+        self._handle_array[index] = handle
+        self._position_array[handle] = index
+
+
+    def _remove_at(self, index):
+        """Remove the value at index from the heap and restore the heap property."""
+
+        handle = self._handle_array[index]
+        self._exchange_values(index, self._size - 1)
+        self._size -= 1
+        self._position_array[handle] = -1
+        self._handle_array[self._size] = -1
+
+        if index < self._size:
+            # The value moved into index may belong above or below it.
+            self._sift_up(index)
+            self._sift_down(index)
+
+
+    def _change_key(self, position, new_key):
+        """Set the key at position to new_key and sift it in whichever direction restores the heap property."""
+
+        old_key = self._key_array[position]
+        self._key_array[position] = new_key
+        if self._is_more_extreme(new_key, old_key):
+            self._sift_up(position)
+        else:
+            self._sift_down(position)
+
+
+    def _exchange_handles(self, handle_x, handle_y):
+        """Exchange the positions of handle_x and handle_y, leaving the keys where they are. Both handles must be in the heap."""
+
+        position_x = self._position_array[handle_x]
+        position_y = self._position_array[handle_y]
+        self._handle_array[position_x] = handle_y
+        self._handle_array[position_y] = handle_x
+        self._position_array[handle_x] = position_y
+        self._position_array[handle_y] = position_x
+
+
+    def contains(self, handle):
+        """
+        Returns True if the value identified by handle is in the heap, else False.
+
+        Args:
+            handle (int): The handle to look up.
+
+        Returns:
+            bool: True if handle is in the heap, False if not.
+        """
+
+        self._validate_handle(handle)
+
+        return self._position_array[handle] != -1
+
+
+    def get_key(self, handle):
+        """
+        Returns the key of the value identified by handle.
+
+        Args:
+            handle (int): The handle to look up.
+
+        Raises:
+            KeyError: Raised if handle is not in the heap.
+
+        Returns:
+            dtype: The key of the value identified by handle.
+        """
+
+        return self._key_array[self._get_position(handle)]
+
+
+    def get_handles(self):
+        """
+        Returns a copy of the handles stored in the underlying self._handle_array, in the same order as get_keys.
+        
+        Returns:
+            np.ndarray: A copy of the handles in self.
+        """
+
+        return np.copy(self._handle_array[:self._size])
+
+
+    def peek(self, get_satellite=False, get_handle=False):
+        """
+        If there are values in the heap, return values starting at the root. 
+        If the heap is empty, return None.
+
+        Args:
+            get_satellite (bool, optional): If True, the satellite corresponding to the root key is also returned. Defaults to False.
+            get_handle (bool, optional): If True, the handle of the root is also returned, last. Defaults to False.
+
+        Returns:
+            (dtype, tuple, NoneType): The root key, a tuple of the root key followed by its satellite and/or handle, or None.
+        """
+
+        if self.is_empty():
+            return None
+
+        return self._append_handle(super().peek(get_satellite), self._handle_array[0], get_satellite, get_handle)
+
+
+    def pop(self, get_satellite=False, get_handle=False):
+        """
+        Gracefully removes and returns the root. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, the satellite corresponding to the root key is also returned. Defaults to False.
+            get_handle (bool, optional): If True, the handle of the root is also returned, last. Defaults to False.
+        
+        Returns:
+            dtype, tuple, NoneType: The root key, a tuple of the root key followed by its satellite and/or handle, or None if the heap is empty.
+        """
+
+        self._check_views()
+
+        if self.is_empty():
+            return None
+
+        handle = self._handle_array[0]
+        root = super().pop(get_satellite)
+        self._position_array[handle] = -1
+        self._handle_array[self._size] = -1
+
+        return self._append_handle(root, handle, get_satellite, get_handle)
+
+
+    def replace(self, new_key, handle, new_satellite=None, get_satellite=False, get_handle=False):
+        """
+        Replaces the root with new_key, identified by handle, and sifts it down. Returns the old root.
+        
+        Args:
+            new_key (dtype): The key to be inserted.
+            handle (int): The handle identifying new_key.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+            get_satellite (bool, optional): If True, the satellite corresponding to the old root key is also returned. Defaults to False.
+            get_handle (bool, optional): If True, the handle of the old root is also returned, last. Defaults to False.
+
+        Raises:
+            ValueError: Raised if handle is already in the heap.
+        
+        Returns:
+            dtype, tuple, NoneType: The root at insertion time, or None if the heap was empty.
+        """
+
+        self._check_views()
+
+        if self.is_empty():
+            self.push(new_key, handle, new_satellite)
+            return None
+
+        if self.contains(handle):
+            raise ValueError(f"handle is already in the heap.\n"
+                             f"handle: {handle}.")
+
+        root = self.peek(get_satellite, get_handle)
+        self._set_values(0, new_key, new_satellite, handle)
+        self._sift_down(0)
+
+        return root
+
+
+    def push(self, new_key, handle, new_satellite=None, get_satellite=False, get_handle=False):
+        """
+        Inserts new_key, identified by handle, into the heap and restores the heap property. 
+        
+        If the heap is already at capacity, then new_key is compared to either the head (root) or tail 
+        depending on self._overflow_off, and if new_key is less extreme in the direction of the head or tail, 
+        then that value is removed and new_key is inserted. 
+        The tail is found among the leaves without reordering the heap.
+        
+        Args:
+            new_key (dtype): The key to be inserted.
+            handle (int): The handle identifying new_key.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+            get_satellite (bool, optional): If True and self overflows, then the discarded satellite is also returned. Defaults to False.
+            get_handle (bool, optional): If True and self overflows, then the discarded handle is also returned, last. Defaults to False.
+        
+        Raises:
+            ValueError: Raised if handle is already in the heap.
+            ValueError: Raised if self._overflow_off is encountered as something other than 'head' or 'tail'.
+        
+        Returns:
+            dtype, tuple, NoneType: If the heap overflowed then the discarded value is returned, else None is returned.
+        """
+
+        self._check_views()
+
+        if self.contains(handle):
+            raise ValueError(f"handle is already in the heap.\n"
+                             f"handle: {handle}.")
+
+        if not self.is_full():
+            # Add the new values to the first available space in the array, increment size, and sift up.
+            self._set_values(self._size, new_key, new_satellite, handle)
+            self._size += 1
+            self._sift_up(self._size - 1)
+            return None
+
+        # Already at capacity. Discard and return a value.
+        rejected = self._append_handle((new_key, new_satellite) if get_satellite else new_key, handle, get_satellite, get_handle)
+        if self._overflow_off == 'head':
+            # If the root is not more extreme than new_key, do not insert new_key.
+            if not self._is_more_extreme(self._key_array[0], new_key):
+                return rejected
+            return self.replace(new_key, handle, new_satellite, get_satellite, get_handle)
+        elif self._overflow_off == 'tail':
+            tail_index = self._get_least_extreme_leaf()
+            # If the tail is at least as extreme as new_key, do not insert new_key.
+            if not self._is_more_extreme(new_key, self._key_array[tail_index]):
+                return rejected
+            tail_key = self._key_array[tail_index]
+            tail_satellite = self._get_satellite(tail_index)
+            tail = self._append_handle((tail_key, tail_satellite) if get_satellite else tail_key, self._handle_array[tail_index], get_satellite, get_handle)
+            self._set_values(tail_index, new_key, new_satellite, handle)
+            self._sift_up(tail_index)
+            return tail
+        else:
+            raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
+                             f"overflow_off: {self._overflow_off}.")
+
+
+    def push_many(self, new_keys, new_handles, new_satellites=None, get_satellites=False):
+        """
+        Inserts every key in new_keys, identified by the corresponding handle in new_handles, into the heap.
+
+        Args:
+            new_keys (np.ndarray, seq): The keys to be inserted.
+            new_handles (np.ndarray, seq): The handles identifying the keys.
+            new_satellites (seq, NoneType, optional): The corresponding satellites to be inserted, or None. Defaults to None.
+            get_satellites (bool, optional): If True, the discarded satellites are also returned. Defaults to False.
+
+        Raises:
+            ValueError: Raised if new_handles does not have the same length as new_keys.
+
+        Returns:
+            tuple: (discarded_keys, discarded_handles), two np.ndarrays that are empty if nothing overflowed, 
+                with the handles as np.int64. If get_satellites is True, this is (discarded_keys, discarded_satellites, discarded_handles).
+        """
+
+        self._check_views()
+
+        new_keys, new_satellites = self._validate_batch(new_keys, new_satellites)
+        new_handles = np.asarray(new_handles, np.int64).ravel()
+        if new_handles.size != new_keys.size:
+            raise ValueError(f"new_handles must have the same length as new_keys.\n"
+                             f"new_handles.size: {new_handles.size}, new_keys.size: {new_keys.size}.")
+
+        discarded_keys = []
+        discarded_satellites = []
+        discarded_handles = []
+        for index in range(new_keys.size):
+            satellite = new_satellites[index] if new_satellites is not None else None
+            overflow = self.push(new_keys[index], new_handles[index], satellite, True, get_handle=True)
+            if overflow is not None:
+                discarded_keys.append(overflow[0])
+                discarded_satellites.append(overflow[1])
+                discarded_handles.append(overflow[2])
+
+        discarded_keys = np.asarray(discarded_keys, self._key_array.dtype)
+        discarded_handles = np.asarray(discarded_handles, np.int64)
+        if not get_satellites:
+            return discarded_keys, discarded_handles
+        if self._satellite_array is not None:
+            satellite_array = self._allocate_satellites(len(discarded_satellites))
+            for index, satellite in enumerate(discarded_satellites):
+                satellite_array[index] = satellite
+            discarded_satellites = satellite_array
+        else:
+            discarded_satellites = None
+        return discarded_keys, discarded_satellites, discarded_handles
+
+
+    def remove(self, handle, get_satellite=False):
+        """
+        Removes and returns the value identified by handle in O(log n).
+
+        Args:
+            handle (int): The handle of the value to remove.
+            get_satellite (bool, optional): If True, rather than just the removed key, a tuple is returned 
+                whose second value is the satellite corresponding to the removed key. Defaults to False.
+
+        Raises:
+            KeyError: Raised if handle is not in the heap.
+
+        Returns:
+            dtype, tuple: The removed key. If get_satellite is True, this is (removed_key, removed_satellite).
+        """
+
+        self._check_views()
+
+        position = self._get_position(handle)
+
+        removed = self._key_array[position]
+        if get_satellite:
+            removed = (removed, self._get_satellite(position))
+
+        self._remove_at(position)
+
+        return removed
+
+
+    def decrease_key(self, handle, new_key):
+        """
+        Decreases the key of the value identified by handle to new_key and restores the heap property in O(log n).
+
+        Args:
+            handle (int): The handle of the value to re-key.
+            new_key (dtype): The new key, which must not be greater than the current key.
+
+        Raises:
+            KeyError: Raised if handle is not in the heap.
+            ValueError: Raised if new_key is greater than the current key.
+        """
+
+        self._check_views()
+
+        position = self._get_position(handle)
+        if new_key > self._key_array[position]:
+            raise ValueError(f"new_key must not be greater than the current key.\n"
+                             f"new_key: {new_key}, current key: {self._key_array[position]}.")
+
+        self._change_key(position, new_key)
+
+
+    def increase_key(self, handle, new_key):
+        """
+        Increases the key of the value identified by handle to new_key and restores the heap property in O(log n).
+
+        Args:
+            handle (int): The handle of the value to re-key.
+            new_key (dtype): The new key, which must not be less than the current key.
+
+        Raises:
+            KeyError: Raised if handle is not in the heap.
+            ValueError: Raised if new_key is less than the current key.
+        """
+
+        self._check_views()
+
+        position = self._get_position(handle)
+        if new_key < self._key_array[position]:
+            raise ValueError(f"new_key must not be less than the current key.\n"
+                             f"new_key: {new_key}, current key: {self._key_array[position]}.")
+
+        self._change_key(position, new_key)
+
+
+    def poll(self, poll_off=1, unpack_single=True, tail_first=True, get_satellite=False):
+        """
+        If the heap is empty, return None. Otherwise, 
+        sort the heap in place with self._heap_type at the root, 
+        remove the last items in the heap and return them.
+
+        Args:
+            poll_off (int): The number of values to poll, minimum 1. Defaults to 1.
+            unpack_single (bool): If True and poll_off == 1, then return the single value rather than an array. Defaults to True.
+            tail_first (bool): If True, returns values in tail-first order, else in sorted order. Defaults to True.
+            get_satellite (bool, optional): If True, rather than just the tail key(s), a tuple is returned 
+                whose second value is the satellite(s) corresponding to the tail key(s). Defaults to False.
+
+        Raises:
+            TypeError: Raised if poll_off is not of type int.
+            ValueError: Raised if poll_off is not positive.
+            RuntimeError: Raised if poll_off exceeds the size of the heap.
+        
+        Returns:
+            (dtype, np.ndarray, tuple, NoneType): The last key in the sorted heap, a np.ndarray containing the last keys, 
+                a tuple containing the last key(s) and the last satellite(s), or None if the heap was empty.
+        """
+
+        self._check_views()
+
+        # Validate inputs.
+        if not isinstance(poll_off, int):
+            raise TypeError(f"poll_off must be of type int.\n"
+                            f"type(poll_off): {type(poll_off)}.")
+        if poll_off < 1:
+            raise ValueError(f"poll_off must be positive.\n"
+                            f"poll_off: {poll_off}.")
+        if poll_off > self._size:
+            raise RuntimeError(f"poll_off must not exceed the current size of the heap.\n"
+                               f"poll_off: {poll_off}, self.get_size(): {self._size}.")
+
+        if self.is_empty():
+            return None
+
+        self._sort_values()
+
+        tail_slice = slice(self._size - poll_off, self._size)
+        tail_keys = np.copy(self._key_array[tail_slice])
+        tail_satellites = np.copy(self._satellite_array[tail_slice]) if self._satellite_array is not None else None
+        if tail_first:
+            tail_keys = np.flip(tail_keys)
+            tail_satellites = np.flip(tail_satellites) if tail_satellites is not None else None
+        if unpack_single and poll_off == 1:
+            tail_keys = tail_keys[0]
+            tail_satellites = tail_satellites[0] if tail_satellites is not None else None
+
+        # Release the polled handles.
+        self._position_array[self._handle_array[tail_slice]] = -1
+        self._handle_array[tail_slice] = -1
+        self._size -= poll_off
+
+        return (tail_keys, tail_satellites) if get_satellite else tail_keys
+
+
+    def change_capacity(self, new_capacity):
+        """
+        Reassign the underlying arrays to arrays of the desired size.
+        If the new_capacity is less than the current size of the heap, 
+        the excess elements are overflow and are discarded.
+        
+        Args:
+            new_capacity (int): The new capacity of the heap.
+        
+        Raises:
+            TypeError: Raised if new_capacity is not of type int.
+            ValueError: Raised if new_capacity is not positive.
+        """
+
+        self._check_views()
+
+        super().change_capacity(new_capacity)
+
+        # Resize self._handle_array to match self._key_array.
+        if len(self._handle_array) < len(self._key_array):
+            self._handle_array = np.concatenate((self._handle_array, np.full(len(self._key_array) - len(self._handle_array), -1, np.int64)))
+        else:
+            self._handle_array = self._handle_array[:len(self._key_array)]
+
+
+    @classmethod
+    def heapify(cls, key_array, handle_array=None, satellite_array=None, capacity=None, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False, satellite_dtype=None, n_handles=None):
+        """
+        Construct a heap from array.
+        
+        Args:
+            key_array (np.ndarray): The array of keys to be made into a heap.
+            handle_array (np.ndarray, NoneType, optional): The distinct handles identifying the keys in key_array. None is interpreted as np.arange(key_array.size). Defaults to None.
+            satellite_array (np.ndarray, NoneType, optional): The array of satellites corresponding to the keys in key_array, or None if there are no such satellites. Defaults to None.
+            capacity (int, NoneType, optional): The capacity of the new array. None is interpreted as the size of array. Defaults to None.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Overridden to True if satellite_array is provided. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            n_handles (int, NoneType, optional): Handles must be in range(n_handles). None is interpreted as the larger of capacity and one more than the largest handle. Defaults to None.
+
+        Raises:
+            ValueError: Raised if handle_array does not have the same size as key_array.
+            ValueError: Raised if handle_array contains duplicate handles.
+            ValueError: Raised if handle_array contains handles outside range(n_handles).
+
+        Returns:
+            Indexed_N_ary_heap: The heap constructed from key_array, handle_array, and optionally satellite_array.
+        """
+
+        key_array = np.array(key_array, dtype=dtype).flatten() # Side effect: breaks alias.
+        if handle_array is None:
+            handle_array = np.arange(key_array.size)
+        handle_array = np.array(handle_array, dtype=np.int64).flatten()
+        if handle_array.size != key_array.size:
+            raise ValueError(f"handle_array must have the same size as key_array.\n"
+                             f"handle_array.size: {handle_array.size}, key_array.size: {key_array.size}.")
+        if np.unique(handle_array).size != handle_array.size:
+            raise ValueError(f"handle_array must not contain duplicate handles.")
+        if satellite_array is not None:
+            satellites = True # Override satellites to True if satellite_array is provided.
+        if capacity is None:
+            capacity = key_array.size
+        if n_handles is None:
+            n_handles = max(capacity, int(handle_array.max()) + 1) if handle_array.size else capacity
+
+        # An empty key_array leaves nothing to fill.
+        if key_array.size == 0:
+            return cls(capacity, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, n_handles)
+
+        # Make an empty heap capable of holding the entire key_array, then fill it.
+        heap = cls(key_array.size, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, n_handles)
+        # Check the handles as push does, since negative handles would otherwise index _position_array from its end.
+        if handle_array.min() < 0 or handle_array.max() >= len(heap._position_array):
+            raise ValueError(f"handle_array must contain only handles in range(n_handles).\n"
+                             f"min(handle_array): {handle_array.min()}, max(handle_array): {handle_array.max()}, n_handles: {len(heap._position_array)}.")
+        heap._key_array[:] = key_array
+        if satellite_array is not None:
+            if satellite_dtype is None:
+                heap._satellite_array[:] = np.array(satellite_array).flatten()
+            else:
+                heap._satellite_array[:] = np.array(satellite_array, dtype=np.dtype(satellite_dtype).base)
+        heap._handle_array[:] = handle_array
+        heap._position_array[handle_array] = np.arange(key_array.size)
+        heap._size = key_array.size
+
+        heap._reheapify()
+        if capacity != key_array.size:
+            heap.change_capacity(capacity)
+
+        return heap
+
+'''
+  _______           _   _            _____               _                            _      _____           _              _                     
+ |__   __|         (_) | |          |_   _|             | |                          | |    / ____|         | |            | |                    
+    | |      __ _   _  | |  ______    | |    _ __     __| |   ___  __  __   ___    __| |   | (___    _   _  | |__     ___  | |   __ _   ___   ___ 
+    | |     / _` | | | | | |______|   | |   | '_ \   / _` |  / _ \ \ \/ /  / _ \  / _` |    \___ \  | | | | | '_ \   / __| | |  / _` | / __| / __|
+    | |    | (_| | | | | |           _| |_  | | | | | (_| | |  __/  >  <  |  __/ | (_| |    ____) | | |_| | | |_) | | (__  | | | (_| | \__ \ \__ \
+    |_|     \__,_| |_| |_|          |_____| |_| |_|  \__,_|  \___| /_/\_\  \___|  \__,_|   |_____/   \__,_| |_.__/   \___| |_|  \__,_| |___/ |___/
+                                                                                                                                                  
+                                                                                                                                                  
+'''
+
+class Tail_indexed_N_ary_heap(N_ary_heap):
+    """
+    An N_ary_heap with an auxiliary tail index: an Indexed_N_ary_heap of the opposite heap_type over the same keys, whose handles are positions in _key_array.
+    The least extreme value is always at the root of the tail index, so tail overflow costs O(log n), peek_tail(k) costs O(k log k), 
+    and poll(k) costs O(k log n), none of which reorder _key_array. The tail index roughly doubles the memory used by the keys.
+    """
+
+    # Bulk pops shift keys without updating the tail index, so values are always popped one at a time.
+    _BULK_POP_RATIO = 0
+
+    def __init__(self, capacity, heap_type='min', overflow_off='tail', dtype=float, n_ary=2, satellites=False, satellite_dtype=None):
+        """
+        Create an empty heap.
+        
+        Args:
+            capacity (int): The capacity of the underlying array.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'tail'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            
+        Raises:
+            TypeError: Raised if capacity is not of type int.
+            ValueError: Raised if capacity is not positive.
+            ValueError: Raised if heap_type is not 'min' or 'max'.
+            TypeError: Raised if overflow_off is not of type str.
+            ValueError: Raised if overflow_off is not 'head' or 'tail'.
+            TypeError: Raised if dtype is not a type.
+            TypeError: Raised if n_ary is not of type int.
+            ValueError: Raised if n_ary is not positive.
+            TypeError: Raised if satellite_dtype is neither None nor interpretable as a np.dtype.
+        """
+
+        super().__init__(capacity, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype)
+        self._rebuild_tail_index()
+
+
+    def _rebuild_tail_index(self):
+        """Rebuild the tail index from the keys currently in the heap in O(n)."""
+
+        tail_heap_type = 'max' if self._heap_type == 'min' else 'min'
+        capacity = len(self._key_array)
+
+        if self.is_empty():
+            self._tail_index = Indexed_N_ary_heap(capacity, tail_heap_type, 'head', self._dtype, self._n_ary, n_handles=capacity)
+        else:
+            self._tail_index = Indexed_N_ary_heap.heapify(self._key_array[:self._size], capacity=capacity, heap_type=tail_heap_type, 
+                                                          dtype=self._dtype, n_ary=self._n_ary, n_handles=capacity)
+
+
+    def _get_tail_position(self):
+        """Return the position in _key_array of the least extreme value in the heap."""
+
+        return self._tail_index._handle_array[0]
+
+
+    def _exchange_values(self, index_x, index_y):
+        """Exchange the values (keys and satellites) at index_x and index_y, and mirror the exchange in the tail index."""
+
+        super()._exchange_values(index_x, index_y)
+        self._tail_index._exchange_handles(index_x, index_y)
+
+
+    def _sort_values(self):
+        """Sort the keys, and satellites if they are stored, in place with self._heap_type first, and rebuild the tail index."""
+
+        super()._sort_values()
+        self._rebuild_tail_index()
+
+
+    def _set_values(self, index, key, satellite):
+        """Overwrite the values at index with key and satellite, updating the tail index but not restoring the heap property of the heap itself."""
+
+        self._key_array[index] = key
+        if self._satellite_array is not None: self._satellite_array[index] = satellite
+        self._tail_index._change_key(self._tail_index._position_array[index], key)
+
+
+    def _remove_at(self, index):
+        """Remove the value at index from the heap and the tail index, and restore the heap property."""
+
+        self._exchange_values(index, self._size - 1)
+        self._size -= 1
+        self._tail_index.remove(self._size)
+
+        if index < self._size:
+            # The value moved into index may belong above or below it.
+            self._sift_up(index)
+            self._sift_down(index)
+
+
+    def _get_tail_indices(self, num_tail):
+        """
+        Return the indices of the num_tail least extreme values in the heap in sorted order, i.e. with the least extreme last.
+        The tail index is explored best-first from its root with a small frontier heap, in O(num_tail log num_tail).
+        """
+
+        tail_keys = self._tail_index._key_array
+        tail_size = self._tail_index.get_size()
+        frontier = N_ary_heap(num_tail * self._n_ary + 1, self._tail_index._heap_type, dtype=self._dtype, satellite_dtype=np.int64)
+        frontier.push(tail_keys[0], 0)
+
+        tail_indices = np.empty(num_tail, np.int64)
+        for tail_index in range(num_tail):
+            _, tail_position = frontier.pop(get_satellite=True)
+            tail_indices[tail_index] = self._tail_index._handle_array[tail_position]
+            first_child = self._n_ary * tail_position + 1
+            for child in range(first_child, min(first_child + self._n_ary, tail_size)):
+                frontier.push(tail_keys[child], child)
+
+        return tail_indices[::-1]
+
+
+    def pop(self, get_satellite=False):
+        """
+        Gracefully removes and returns the root. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the root key, a tuple is returned 
+                whose second value is the satellite corresponding to the root key, or None if satellites are not stored. Defaults to False.
+        
+        Returns:
+            dtype, tuple: The root of the heap, or None if the heap is empty. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
+        """
+
+        self._check_views()
+
+        if self.is_empty():
+            return None
+
+        root = self.peek(get_satellite)
+        self._remove_at(0)
+
+        return root
+
+
+    def replace(self, new_key, new_satellite=None, get_satellite=False):
+        """
+        Replaces the root with new_value and sifts it down. Returns the old root.
+        
+        Args:
+            new_key (dtype): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+            get_satellite (bool, optional): If True, rather than just the root key, a tuple is returned 
+                whose second value is the satellite corresponding to the root key, or None if satellites are not stored. Defaults to False.
+        
+        Returns:
+            dtype, tuple: The root at insertion time. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
+        """
+
+        self._check_views()
+
+        if self.is_empty():
+            self.push(new_key, new_satellite)
+            return None
+
+        root = self.peek(get_satellite)
+        self._set_values(0, new_key, new_satellite)
+        self._sift_down(0)
+
+        return root
+
+
+    def poll(self, poll_off=1, unpack_single=True, tail_first=True, get_satellite=False):
+        """
+        If the heap is empty, return None. Otherwise, 
+        remove the poll_off least extreme items in the heap and return them, in O(poll_off log n) and without sorting the heap.
+
+        Args:
+            poll_off (int): The number of values to poll, minimum 1. Defaults to 1.
+            unpack_single (bool): If True and poll_off == 1, then return the single value rather than a list. Defaults to True.
+            tail_first (bool): If True, returns values in tail-first order, else in sorted order. Defaults to True.
+            get_satellite (bool, optional): If True, rather than just the tail key(s), a tuple is returned 
+                whose second value is the satellite(s) corresponding to the tail key(s), or None if satellites are not stored. Defaults to False.
+        
+        Returns:
+            (dtype, np.ndarray, tuple, NoneType): The last key in the sorted heap, a np.ndarray containing the last keys, 
+                a tuple containing the last key(s) and the last satellite(s), or None if the heap was empty.
+        """
+
+        self._check_views()
+
+        tail = self.peek_tail(poll_off, unpack_single, tail_first, get_satellite)
+        if tail is None:
+            return None
+
+        for _ in range(poll_off):
+            self._remove_at(self._get_tail_position())
+
+        return tail
+
+
+    def push(self, new_key, new_satellite=None, get_satellite=False):
+        """
+        Inserts new_key into the heap and restores the heap property. 
+        
+        If the heap is already at capacity, then new_key is compared to either the head (root) or tail 
+        depending on self._overflow_off, and if new_key is less extreme in the direction of the head or tail, 
+        then that value is removed and new_key is inserted. The tail is read from the root of the tail index.
+        
+        Args:
+            new_key (dtype): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+            get_satellite (bool, optional): If True and self overflows, then the discarded satellite is also returned. Defaults to False.
+        
+        Raises:
+            ValueError: Raised if self._overflow_off is encountered as something other than 'head' or 'tail'.
+        
+        Returns:
+            dtype, tuple, NoneType: If the heap overflowed then the discarded value is returned, else None is returned.
+        """
+
+        self._check_views()
+
+        if not self.is_full():
+            # Add the new values to the first available space in the array and the tail index, increment size, and sift up.
+            self._key_array[self._size] = new_key
+            if self._satellite_array is not None: self._satellite_array[self._size] = new_satellite
+            self._tail_index.push(new_key, self._size)
+            self._size += 1
+            self._sift_up(self._size - 1)
+            return None
+
+        # Already at capacity. Discard and return a value.
+        if self._overflow_off == 'head':
+            # If the root is not more extreme than new_key, do not insert new_key.
+            if not self._is_more_extreme(self._key_array[0], new_key):
+                return (new_key, new_satellite) if get_satellite else new_key
+            return self.replace(new_key, new_satellite, get_satellite)
+        elif self._overflow_off == 'tail':
+            tail_index = self._get_tail_position()
+            tail_key = self._key_array[tail_index]
+            # If the tail is at least as extreme as new_key, do not insert new_key.
+            if not self._is_more_extreme(new_key, tail_key):
+                return (new_key, new_satellite) if get_satellite else new_key
+            tail = (tail_key, self._get_satellite(tail_index)) if get_satellite else tail_key
+            self._set_values(tail_index, new_key, new_satellite)
+            self._sift_up(tail_index)
+            return tail
+        else:
+            raise ValueError(f"overflow_off must be either 'head' or 'tail'.\n"
+                             f"overflow_off: {self._overflow_off}.")
+
+
+    def push_many(self, new_keys, new_satellites=None, get_satellites=False):
+        """
+        Inserts every key in new_keys into the heap one at a time, validating the batch only once.
+
+        Args:
+            new_keys (np.ndarray, seq): The keys to be inserted.
+            new_satellites (seq, NoneType, optional): The corresponding satellites to be inserted, or None. Defaults to None.
+            get_satellites (bool, optional): If True, the discarded satellites are also returned. Defaults to False.
+
+        Raises:
+            ValueError: Raised if new_satellites is provided but satellites are not stored.
+            ValueError: Raised if new_satellites does not have the same length as new_keys.
+
+        Returns:
+            np.ndarray, tuple: The discarded keys, which is empty if nothing overflowed. If get_satellites is True, this is (discarded_keys, discarded_satellites).
+        """
+
+        self._check_views()
+
+        new_keys, new_satellites = self._validate_batch(new_keys, new_satellites)
+
+        discarded_indices = []
+        discarded_keys = np.empty_like(new_keys)
+        discarded_satellites = self._allocate_satellites(new_keys.size) if new_satellites is not None else None
+        for index in range(new_keys.size):
+            satellite = new_satellites[index] if new_satellites is not None else None
+            overflow = self.push(new_keys[index], satellite, get_satellite=True)
+            if overflow is not None:
+                discarded_keys[len(discarded_indices)] = overflow[0]
+                if discarded_satellites is not None: discarded_satellites[len(discarded_indices)] = overflow[1]
+                discarded_indices.append(index)
+
+        n_discarded = len(discarded_indices)
+        discarded_keys = discarded_keys[:n_discarded]
+        discarded_satellites = discarded_satellites[:n_discarded] if discarded_satellites is not None else None
+
+        return (discarded_keys, discarded_satellites) if get_satellites else discarded_keys
+
+
+    def change_capacity(self, new_capacity):
+        """
+        Reassign the underlying arrays to arrays of the desired size and rebuild the tail index.
+        If the new_capacity is less than the current size of the heap, 
+        the excess elements are overflow and are discarded.
+        
+        Args:
+            new_capacity (int): The new capacity of the heap.
+        
+        Raises:
+            TypeError: Raised if new_capacity is not of type int.
+            ValueError: Raised if new_capacity is not positive.
+        """
+
+        self._check_views()
+
+        super().change_capacity(new_capacity)
+        self._rebuild_tail_index()
+
+
+    @classmethod
+    def heapify(cls, key_array, satellite_array=None, capacity=None, heap_type='min', overflow_off='tail', dtype=float, n_ary=2, satellites=False, satellite_dtype=None):
+        """
+        Construct a heap from array.
+        
+        Args:
+            key_array (np.ndarray): The array of keys to be made into a heap.
+            satellite_array (np.ndarray, NoneType, optional): The array of satellites corresponding to the keys in key_array, or None if there are no such satellites. Defaults to None.
+            capacity (int, NoneType, optional): The capacity of the new array. None is interpreted as the size of array. Defaults to None.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'tail'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Overridden to True if satellite_array is provided. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+
+        Returns:
+            Tail_indexed_N_ary_heap: The heap constructed from key_array and optionally satellite_array.
+        """
+
+        key_array = np.array(key_array, dtype=dtype).flatten() # Side effect: breaks alias.
+        if satellite_array is not None:
+            satellites = True # Override satellites to True if satellite_array is provided.
+        if capacity is None:
+            capacity = key_array.size
+
+        # Make an empty heap capable of holding the entire key_array, then fill it.
+        heap = cls(key_array.size, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype)
+        heap._key_array[:] = key_array
+        if satellite_array is not None:
+            if satellite_dtype is None:
+                heap._satellite_array[:] = np.array(satellite_array).flatten()
+            else:
+                heap._satellite_array[:] = np.array(satellite_array, dtype=np.dtype(satellite_dtype).base)
+        heap._size = key_array.size
+
+        # Index the unordered keys, then heapify them while mirroring every exchange in the tail index.
+        heap._rebuild_tail_index()
+        heap._reheapify()
+        if capacity != key_array.size:
+            heap.change_capacity(capacity)
+
+        return heap
+
+
+'''
+   _____   _                                       _                      _____          _                 _     _                 
+  / ____| | |                                     (_)                    / ____|        | |               | |   (_)                
+ | (___   | |_   _ __    ___    __ _   _ __ ___    _   _ __     __ _    | (___     ___  | |   ___    ___  | |_   _    ___    _ __  
+  \___ \  | __| | '__|  / _ \  / _` | | '_ ` _ \  | | | '_ \   / _` |    \___ \   / _ \ | |  / _ \  / __| | __| | |  / _ \  | '_ \ 
+  ____) | | |_  | |    |  __/ | (_| | | | | | | | | | | | | | | (_| |    ____) | |  __/ | | |  __/ | (__  | |_  | | | (_) | | | | |
+ |_____/   \__| |_|     \___|  \__,_| |_| |_| |_| |_| |_| |_|  \__, |   |_____/   \___| |_|  \___|  \___|  \__| |_|  \___/  |_| |_|
+                                                                __/ |                                                              
+                                                               |___/                                                               
+'''
+
+def top_k(iterable, k, key=None, heap_type='min', chunk_size=4096, dtype=float, n_ary=2):
+    """
+    Return the k most extreme items of iterable in sorted order, reading it one chunk at a time so that it need not fit in memory.
+
+    The items are held in a bounded N_ary_heap of the opposite heap_type, whose root is the least extreme item kept so far.
+    Once the heap is full, each chunk of keys is compared against the root in a single vectorized comparison 
+    and only the survivors are pushed, so most chunks of a long stream are rejected without touching the heap.
+    Survivors are pushed in batches of at least k, which push_many merges into the heap in O(k) rather than O(k log k).
+
+    Args:
+        iterable (iterable): The items to select from.
+        k (int): The number of items to select.
+        key (callable, NoneType, optional): A function returning the key of an item. If None, the items are the keys. Defaults to None.
+        heap_type (str, optional): Either 'min' to select the k smallest items, or 'max' to select the k largest items. Defaults to 'min'.
+        chunk_size (int, optional): The number of items read from iterable at a time. Defaults to 4096.
+        dtype (type, optional): The dtype of the keys. Defaults to float.
+        n_ary (int, optional): The branching factor of the underlying heap. Defaults to 2.
+
+    Raises:
+        TypeError: Raised if k is not of type int.
+        ValueError: Raised if k is not positive.
+        ValueError: Raised if heap_type is not 'min' or 'max'.
+        TypeError: Raised if chunk_size is not of type int.
+        ValueError: Raised if chunk_size is not positive.
+
+    Returns:
+        np.ndarray, list: If key is None, a np.ndarray of the k most extreme keys. Otherwise, a list of the k most extreme items. 
+            Either is sorted with the most extreme first, and is shorter than k if iterable is.
+    """
+
+    # Validate k.
+    if not isinstance(k, int):
+        raise TypeError(f"k must be of type int.\n"
+                        f"type(k): {type(k)}.")
+    if k < 1:
+        raise ValueError(f"k must be positive.\n"
+                         f"k: {k}.")
+
+    # Validate heap_type.
+    if heap_type not in ['min', 'max']:
+        raise ValueError(f"heap_type must be either 'min' or 'max'.\n"
+                         f"heap_type: {heap_type}.")
+
+    # Validate chunk_size.
+    if not isinstance(chunk_size, int):
+        raise TypeError(f"chunk_size must be of type int.\n"
+                        f"type(chunk_size): {type(chunk_size)}.")
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be positive.\n"
+                         f"chunk_size: {chunk_size}.")
+
+    # Keeping the k smallest discards the largest, so the heap is a max heap that overflows off its head, and vice versa.
+    heap = N_ary_heap(k, 'max' if heap_type == 'min' else 'min', 'head', dtype, n_ary, satellites=key is not None)
+    survives = operator.lt if heap_type == 'min' else operator.gt
+
+    iterator = iter(iterable)
+    pending_keys, pending_items, n_pending = [], [], 0
+    while True:
+        if key is None:
+            chunk_keys = np.fromiter(islice(iterator, chunk_size), dtype)
+            chunk = None
+        else:
+            chunk = list(islice(iterator, chunk_size))
+            chunk_keys = np.fromiter(map(key, chunk), dtype, len(chunk))
+        if chunk_keys.size == 0:
+            break
+
+        # Reject every key that is not more extreme than the least extreme key kept so far.
+        if heap.is_full():
+            survivors = np.flatnonzero(survives(chunk_keys, heap.peek()))
+            if survivors.size == 0:
+                continue
+            chunk_keys = chunk_keys[survivors]
+            if chunk is not None:
+                chunk = [chunk[index] for index in survivors]
+
+        # Survivors are buffered until there are at least k of them, so that push_many can merge them in bulk rather than one at a time.
+        pending_keys.append(chunk_keys)
+        if chunk is not None: pending_items.extend(chunk)
+        n_pending += chunk_keys.size
+        if n_pending >= k or not heap.is_full():
+            heap.push_many(np.concatenate(pending_keys), pending_items if key is not None else None)
+            pending_keys, pending_items, n_pending = [], [], 0
+
+    if n_pending:
+        heap.push_many(np.concatenate(pending_keys), pending_items if key is not None else None)
+
+    output = heap.heapsort(min_or_max_first=heap_type, get_satellites=key is not None)
+    if key is None:
+        return output
+    return list(output[:, 1])
+
+
+def _read_blocks(iterable, block_size, key=None, dtype=float):
+    """
+    Yield consecutive blocks of at most block_size items from iterable as (keys, items), where keys is a np.ndarray of dtype, 
+    and items is a list of the items if key is provided, or None if the items are the keys.
+    Arrays, including np.memmap arrays, are sliced rather than iterated.
+    """
+
+    if key is None and isinstance(iterable, np.ndarray):
+        for start in range(0, len(iterable), block_size):
+            yield np.asarray(iterable[start:start + block_size], dtype), None
+        return
+
+    iterator = iter(iterable)
+    while True:
+        if key is None:
+            items = None
+            keys = np.fromiter(islice(iterator, block_size), dtype)
+        else:
+            items = list(islice(iterator, block_size))
+            keys = np.fromiter(map(key, items), dtype, len(items))
+        if keys.size == 0:
+            return
+        yield keys, items
+
+
+def merge_sorted(iterables, n_ary=2, key=None, heap_type='min', block_size=4096, dtype=float):
+    """
+    Lazily merge sorted iterables into a single sorted iterator, like heapq.merge.
+
+    Each run is read in blocks of block_size, and the last key of each run's current block is kept in an N_ary_heap 
+    whose satellites are run indices. The root is therefore the earliest point at which some block runs out, 
+    and every buffered item up to it can be merged at once: each block is cut with np.searchsorted, 
+    and the pieces are concatenated in run order and stably sorted. The run at the root then reads its next block, 
+    whose last key replaces the root. Equal keys are yielded in run order, as in heapq.merge.
+
+    Args:
+        iterables (seq): The runs to merge, each sorted with the most extreme key first in the direction indicated by heap_type.
+        n_ary (int, optional): The branching factor of the heap of runs. Defaults to 2.
+        key (callable, NoneType, optional): A function returning the key of an item. If None, the items are the keys. Defaults to None.
+        heap_type (str, optional): Either 'min' to merge ascending runs, or 'max' to merge descending runs. Defaults to 'min'.
+        block_size (int, optional): The number of items read from a run at a time. Defaults to 4096.
+        dtype (type, optional): The dtype of the keys. Defaults to float.
+
+    Raises:
+        ValueError: Raised if heap_type is not 'min' or 'max'.
+        TypeError: Raised if block_size is not of type int.
+        ValueError: Raised if block_size is not positive.
+
+    Yields:
+        object: The merged items. If key is None, these are the keys converted to Python scalars.
+    """
+
+    # Validate heap_type.
+    if heap_type not in ['min', 'max']:
+        raise ValueError(f"heap_type must be either 'min' or 'max'.\n"
+                         f"heap_type: {heap_type}.")
+
+    # Validate block_size.
+    if not isinstance(block_size, int):
+        raise TypeError(f"block_size must be of type int.\n"
+                        f"type(block_size): {type(block_size)}.")
+    if block_size < 1:
+        raise ValueError(f"block_size must be positive.\n"
+                         f"block_size: {block_size}.")
+
+    readers = [_read_blocks(iterable, block_size, key, dtype) for iterable in iterables]
+    if not readers:
+        return
+
+    # np.searchsorted and np.argsort are ascending, so descending runs are searched and sorted by their negations.
+    sign = 1 if heap_type == 'min' else -1
+    blocks = [None] * len(readers)
+    search_keys = [None] * len(readers)
+    positions = [0] * len(readers)
+    # The next unread search key of each run, so that runs with nothing to contribute to a cut are skipped in one comparison.
+    run_indices = np.arange(len(readers))
+    next_keys = np.zeros(len(readers), dtype)
+    active = np.zeros(len(readers), bool)
+
+    def next_block(run):
+        """Load the next block of run and return whether it had one."""
+
+        block = next(readers[run], None)
+        blocks[run] = block
+        active[run] = block is not None
+        if block is None:
+            return False
+        search_keys[run] = block[0] if sign == 1 else -block[0]
+        positions[run] = 0
+        next_keys[run] = search_keys[run][0]
+        return True
+
+    heap = N_ary_heap(len(readers), heap_type, 'head', dtype, n_ary, satellite_dtype=np.int64)
+    for run in range(len(readers)):
+        if next_block(run):
+            heap.push(blocks[run][0][-1], run)
+
+    while not heap.is_empty():
+        # Among the runs whose blocks end at the root key, the one that comes first must be the one at the root.
+        # Exchanging equal keys preserves the heap property.
+        tied = np.flatnonzero(heap._key_array[:heap.get_size()] == heap.peek())
+        if tied.size > 1:
+            heap._exchange_values(0, tied[np.argmin(heap._satellite_array[tied])])
+        root_run = int(heap._satellite_array[0])
+
+        # Cut every block at the root key. Keys equal to it are taken from the root run and the runs before it, 
+        # since any equal keys still unread belong to the root run or to runs after it.
+        threshold = sign * heap.peek()
+        piece_keys = []
+        piece_items = []
+        contributing = np.flatnonzero(active & ((next_keys < threshold) | ((next_keys == threshold) & (run_indices <= root_run))))
+        for run in contributing.tolist():
+            position = positions[run]
+            side = 'right' if run <= root_run else 'left'
+            end = int(np.searchsorted(search_keys[run], threshold, side))
+            keys, items = blocks[run]
+            piece_keys.append(keys[position:end])
+            if items is not None: piece_items.extend(items[position:end])
+            positions[run] = end
+            if end < len(keys): next_keys[run] = search_keys[run][end]
+
+        merged_keys = np.concatenate(piece_keys)
+        order = np.argsort(sign * merged_keys, kind='stable')
+        if key is None:
+            yield from merged_keys[order].tolist()
+        else:
+            yield from (piece_items[index] for index in order)
+
+        # The root run's block has been used up.
+        if next_block(root_run):
+            heap.replace(blocks[root_run][0][-1], root_run)
+        else:
+            heap.pop()
+
+'''
+   _____                                                               _      __          __                                             
+  / ____|                                                             | |     \ \        / /                                             
+ | |        ___    _ __     ___   _   _   _ __   _ __    ___   _ __   | |_     \ \  /\  / /   _ __    __ _   _ __    _ __     ___   _ __ 
+ | |       / _ \  | '_ \   / __| | | | | | '__| | '__|  / _ \ | '_ \  | __|     \ \/  \/ /   | '__|  / _` | | '_ \  | '_ \   / _ \ | '__|
+ | |____  | (_) | | | | | | (__  | |_| | | |    | |    |  __/ | | | | | |_       \  /\  /    | |    | (_| | | |_) | | |_) | |  __/ | |   
+  \_____|  \___/  |_| |_|  \___|  \__,_| |_|    |_|     \___| |_| |_|  \__|       \/  \/     |_|     \__,_| | .__/  | .__/   \___| |_|   
+                                                                                                            | |     | |                  
+                                                                                                            |_|     |_|                  
+'''
+
+class _Push_buffer:
+    """The values pushed by one producer thread that have not yet been merged into the heap, and that thread's counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []
+        self.satellites = []
+        self.n_pushed = 0
+        # A weak reference, so that the buffer does not keep its finished thread alive.
+        self.owner = weakref.ref(threading.current_thread())
+
+
+    def is_retired(self):
+        """Return True if the owning thread has finished and every value it pushed has been merged, so that the buffer can never be used again."""
+
+        owner = self.owner()
+        return (owner is None or not owner.is_alive()) and not self.keys
+
+
+class Concurrent_N_ary_heap:
+    """
+    A thread-safe priority queue for many producer threads and any number of consumer threads, wrapping an N_ary_heap.
+
+    Each producer pushes into its own buffer, guarded by a lock that only it and a merging consumer ever take,
+    so producers do not contend with one another. A buffer is merged into the heap with a single push_many 
+    once it holds buffer_size values, and every buffer is merged before each peek and pop, 
+    so consumers always see the most extreme of all values pushed so far.
+
+    Locks are always taken heap first, then buffer, so merges cannot deadlock.
+
+    The buffers of finished threads are dropped once merged, whenever another thread registers its buffer, 
+    so that with thread churn the buffers walked by each merge are bounded by the number of live producers.
+
+    Buffering speeds up pushes, since producers rarely take the heap lock, but not the queue as a whole: 
+    every value is still popped one at a time under the heap lock, so with one consumer the end-to-end throughput 
+    is bounded by pop, much as with an N_ary_heap behind a single global lock.
+    """
+
+    def __init__(self, capacity, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellites=False, satellite_dtype=None, buffer_size=256, jit=False):
+        """
+        Create an empty heap.
+        
+        Args:
+            capacity (int): The capacity of the underlying array.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are merged when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, optional): The maximum number of children for each node, or the branching factor of the tree. Defaults to 2.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites are stored in a typed array of this dtype. Defaults to None.
+            buffer_size (int, optional): The number of values a producer buffers before merging them into the heap. Defaults to 256.
+            jit (bool, optional): If True and numba is installed, the wrapped heap sifts with compiled kernels, 
+                which shortens the time consumers hold the heap lock in each pop. Defaults to False.
+            
+        Raises:
+            TypeError: Raised if buffer_size is not of type int.
+            ValueError: Raised if buffer_size is not positive.
+            See N_ary_heap for the validation of the other arguments.
+        """
+
+        # Validate buffer_size.
+        if not isinstance(buffer_size, int):
+            raise TypeError(f"buffer_size must be of type int.\n"
+                            f"type(buffer_size): {type(buffer_size)}.")
+        if buffer_size < 1:
+            raise ValueError(f"buffer_size must be positive.\n"
+                             f"buffer_size: {buffer_size}.")
+
+        self._heap = N_ary_heap(capacity, heap_type, overflow_off, dtype, n_ary, satellites, satellite_dtype, jit)
+        self._buffer_size = buffer_size
+        self._heap_lock = threading.Lock()
+        self._local = threading.local()
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+        # The number of values pushed by threads whose buffers have been dropped, updated only while holding the registration lock.
+        self._n_pushed_retired = 0
+
+        # Counters, updated only while holding the heap lock.
+        self._n_popped = 0
+        self._n_discarded = 0
+        self._n_merges = 0
+        self._n_merged = 0
+        self._start_time = perf_counter()
+
+
+    def _get_buffer(self):
+        """Return the calling thread's buffer, registering a new one on its first push and dropping the buffers of finished threads."""
+
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = _Push_buffer()
+            with self._buffers_lock:
+                # A retired buffer stays empty, so it can be dropped without its lock. 
+                # The list is replaced rather than mutated, so merges iterating over the old one are unaffected.
+                retired = [old_buffer for old_buffer in self._buffers if old_buffer.is_retired()]
+                self._n_pushed_retired += sum(old_buffer.n_pushed for old_buffer in retired)
+                self._buffers = [old_buffer for old_buffer in self._buffers if old_buffer not in retired] + [buffer]
+            self._local.buffer = buffer
+            return buffer
+
+
+    def _merge_buffer(self, buffer):
+        """Merge the values in buffer into the heap. The heap lock must be held by the caller."""
+
+        with buffer.lock:
+            if not buffer.keys:
+                return
+            keys, buffer.keys = buffer.keys, []
+            satellites, buffer.satellites = buffer.satellites, []
+
+        try:
+            discarded_keys = self._heap.push_many(keys, satellites if self._heap._satellite_array is not None else None)
+        except BaseException:
+            # Put the values back ahead of any pushed since, so that they are not lost.
+            with buffer.lock:
+                buffer.keys = keys + buffer.keys
+                buffer.satellites = satellites + buffer.satellites
+            raise
+        self._n_discarded += discarded_keys.size
+        self._n_merges += 1
+        self._n_merged += len(keys)
+
+
+    def _merge_all(self):
+        """Merge every buffer into the heap. The heap lock must be held by the caller."""
+
+        # Registration replaces the list rather than mutating it, so it can be read without the registration lock,
+        # and an empty buffer can be skipped without taking its lock.
+        for buffer in self._buffers:
+            if buffer.keys:
+                self._merge_buffer(buffer)
+
+
+    def push(self, new_key, new_satellite=None):
+        """
+        Buffers new_key for insertion into the heap. The buffer is merged into the heap once it is full, 
+        or when a consumer next peeks or pops. Discarded values are only counted, since overflow is resolved at merge time.
+
+        Args:
+            new_key (dtype): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellite is provided but satellites are not stored.
+            ValueError: Raised if new_key is not a single key.
+            ValueError, TypeError: Raised if new_key or new_satellite cannot be converted to the dtypes of the heap.
+        """
+
+        # Validate the value here, in the producer, since a value that fails at merge time would fail the whole merge.
+        new_keys, new_satellites = self._heap._validate_batch([new_key], None if new_satellite is None else [new_satellite])
+        if new_keys.size != 1:
+            raise ValueError(f"new_key must be a single key.\n"
+                             f"new_key: {new_key}.")
+
+        buffer = self._get_buffer()
+        with buffer.lock:
+            buffer.keys.append(new_keys[0])
+            buffer.satellites.append(new_satellites[0] if new_satellites is not None else None)
+            buffer.n_pushed += 1
+            full = len(buffer.keys) >= self._buffer_size
+
+        if full:
+            with self._heap_lock:
+                self._merge_buffer(buffer)
+
+
+    def push_many(self, new_keys, new_satellites=None):
+        """
+        Inserts every key in new_keys into the heap, along with any values buffered by the calling thread.
+
+        Args:
+            new_keys (np.ndarray, seq): The keys to be inserted.
+            new_satellites (seq, NoneType, optional): The corresponding satellites to be inserted, or None. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellites is provided but satellites are not stored.
+            ValueError: Raised if new_satellites does not have the same length as new_keys.
+        """
+
+        new_keys, new_satellites = self._heap._validate_batch(new_keys, new_satellites)
+        buffer = self._get_buffer()
+        with self._heap_lock:
+            # Merge the buffer first so that this thread's values reach the heap in the order they were pushed.
+            self._merge_buffer(buffer)
+            discarded_keys = self._heap.push_many(new_keys, new_satellites)
+            self._n_discarded += discarded_keys.size
+            self._n_merges += 1
+            self._n_merged += new_keys.size
+            # Counted under the heap lock, so that get_counters never sees these values popped before they are pushed.
+            with buffer.lock:
+                buffer.n_pushed += new_keys.size
+
+
+    def flush(self):
+        """Merge the values buffered by every thread into the heap."""
+
+        with self._heap_lock:
+            self._merge_all()
+
+
+    def pop(self, get_satellite=False):
+        """
+        Merges every buffer, then removes and returns the root. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the root key, a tuple is returned 
+                whose second value is the satellite corresponding to the root key, or None if satellites are not stored. Defaults to False.
+        
+        Returns:
+            dtype, tuple, NoneType: The root of the heap, or None if the heap is empty. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
+        """
+
+        with self._heap_lock:
+            self._merge_all()
+            root = self._heap.pop(get_satellite)
+            if root is not None:
+                self._n_popped += 1
+        return root
+
+
+    def pop_many(self, num_pop, get_satellites=False):
+        """
+        Merges every buffer, then removes and returns up to num_pop values from the root.
+
+        Args:
+            num_pop (int): The maximum number of values to pop, minimum 1.
+            get_satellites (bool, optional): If True, rather than just the popped keys, a tuple is returned
+                whose second value is an array of the corresponding satellites, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            np.ndarray, tuple: The popped keys, most extreme first. If get_satellites is True, this is (popped_keys, popped_satellites).
+        """
+
+        with self._heap_lock:
+            self._merge_all()
+            popped = self._heap.pop_many(num_pop, get_satellites)
+            self._n_popped += (popped[0] if get_satellites else popped).size
+        return popped
+
+
+    def peek(self, get_satellite=False):
+        """
+        Merges every buffer, then returns the root without removing it. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the root key, a tuple is returned 
+                whose second value is the satellite corresponding to the root key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            dtype, tuple, NoneType: The root of the heap, or None if the heap is empty. If get_satellite is False, this is just root_key. Otherwise, this is (root_key, root_satellite).
+        """
+
+        with self._heap_lock:
+            self._merge_all()
+            return self._heap.peek(get_satellite)
+
+
+    def get_size(self):
+        """
+        Merges every buffer, then returns the number of values in the heap.
+
+        Returns:
+            int: The number of values in the heap.
+        """
+
+        with self._heap_lock:
+            self._merge_all()
+            return self._heap.get_size()
+
+
+    def is_empty(self):
+        """
+        Merges every buffer, then returns whether the heap is empty.
+
+        Returns:
+            bool: True if the heap is empty, False otherwise.
+        """
+
+        return self.get_size() == 0
+
+
+    def get_counters(self):
+        """
+        Returns a snapshot of the throughput counters.
+
+        Returns:
+            dict: The number of values pushed, popped, discarded on overflow and still buffered, 
+                the number of merges into the heap and the mean number of values per merge,
+                and the push and pop throughput in values per second since the heap was created.
+        """
+
+        with self._heap_lock:
+            with self._buffers_lock:
+                buffers = list(self._buffers)
+                n_pushed = self._n_pushed_retired
+            n_buffered = 0
+            for buffer in buffers:
+                with buffer.lock:
+                    n_pushed += buffer.n_pushed
+                    n_buffered += len(buffer.keys)
+            elapsed = perf_counter() - self._start_time
+
+            return {
+                'pushed': n_pushed,
+                'popped': self._n_popped,
+                'discarded': self._n_discarded,
+                'buffered': n_buffered,
+                'merges': self._n_merges,
+                'mean_merge_size': self._n_merged / self._n_merges if self._n_merges else 0.0,
+                'elapsed': elapsed,
+                'push_throughput': n_pushed / elapsed,
+                'pop_throughput': self._n_popped / elapsed,
+            }
+
+
+'''
+  _____                        _         _                    _        _____           _              _                     
+ |  __ \                      (_)       | |                  | |      / ____|         | |            | |                    
+ | |__) |   ___   _ __   ___   _   ___  | |_    ___   _ __   | |_    | (___    _   _  | |__     ___  | |   __ _   ___   ___ 
+ |  ___/   / _ \ | '__| / __| | | / __| | __|  / _ \ | '_ \  | __|    \___ \  | | | | | '_ \   / __| | |  / _` | / __| / __|
+ | |      |  __/ | |    \__ \ | | \__ \ | |_  |  __/ | | | | | |_     ____) | | |_| | | |_) | | (__  | | | (_| | \__ \ \__ \
+ |_|       \___| |_|    |___/ |_| |___/  \__|  \___| |_| |_|  \__|   |_____/   \__,_| |_.__/   \___| |_|  \__,_| |___/ |___/
+                                                                                                                            
+                                                                                                                            
+'''
+
+class Persistent_N_ary_heap(N_ary_heap):
+    """
+    An N_ary_heap whose keys, and satellites of a satellite_dtype, live in a np.memmap file, so that the heap survives restarts.
+
+    The file starts with a header of _HEADER_SIZE bytes holding the size, capacity, n_ary, heap_type, overflow_off and key dtype,
+    and the length of the satellite descr that follows it, which can be arbitrarily long for structured satellite dtypes. 
+    Then come the working keys and satellites, which every push and pop changes in place, 
+    and a checkpoint copy of them, each array aligned to 64 bytes. 
+
+    flush checkpoints the heap by copying the working arrays into the checkpoint arrays. While it copies, the header marks 
+    the working arrays as the checkpoint, and each step is flushed to disk before the next, so at any moment the file holds 
+    one complete checkpoint: the heap as it was at the last flush. close flushes the heap and marks the file as cleanly closed, 
+    and reopening a cleanly closed heap with open only reads the header and maps the arrays, so it is O(1). 
+    If the heap was not closed cleanly, the working arrays may hold any mix of the changes since the last flush, 
+    so open restores the last checkpoint in O(n), discarding those changes.
+    """
+
+    _MAGIC = b'NARYHEAP'
+    _VERSION = 3
+    _HEADER_SIZE = 512
+    _ALIGNMENT = 64
+    _HEADER_DTYPE = np.dtype([
+        ('magic', 'S8'), 
+        ('version', '<u4'), 
+        ('heap_type', 'u1'), 
+        ('overflow_off', 'u1'), 
+        ('clean', 'u1'), 
+        ('copying', 'u1'),
+        ('n_ary', '<i8'), 
+        ('size', '<i8'), 
+        ('working_size', '<i8'), 
+        ('capacity', '<i8'), 
+        ('key_dtype', 'S64'), 
+        ('satellite_descr_size', '<i8'),
+    ])
+
+    # The attributes that point into the file mapping, which are deleted when the heap is closed.
+    _MAPPED_ATTRIBUTES = ('_header', '_key_array', '_satellite_array', '_checkpoint_key_array', '_checkpoint_satellite_array', '_file_map')
+
+    def __init__(self, path, capacity, heap_type='min', overflow_off='head', dtype=float, n_ary=2, satellite_dtype=None, jit=False):
+        """
+        Create an empty heap in a new file at path, replacing any file already there. Use open to reopen an existing heap.
+        
+        Args:
+            path (str): The path of the file.
+            capacity (int): The capacity of the underlying arrays.
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            overflow_off (str, optional): Determines what to discard when values are pushed when the heap is at capacity, either 'head' or 'tail'. Defaults to 'head'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            n_ary (int, str, optional): The maximum number of children for each node, or 'auto'. Defaults to 2.
+            satellite_dtype (np.dtype, type, tuple, NoneType, optional): If provided, satellites of this dtype are stored in the file. 
+                Satellites cannot be stored in an object array, since it cannot be written to a file. Defaults to None.
+            jit (bool, optional): If True, sifting is done by numba-compiled kernels where possible. Defaults to False.
+            
+        Raises:
+            TypeError: Raised if capacity is not of type int.
+            ValueError: Raised if capacity is not positive.
+            See N_ary_heap for the validation of the other arguments.
+        """
+
+        # Validate the arguments with a heap of capacity 1, whose arrays are then replaced by the mapped arrays.
+        super().__init__(1, heap_type, overflow_off, dtype, n_ary, satellite_dtype is not None, satellite_dtype, jit)
+        if not isinstance(capacity, int):
+            raise TypeError(f"capacity must be of type int.\n"
+                            f"type(capacity): {type(capacity)}.")
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive.\n"
+                            f"capacity: {capacity}.")
+        # The validating heap chose n_ary='auto' for a capacity of 1, so choose again for the real capacity.
+        if n_ary == 'auto':
+            self._n_ary = choose_n_ary(dtype, capacity, self._jit)
+
+        self._path = path
+        self._create_file(capacity, path)
+        self._map()
+
+
+    def __getattr__(self, name):
+        """Raise a ValueError, rather than an AttributeError, when a closed heap's file mapping is used."""
+
+        if name in Persistent_N_ary_heap._MAPPED_ATTRIBUTES and self.__dict__.get('_closed', False):
+            raise ValueError(f"the heap has been closed and can no longer be used. Reopen it with open.\n"
+                             f"path: {self.__dict__.get('_path')}.")
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+
+    def _get_satellite_descr(self):
+        """Return the satellite dtype, as the text stored after the header: the repr of its numpy descr and shape, or b'' if satellites are not stored."""
+
+        if self._satellite_dtype is None:
+            return b''
+        return repr((np.lib.format.dtype_to_descr(self._satellite_dtype.base), self._satellite_dtype.shape)).encode()
+
+
+    def _get_layout(self, capacity, descr_size):
+        """
+        Return the byte offsets of the working keys and satellites and of the checkpoint keys and satellites, 
+        and the total size of the file, for a heap of capacity whose satellite descr is descr_size bytes long.
+        """
+
+        def align(offset):
+            return -(-offset // self._ALIGNMENT) * self._ALIGNMENT
+
+        key_size = capacity * np.dtype(self._dtype).itemsize
+        satellite_size = capacity * self._satellite_dtype.itemsize if self._satellite_dtype is not None else 0
+        key_offset = align(self._HEADER_SIZE + descr_size)
+        satellite_offset = align(key_offset + key_size)
+        checkpoint_key_offset = align(satellite_offset + satellite_size)
+        checkpoint_satellite_offset = align(checkpoint_key_offset + key_size)
+        file_size = align(checkpoint_satellite_offset + satellite_size)
+
+        return key_offset, satellite_offset, checkpoint_key_offset, checkpoint_satellite_offset, file_size
+
+
+    def _create_file(self, capacity, path, keys=None, satellites=None):
+        """
+        Write a file at path for a heap of capacity holding keys and satellites, or no values if keys is None, 
+        both as the working arrays and as the checkpoint, and flush it to disk, leaving it unmapped.
+        """
+
+        descr = self._get_satellite_descr()
+        key_offset, satellite_offset, checkpoint_key_offset, checkpoint_satellite_offset, file_size = self._get_layout(capacity, len(descr))
+
+        header = np.zeros(1, self._HEADER_DTYPE)
+        header['magic'] = self._MAGIC
+        header['version'] = self._VERSION
+        header['heap_type'] = self._heap_type == 'max'
+        header['overflow_off'] = self._overflow_off == 'tail'
+        header['n_ary'] = self._n_ary
+        header['capacity'] = capacity
+        header['key_dtype'] = np.dtype(self._dtype).str.encode()
+        header['satellite_descr_size'] = len(descr)
+        header['size'] = header['working_size'] = len(keys) if keys is not None else 0
+
+        with open(path, 'wb') as heap_file:
+            heap_file.write(header.tobytes())
+            heap_file.seek(self._HEADER_SIZE)
+            heap_file.write(descr)
+            for offset, values in ((key_offset, keys), (satellite_offset, satellites), 
+                                   (checkpoint_key_offset, keys), (checkpoint_satellite_offset, satellites)):
+                if values is not None:
+                    heap_file.seek(offset)
+                    heap_file.write(np.ascontiguousarray(values).tobytes())
+            heap_file.truncate(file_size)
+            heap_file.flush()
+            os.fsync(heap_file.fileno())
+
+
+    def _map(self):
+        """Map the file at self._path, point the header and arrays at it, and mark it as in use until it is closed."""
+
+        self._file_map = np.memmap(self._path, np.uint8, 'r+')
+        self._header = self._file_map[:self._HEADER_DTYPE.itemsize].view(self._HEADER_DTYPE)
+        self._closed = False
+        capacity = int(self._header['capacity'][0])
+        key_offset, satellite_offset, checkpoint_key_offset, checkpoint_satellite_offset, _ = self._get_layout(
+            capacity, int(self._header['satellite_descr_size'][0]))
+
+        # Plain ndarray views of the mapping, so that the heap methods and kernels see ordinary arrays.
+        def map_keys(offset):
+            return np.asarray(self._file_map[offset:offset + capacity * np.dtype(self._dtype).itemsize]).view(self._dtype)
+
+        def map_satellites(offset):
+            if self._satellite_dtype is None:
+                return None
+            satellite_bytes = np.asarray(self._file_map[offset:offset + capacity * self._satellite_dtype.itemsize])
+            return satellite_bytes.view(self._satellite_dtype.base).reshape((capacity,) + self._satellite_dtype.shape)
+
+        self._key_array = map_keys(key_offset)
+        self._satellite_array = map_satellites(satellite_offset)
+        self._checkpoint_key_array = map_keys(checkpoint_key_offset)
+        self._checkpoint_satellite_array = map_satellites(checkpoint_satellite_offset)
+
+        self._header['clean'] = False
+        self._file_map.flush()
+
+
+    def flush(self):
+        """
+        Checkpoint the heap, in O(n): copy the working arrays into the checkpoint arrays and flush the file to disk. 
+        
+        Each step is flushed before the header points at its result, so that a crash at any point leaves a whole checkpoint, 
+        either this one or the last one, for open to restore.
+        """
+
+        # Once the working arrays are on disk, mark them as the checkpoint while the checkpoint arrays are overwritten.
+        self._header['working_size'] = self._size
+        self._file_map.flush()
+        self._header['copying'] = True
+        self._file_map.flush()
+
+        self._checkpoint_key_array[:self._size] = self._key_array[:self._size]
+        if self._satellite_array is not None:
+            self._checkpoint_satellite_array[:self._size] = self._satellite_array[:self._size]
+        self._header['size'] = self._size
+        self._file_map.flush()
+        self._header['copying'] = False
+        self._file_map.flush()
+
+
+    def _unmap(self):
+        """Delete the header and arrays that point into the file mapping, and the mapping itself, which unmaps the file."""
+
+        del self._header, self._key_array, self._satellite_array, self._checkpoint_key_array, self._checkpoint_satellite_array, self._file_map
+
+
+    def close(self):
+        """
+        Flush the heap, mark the file as cleanly closed and unmap it. 
+        Closing a closed heap does nothing, and any other use of a closed heap raises a ValueError.
+        """
+
+        if self._closed:
+            return
+
+        self.flush()
+        self._header['clean'] = True
+        self._file_map.flush()
+        self._unmap()
+        self._closed = True
+
+
+    def is_closed(self):
+        """
+        Returns True if the heap has been closed, else False.
+
+        Returns:
+            bool: True if the heap has been closed, False if not.
+        """
+
+        return self._closed
+
+
+    def get_path(self):
+        """
+        Returns the path of the file backing the heap.
+
+        Returns:
+            str: The path of the file.
+        """
+
+        return self._path
+
+
+    def change_capacity(self, new_capacity):
+        """
+        Rewrite the file with arrays of the desired size, copying the values across, which also checkpoints the heap.
+        If the new_capacity is less than the current size of the heap, the excess elements are overflow and are discarded.
+
+        The new file is written and flushed beside the old one, then moved over it with os.replace, 
+        so a crash at any point leaves either the old heap or the new one on disk, never a partly written file.
+        
+        Args:
+            new_capacity (int): The new capacity of the heap.
+        
+        Raises:
+            TypeError: Raised if new_capacity is not of type int.
+            ValueError: Raised if new_capacity is not positive.
+        """
+
+        self._check_views()
+
+        # Validate inputs.
+        if not isinstance(new_capacity, int):
+            raise TypeError(f"new_capacity must be of type int.\n"
+                            f"type(new_capacity): {type(new_capacity)}.")
+        if new_capacity < 1:
+            raise ValueError(f"new_capacity must be positive.\n"
+                            f"new_capacity: {new_capacity}.")
+
+        if self._size > new_capacity:
+            self._force_overflow(self._size - new_capacity)
+
+        keys = self._key_array[:self._size]
+        satellites = self._satellite_array[:self._size] if self._satellite_array is not None else None
+        file_descriptor, temporary_path = tempfile.mkstemp(prefix=os.path.basename(self._path) + '.', suffix='.resize', 
+                                                           dir=os.path.dirname(os.path.abspath(self._path)))
+        os.close(file_descriptor)
+        try:
+            self._create_file(new_capacity, temporary_path, keys, satellites)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+        # The old file is unmapped before it is replaced, since a mapped file cannot be replaced on every platform.
+        del keys, satellites
+        self._unmap()
+        os.replace(temporary_path, self._path)
+        self._map()
+
+
+    @classmethod
+    def open(cls, path, jit=False):
+        """
+        Reopen the heap stored in the file at path, in O(1) if it was closed cleanly. 
+        If it was not, the heap is restored to its last checkpoint in O(n).
+
+        Args:
+            path (str): The path of the file.
+            jit (bool, optional): If True, sifting is done by numba-compiled kernels where possible. Defaults to False.
+
+        Raises:
+            ValueError: Raised if the file at path is not a heap file of this version.
+
+        Returns:
+            Persistent_N_ary_heap: The heap stored in the file.
+        """
+
+        header = np.fromfile(path, cls._HEADER_DTYPE, count=1)
+        if header.size == 0 or header['magic'][0] != cls._MAGIC or header['version'][0] != cls._VERSION:
+            raise ValueError(f"path must be a heap file written by {cls.__name__} version {cls._VERSION}.\n"
+                             f"path: {path}.")
+
+        satellite_dtype = None
+        descr_size = int(header['satellite_descr_size'][0])
+        if descr_size:
+            with open(path, 'rb') as heap_file:
+                heap_file.seek(cls._HEADER_SIZE)
+                satellite_descr, satellite_shape = ast.literal_eval(heap_file.read(descr_size).decode())
+            satellite_dtype = np.dtype((np.lib.format.descr_to_dtype(satellite_descr), satellite_shape))
+
+        # Construct the heap without creating a file, then map the existing one.
+        heap = cls.__new__(cls)
+        N_ary_heap.__init__(heap, 1, 'max' if header['heap_type'][0] else 'min', 'tail' if header['overflow_off'][0] else 'head', 
+                            np.dtype(header['key_dtype'][0].decode()).type, int(header['n_ary'][0]), satellite_dtype is not None, satellite_dtype, jit)
+        heap._path = path
+        heap._map()
+
+        if header['clean'][0]:
+            heap._size = int(header['size'][0])
+        elif header['copying'][0]:
+            # The process died during a flush, while the working arrays were the checkpoint, so finish the flush.
+            heap._size = int(header['working_size'][0])
+            heap.flush()
+        else:
+            # Discard the changes made since the last flush.
+            heap._size = int(header['size'][0])
+            heap._key_array[:heap._size] = heap._checkpoint_key_array[:heap._size]
+            if heap._satellite_array is not None:
+                heap._satellite_array[:heap._size] = heap._checkpoint_satellite_array[:heap._size]
+
+        return heap
+
+
+'''
+   _____           _                      _                     ____                                
+  / ____|         | |                    | |                   / __ \                               
+ | |        __ _  | |   ___   _ __     __| |   __ _   _ __    | |  | |  _   _    ___   _   _    ___ 
+ | |       / _` | | |  / _ \ | '_ \   / _` |  / _` | | '__|   | |  | | | | | |  / _ \ | | | |  / _ \
+ | |____  | (_| | | | |  __/ | | | | | (_| | | (_| | | |      | |__| | | |_| | |  __/ | |_| | |  __/
+  \_____|  \__,_| |_|  \___| |_| |_|  \__,_|  \__,_| |_|       \___\_\  \__,_|  \___|  \__,_|  \___|
+                                                                                                    
+                                                                                                    
+'''
+
+class CalendarQueue:
+    """
+    A min priority queue for timestamps that are mostly close to the most recently popped one, 
+    in which push and pop take O(1) amortized time rather than O(log n).
+
+    Keys are kept in n_buckets sorted buckets, each covering bucket_width, like the days of a calendar whose year is n_buckets * bucket_width long. 
+    A key falls on the day int((key - self._origin) // bucket_width), and is stored in the bucket of that day modulo n_buckets, 
+    so that each bucket holds the keys of the same day in successive years. Popping scans forward from the current day 
+    for a bucket whose first key falls on it. Keys pushed before the current day go into its bucket, 
+    and keys more than _SPILL_YEARS years ahead spill into an Infinite_N_ary_heap, from which they are moved into the buckets as the calendar advances.
+
+    Whenever the buckets hold more than twice, or less than half, as many keys as there are buckets, the number of buckets is doubled or halved 
+    and the bucket width is re-estimated from the spacing of the earliest keys, so that each day holds a few keys on average.
+    """
+
+    # The number of earliest keys whose mean spacing determines the bucket width on resize, and the multiple of that spacing used.
+    _WIDTH_SAMPLE_SIZE = 25
+    _WIDTH_SPACING_MULTIPLE = 3.0
+
+    # Keys at least this many years after the current day are spilled into the heap.
+    _SPILL_YEARS = 4
+
+    def __init__(self, n_buckets=16, bucket_width=1.0, satellites=False, dtype=float):
+        """
+        Create an empty calendar queue.
+
+        Args:
+            n_buckets (int, optional): The initial number of buckets, minimum 1. Defaults to 16.
+            bucket_width (float, optional): The initial width of each bucket in key units. It is re-estimated whenever the buckets are resized. Defaults to 1.0.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            dtype (type, optional): The dtype of the keys. Defaults to float.
+
+        Raises:
+            TypeError: Raised if n_buckets is not of type int.
+            ValueError: Raised if n_buckets is not positive.
+            TypeError: Raised if bucket_width is not of type int or float.
+            ValueError: Raised if bucket_width is not positive.
+        """
+
+        # Validate n_buckets.
+        if not isinstance(n_buckets, int):
+            raise TypeError(f"n_buckets must be of type int.\n"
+                            f"type(n_buckets): {type(n_buckets)}.")
+        if n_buckets < 1:
+            raise ValueError(f"n_buckets must be positive.\n"
+                             f"n_buckets: {n_buckets}.")
+
+        # Validate bucket_width.
+        if not isinstance(bucket_width, (int, float)):
+            raise TypeError(f"bucket_width must be of type int or float.\n"
+                            f"type(bucket_width): {type(bucket_width)}.")
+        if bucket_width <= 0:
+            raise ValueError(f"bucket_width must be positive.\n"
+                             f"bucket_width: {bucket_width}.")
+
+        self._satellites = satellites
+        self._dtype = dtype
+        self._spill_heap = Infinite_N_ary_heap(dtype=dtype, satellites=satellites)
+        self._min_buckets = n_buckets
+        self._build_buckets(n_buckets, float(bucket_width), 0.0)
+
+
+    def _build_buckets(self, n_buckets, bucket_width, origin):
+        """Replace the buckets with n_buckets empty buckets of bucket_width, with the current day starting at origin."""
+
+        self._n_buckets = n_buckets
+        self._bucket_width = bucket_width
+        self._origin = origin
+        self._bucket_keys = [[] for _ in range(n_buckets)]
+        self._bucket_satellites = [[] for _ in range(n_buckets)] if self._satellites else None
+        self._current_day = 0
+        self._spill_day = n_buckets * self._SPILL_YEARS
+        self._calendar_size = 0
+
+
+    def _get_day(self, key):
+        """Return the day that key falls on, or the current day if key falls before it."""
+
+        return max(int((key - self._origin) // self._bucket_width), self._current_day)
+
+
+    def _insert(self, key, satellite, day):
+        """Insert key into the bucket of day, keeping the bucket sorted."""
+
+        bucket = day % self._n_buckets
+        keys = self._bucket_keys[bucket]
+        position = bisect_right(keys, key)
+        keys.insert(position, key)
+        if self._bucket_satellites is not None: self._bucket_satellites[bucket].insert(position, satellite)
+        self._calendar_size += 1
+
+
+    def _pull_spill(self):
+        """Move the keys in the spill heap that fall before the spill day into the buckets."""
+
+        while not self._spill_heap.is_empty():
+            day = self._get_day(self._spill_heap.peek())
+            if day >= self._spill_day:
+                return
+            key, satellite = self._spill_heap.pop(get_satellite=True)
+            self._insert(key, satellite, day)
+
+
+    def _resize(self, n_buckets):
+        """Redistribute the keys in the buckets into n_buckets buckets, with the bucket width re-estimated from the spacing of the earliest keys."""
+
+        keys = []
+        satellites = []
+        for bucket in range(self._n_buckets):
+            keys.extend(self._bucket_keys[bucket])
+            if self._bucket_satellites is not None: satellites.extend(self._bucket_satellites[bucket])
+        order = np.argsort(np.asarray(keys, float), kind='stable')
+
+        sample = np.diff(np.asarray(keys, float)[order[:self._WIDTH_SAMPLE_SIZE]])
+        sample = sample[sample > 0]
+        bucket_width = self._WIDTH_SPACING_MULTIPLE * float(np.mean(sample)) if sample.size > 0 else self._bucket_width
+
+        # Keys before the current day were placed on it, so the new calendar starts at the earlier of the two.
+        origin = self._origin + self._current_day * self._bucket_width
+        if keys:
+            origin = min(origin, keys[order[0]])
+        self._build_buckets(n_buckets, bucket_width, origin)
+
+        for index in order.tolist():
+            satellite = satellites[index] if self._bucket_satellites is not None else None
+            day = self._get_day(keys[index])
+            if day < self._spill_day:
+                self._insert(keys[index], satellite, day)
+            else:
+                self._spill_heap.push(keys[index], satellite)
+        self._pull_spill()
+
+
+    def _find_next(self):
+        """
+        Advance the current day to the one with the earliest key and return True, or return False if the queue is empty.
+        If a whole year passes without finding it, the calendar jumps straight to the day of the earliest key in the buckets, 
+        and when the buckets are empty, to the day of the earliest key in the spill heap.
+        """
+
+        n_days_scanned = 0
+        while True:
+            if self._calendar_size == 0:
+                if self._spill_heap.is_empty():
+                    return False
+                self._current_day = self._get_day(self._spill_heap.peek())
+                self._spill_day = self._current_day + self._n_buckets * self._SPILL_YEARS
+                self._pull_spill()
+                n_days_scanned = 0
+
+            # The first key of the current day's bucket is next if it falls on the current day.
+            keys = self._bucket_keys[self._current_day % self._n_buckets]
+            if keys and self._get_day(keys[0]) == self._current_day:
+                return True
+
+            n_days_scanned += 1
+            if n_days_scanned > self._n_buckets:
+                # The keys are sparse compared to the bucket width. Jump to the earliest key.
+                earliest_key = min(keys[0] for keys in self._bucket_keys if keys)
+                self._current_day = self._get_day(earliest_key)
+            else:
+                self._current_day += 1
+            self._spill_day = self._current_day + self._n_buckets * self._SPILL_YEARS
+            self._pull_spill()
+
+
+    def get_size(self):
+        """
+        Returns the number of keys in the queue.
+
+        Returns:
+            int: The number of keys in the queue.
+        """
+
+        return self._calendar_size + self._spill_heap.get_size()
+
+
+    def is_empty(self):
+        """
+        Returns True if the queue is empty, else returns False.
+
+        Returns:
+            bool: True if the queue is empty, False otherwise.
+        """
+
+        return self.get_size() == 0
+
+
+    def push(self, new_key, new_satellite=None):
+        """
+        Inserts new_key into the queue, into the buckets if it falls before the spill day and into the spill heap otherwise.
+
+        Args:
+            new_key (dtype): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellite is provided but satellites are not stored.
+        """
+
+        if new_satellite is not None and not self._satellites:
+            raise ValueError(f"satellites cannot be pushed to a queue that does not store satellites.")
+
+        new_key = self._dtype(new_key)
+        day = self._get_day(new_key)
+        if day < self._spill_day:
+            self._insert(new_key, new_satellite, day)
+            if self._calendar_size > 2 * self._n_buckets:
+                self._resize(2 * self._n_buckets)
+        else:
+            self._spill_heap.push(new_key, new_satellite)
+
+
+    def pop(self, get_satellite=False):
+        """
+        Gracefully removes and returns the earliest key. If the queue is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the earliest key, a tuple is returned 
+                whose second value is the satellite corresponding to the earliest key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            dtype, tuple, NoneType: The earliest key, or None if the queue is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if not self._find_next():
+            return None
+
+        bucket = self._current_day % self._n_buckets
+        key = self._bucket_keys[bucket].pop(0)
+        satellite = self._bucket_satellites[bucket].pop(0) if self._bucket_satellites is not None else None
+        self._calendar_size -= 1
+        if self._n_buckets > self._min_buckets and 2 * self._calendar_size < self._n_buckets:
+            self._resize(self._n_buckets // 2)
+
+        return (key, satellite) if get_satellite else key
+
+
+    def peek(self, get_satellite=False):
+        """
+        Returns the earliest key without removing it. If the queue is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the earliest key, a tuple is returned 
+                whose second value is the satellite corresponding to the earliest key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            dtype, tuple, NoneType: The earliest key, or None if the queue is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if not self._find_next():
+            return None
+
+        bucket = self._current_day % self._n_buckets
+        key = self._bucket_keys[bucket][0]
+        satellite = self._bucket_satellites[bucket][0] if self._bucket_satellites is not None else None
+
+        return (key, satellite) if get_satellite else key
+
+
+'''
+  _____                _   _            _    _                        
+ |  __ \              | | (_)          | |  | |                       
+ | |__) |   __ _    __| |  _  __  __   | |__| |   ___    __ _   _ __  
+ |  _  /   / _` |  / _` | | | \ \/ /   |  __  |  / _ \  / _` | | '_ \ 
+ | | \ \  | (_| | | (_| | | |  >  <    | |  | | |  __/ | (_| | | |_) |
+ |_|  \_\  \__,_|  \__,_| |_| /_/\_\   |_|  |_|  \___|  \__,_| | .__/ 
+                                                               | |    
+                                                               |_|    
+'''
+
+class RadixHeap:
+    """
+    A monotone min priority queue for integer keys, in which no key may be pushed below the most recently popped key, 
+    as in Dijkstra's algorithm with integer edge weights. Push takes O(1) time and pop takes O(log C) amortized time, 
+    where C is the largest difference between a pushed key and the most recently popped key, rather than O(log n).
+
+    Keys are kept in unsorted buckets by the highest bit in which they differ from the most recently popped key: 
+    bucket 0 holds keys equal to it, and bucket i holds keys that first differ from it in bit i - 1. 
+    Popping from an empty bucket 0 finds the smallest key in the lowest nonempty bucket, which becomes the most recently popped key, 
+    and redistributes the rest of that bucket into lower buckets. Each key can only move down, so it is moved at most once per bit.
+
+    Keys that differ in sign from the most recently popped key, or are pushed before the first pop, go into the top bucket. 
+    Negative keys are supported, but a queue whose keys cross zero pays O(n) for each pop until its most recently popped key does.
+    """
+
+    # Bucket i < _TOP_BUCKET holds keys whose highest bit differing from the most recently popped key is bit i - 1.
+    _TOP_BUCKET = 65
+
+    def __init__(self, dtype=int, satellites=False, check_monotone=True):
+        """
+        Create an empty radix heap.
+
+        Args:
+            dtype (type, optional): The integer dtype of the keys. Keys are stored as Python ints. Defaults to int.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            check_monotone (bool, optional): If True, pushing a key below the most recently popped key raises a ValueError. 
+                If False, the check is skipped, and the order in which such keys are popped is undefined. Defaults to True.
+
+        Raises:
+            TypeError: Raised if dtype is not an integer dtype.
+        """
+
+        # Validate dtype.
+        if not np.issubdtype(np.dtype(dtype), np.integer):
+            raise TypeError(f"dtype must be an integer dtype.\n"
+                            f"dtype: {dtype}.")
+
+        self._dtype = dtype
+        self._satellites = satellites
+        self._check_monotone = check_monotone
+        self._bucket_keys = [[] for _ in range(self._TOP_BUCKET + 1)]
+        self._bucket_satellites = [[] for _ in range(self._TOP_BUCKET + 1)] if satellites else None
+        # Bit i is set if bucket i is nonempty.
+        self._occupied = 0
+        self._last = None
+        self._size = 0
+
+
+    def _get_bucket(self, key):
+        """Return the index of the bucket that key belongs in, relative to the most recently popped key."""
+
+        if self._last is None:
+            return self._TOP_BUCKET
+        difference = key ^ self._last
+        if difference < 0:
+            return self._TOP_BUCKET
+        return min(difference.bit_length(), self._TOP_BUCKET)
+
+
+    def _fill_bucket_zero(self):
+        """
+        If bucket 0 is empty, make the smallest key the most recently popped key and redistribute its bucket, 
+        so that bucket 0 holds the smallest keys. The queue must not be empty.
+        """
+
+        if self._occupied & 1:
+            return
+
+        # The lowest nonempty bucket holds the smallest keys.
+        bucket = (self._occupied & -self._occupied).bit_length() - 1
+        keys = self._bucket_keys[bucket]
+        self._last = min(keys)
+        self._bucket_keys[bucket] = []
+        self._occupied &= ~(1 << bucket)
+
+        bucket_keys = self._bucket_keys
+        get_bucket = self._get_bucket
+        if self._bucket_satellites is None:
+            for key in keys:
+                new_bucket = get_bucket(key)
+                bucket_keys[new_bucket].append(key)
+                self._occupied |= 1 << new_bucket
+        else:
+            satellites = self._bucket_satellites[bucket]
+            self._bucket_satellites[bucket] = []
+            for key, satellite in zip(keys, satellites):
+                new_bucket = get_bucket(key)
+                bucket_keys[new_bucket].append(key)
+                self._bucket_satellites[new_bucket].append(satellite)
+                self._occupied |= 1 << new_bucket
+
+
+    def get_size(self):
+        """
+        Returns the number of keys in the heap.
+
+        Returns:
+            int: The number of keys in the heap.
+        """
+
+        return self._size
+
+
+    def is_empty(self):
+        """
+        Returns True if the heap is empty, else returns False.
+
+        Returns:
+            bool: True if the heap is empty, False otherwise.
+        """
+
+        return self._size == 0
+
+
+    def push(self, new_key, new_satellite=None):
+        """
+        Inserts new_key into the heap.
+
+        Args:
+            new_key (int): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellite is provided but satellites are not stored.
+            ValueError: Raised if check_monotone is True and new_key is less than the most recently popped key.
+        """
+
+        if new_satellite is not None and not self._satellites:
+            raise ValueError(f"satellites cannot be pushed to a heap that does not store satellites.")
+
+        new_key = int(new_key)
+        if self._check_monotone and self._last is not None and new_key < self._last:
+            raise ValueError(f"new_key must not be less than the most recently popped key.\n"
+                             f"new_key: {new_key}, most recently popped key: {self._last}.")
+
+        bucket = self._get_bucket(new_key)
+        self._bucket_keys[bucket].append(new_key)
+        if self._bucket_satellites is not None: self._bucket_satellites[bucket].append(new_satellite)
+        self._occupied |= 1 << bucket
+        self._size += 1
+
+
+    def pop(self, get_satellite=False):
+        """
+        Gracefully removes and returns the smallest key. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the smallest key, a tuple is returned 
+                whose second value is the satellite corresponding to the smallest key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            int, tuple, NoneType: The smallest key, or None if the heap is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if self._size == 0:
+            return None
+
+        self._fill_bucket_zero()
+        keys = self._bucket_keys[0]
+        key = keys.pop()
+        satellite = self._bucket_satellites[0].pop() if self._bucket_satellites is not None else None
+        if not keys:
+            self._occupied &= ~1
+        self._size -= 1
+
+        return (key, satellite) if get_satellite else key
+
+
+    def peek(self, get_satellite=False):
+        """
+        Returns the smallest key without removing it. If the heap is empty, returns None.
+        Unlike pop, peek does not raise the bound below which keys cannot be pushed.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the smallest key, a tuple is returned 
+                whose second value is the satellite corresponding to the smallest key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            int, tuple, NoneType: The smallest key, or None if the heap is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if self._size == 0:
+            return None
+
+        bucket = (self._occupied & -self._occupied).bit_length() - 1
+        keys = self._bucket_keys[bucket]
+        index = min(range(len(keys)), key=keys.__getitem__)
+        satellite = self._bucket_satellites[bucket][index] if self._bucket_satellites is not None else None
+
+        return (keys[index], satellite) if get_satellite else keys[index]
+
+
+'''
+  _____            _          _                     _    _                        
+ |  __ \          (_)        (_)                   | |  | |                       
+ | |__) |   __ _   _   _ __   _   _ __     __ _    | |__| |   ___    __ _   _ __  
+ |  ___/   / _` | | | | '__| | | | '_ \   / _` |   |  __  |  / _ \  / _` | | '_ \ 
+ | |      | (_| | | | | |    | | | | | | | (_| |   | |  | | |  __/ | (_| | | |_) |
+ |_|       \__,_| |_| |_|    |_| |_| |_|  \__, |   |_|  |_|  \___|  \__,_| | .__/ 
+                                           __/ |                           | |    
+                                          |___/                            |_|    
+'''
+
+def _merge_pairs(key_array, child_array, sibling_array, first_index, is_min):
+    """
+    Meld the sibling list starting at first_index into a single tree by the two-pass pairing method and return the index of its root, or -1 if the list is empty. 
+    The first pass links the siblings in pairs from left to right, chaining the winners in reverse through sibling_array, 
+    and the second pass links the winners from right to left.
+    """
+
+    # First pass.
+    pairs_index = -1
+    this_index = first_index
+    while this_index != -1:
+        other_index = sibling_array[this_index]
+        if other_index == -1:
+            sibling_array[this_index] = pairs_index
+            pairs_index = this_index
+            break
+        next_index = sibling_array[other_index]
+
+        # Link this_index and other_index, making the less extreme a child of the more extreme.
+        if (key_array[other_index] < key_array[this_index]) if is_min else (key_array[other_index] > key_array[this_index]):
+            this_index, other_index = other_index, this_index
+        sibling_array[other_index] = child_array[this_index]
+        child_array[this_index] = other_index
+
+        sibling_array[this_index] = pairs_index
+        pairs_index = this_index
+        this_index = next_index
+
+    # Second pass.
+    if pairs_index == -1:
+        return -1
+    root_index = pairs_index
+    this_index = sibling_array[root_index]
+    sibling_array[root_index] = -1
+    while this_index != -1:
+        next_index = sibling_array[this_index]
+        other_index = this_index
+        if (key_array[other_index] < key_array[root_index]) if is_min else (key_array[other_index] > key_array[root_index]):
+            root_index, other_index = other_index, root_index
+        sibling_array[other_index] = child_array[root_index]
+        child_array[root_index] = other_index
+        this_index = next_index
+
+    return root_index
+
+
+_merge_pairs_kernel = _jit(_merge_pairs)
+
+
+class _Node_pool:
+    """
+    Parallel arrays holding the nodes of one or more Pairing_heaps: the key, first child and next sibling of each node, and optionally its satellite. 
+    Released nodes are chained through sibling_array into a free list and reused before the arrays grow.
+    """
+
+    def __init__(self, dtype, satellites, capacity):
+        self.key_array = np.empty(capacity, dtype)
+        self.child_array = np.full(capacity, -1, np.int64)
+        self.sibling_array = np.full(capacity, -1, np.int64)
+        self.satellite_array = np.empty(capacity, object) if satellites else None
+        self.free_index = -1
+        self.n_used = 0
+
+
+    def _grow(self, min_capacity):
+        """Grow the arrays geometrically until they can hold at least min_capacity nodes."""
+
+        capacity = len(self.key_array)
+        if min_capacity <= capacity:
+            return
+        new_capacity = max(2 * capacity, min_capacity)
+        for name in ('key_array', 'child_array', 'sibling_array', 'satellite_array'):
+            array = getattr(self, name)
+            if array is None:
+                continue
+            new_array = np.empty(new_capacity, array.dtype)
+            new_array[:capacity] = array
+            setattr(self, name, new_array)
+
+
+    def allocate(self, key, satellite):
+        """Return the index of a node holding key and satellite, with no child or sibling."""
+
+        if self.free_index != -1:
+            index = self.free_index
+            self.free_index = int(self.sibling_array[index])
+        else:
+            self._grow(self.n_used + 1)
+            index = self.n_used
+            self.n_used += 1
+        self.key_array[index] = key
+        self.child_array[index] = -1
+        self.sibling_array[index] = -1
+        if self.satellite_array is not None: self.satellite_array[index] = satellite
+        return index
+
+
+    def allocate_block(self, num_nodes):
+        """Return the indices of num_nodes new contiguous nodes at the end of the arrays, with their fields unset."""
+
+        self._grow(self.n_used + num_nodes)
+        indices = np.arange(self.n_used, self.n_used + num_nodes)
+        self.n_used += num_nodes
+        return indices
+
+
+    def release(self, indices):
+        """Add the nodes at indices to the free list, dropping references to their satellites."""
+
+        indices = np.atleast_1d(indices)
+        if indices.size == 0:
+            return
+        if self.satellite_array is not None: self.satellite_array[indices] = None
+        self.sibling_array[indices[:-1]] = indices[1:]
+        self.sibling_array[indices[-1]] = self.free_index
+        self.free_index = int(indices[0])
+
+
+class Pairing_heap:
+    """
+    A meldable heap, in which push and meld take O(1) time and pop takes O(log n) amortized time. 
+    Each key is a node of a multiway tree whose root is the most extreme key. Pushing or melding links the new tree under the root or above it, 
+    and popping the root melds its children in pairs from left to right and then from right to left.
+
+    The nodes are not Python objects but indices into the parallel arrays of a node pool, which reuses released nodes. 
+    Heaps created with share_pool_with share that heap's pool, and melding heaps that share a pool only links their roots. 
+    Melding a heap from another pool first copies its nodes into this heap's pool, which takes O(m) time for m keys.
+    """
+
+    def __init__(self, heap_type='min', dtype=float, satellites=False, initial_capacity=16, share_pool_with=None, jit=False):
+        """
+        Create an empty heap.
+
+        Args:
+            heap_type (str, optional): The type of heap to be made, either 'min' or 'max'. Defaults to 'min'.
+            dtype (type, optional): The dtype of the heap. Defaults to float.
+            satellites (bool, optional): If True, satellite data is stored alongside the corresponding keys. Defaults to False.
+            initial_capacity (int, optional): The initial capacity of the node pool. Ignored if share_pool_with is provided. Defaults to 16.
+            share_pool_with (Pairing_heap, NoneType, optional): If provided, this heap allocates its nodes from the pool of share_pool_with, 
+                so that the two can be melded in O(1) time. dtype and satellites must match. Defaults to None.
+            jit (bool, optional): If True, popping melds the children of the root with a numba-compiled kernel. 
+                Falls back to the pure-Python function if numba is not installed or dtype is object. Defaults to False.
+
+        Raises:
+            ValueError: Raised if heap_type is not 'min' or 'max'.
+            TypeError: Raised if dtype is not a type.
+            TypeError: Raised if initial_capacity is not of type int.
+            ValueError: Raised if initial_capacity is not positive.
+            TypeError: Raised if share_pool_with is neither None nor a Pairing_heap.
+            ValueError: Raised if share_pool_with has a different dtype or satellite setting.
+        """
+
+        # Validate heap_type.
+        if heap_type not in ['min', 'max']:
+            raise ValueError(f"heap_type must be either 'min' or 'max'.\n"
+                             f"heap_type: {heap_type}.")
+
+        # Validate dtype.
+        if not isinstance(dtype, type):
+            raise TypeError(f"dtype must be a type.\n"
+                            f"type(dtype): {type(dtype)}.")
+
+        # Validate initial_capacity.
+        if not isinstance(initial_capacity, int):
+            raise TypeError(f"initial_capacity must be of type int.\n"
+                            f"type(initial_capacity): {type(initial_capacity)}.")
+        if initial_capacity < 1:
+            raise ValueError(f"initial_capacity must be positive.\n"
+                             f"initial_capacity: {initial_capacity}.")
+
+        # Validate share_pool_with.
+        if share_pool_with is not None:
+            if not isinstance(share_pool_with, Pairing_heap):
+                raise TypeError(f"share_pool_with must be either None or a Pairing_heap.\n"
+                                f"type(share_pool_with): {type(share_pool_with)}.")
+            if share_pool_with._dtype != dtype or share_pool_with._satellites != satellites:
+                raise ValueError(f"share_pool_with must have the same dtype and satellites.\n"
+                                 f"share_pool_with: dtype {share_pool_with._dtype}, satellites {share_pool_with._satellites}. "
+                                 f"This heap: dtype {dtype}, satellites {satellites}.")
+
+        self._heap_type = heap_type
+        self._is_min = heap_type == 'min'
+        self._dtype = dtype
+        self._satellites = satellites
+        self._pool = share_pool_with._pool if share_pool_with is not None else _Node_pool(dtype, satellites, initial_capacity)
+        self._root_index = -1
+        self._size = 0
+
+        # Select the pairing backend.
+        self._jit = jit and numba is not None and np.dtype(dtype) != np.dtype(object)
+        self._merge_pairs = _merge_pairs_kernel if self._jit else _merge_pairs
+
+
+    def _link(self, index_x, index_y):
+        """Make the less extreme of the roots index_x and index_y the first child of the other, and return the index of the remaining root."""
+
+        key_array = self._pool.key_array
+        if (key_array[index_y] < key_array[index_x]) if self._is_min else (key_array[index_y] > key_array[index_x]):
+            index_x, index_y = index_y, index_x
+        self._pool.sibling_array[index_y] = self._pool.child_array[index_x]
+        self._pool.child_array[index_x] = index_y
+        return index_x
+
+
+    def _get_node_indices(self):
+        """Return the indices of every node in the heap, in depth-first order from the root."""
+
+        child_array = self._pool.child_array
+        sibling_array = self._pool.sibling_array
+        node_indices = []
+        stack = [self._root_index] if self._root_index != -1 else []
+        while stack:
+            index = stack.pop()
+            node_indices.append(index)
+            child_index = int(child_array[index])
+            if child_index != -1: stack.append(child_index)
+            sibling_index = int(sibling_array[index])
+            if sibling_index != -1: stack.append(sibling_index)
+        return np.array(node_indices, np.int64)
+
+
+    def get_size(self):
+        """
+        Returns the number of keys in the heap.
+
+        Returns:
+            int: The number of keys in the heap.
+        """
+
+        return self._size
+
+
+    def is_empty(self):
+        """
+        Returns True if the heap is empty, else returns False.
+
+        Returns:
+            bool: True if the heap is empty, False otherwise.
+        """
+
+        return self._size == 0
+
+
+    def push(self, new_key, new_satellite=None):
+        """
+        Inserts new_key into the heap in O(1) time.
+
+        Args:
+            new_key (dtype): The key to be inserted.
+            new_satellite (object): The corresponding satellite to be inserted. Defaults to None.
+
+        Raises:
+            ValueError: Raised if new_satellite is provided but satellites are not stored.
+        """
+
+        if new_satellite is not None and not self._satellites:
+            raise ValueError(f"satellites cannot be pushed to a heap that does not store satellites.")
+
+        new_index = self._pool.allocate(new_key, new_satellite)
+        self._root_index = new_index if self._root_index == -1 else self._link(self._root_index, new_index)
+        self._size += 1
+
+
+    def pop(self, get_satellite=False):
+        """
+        Gracefully removes and returns the most extreme key. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the most extreme key, a tuple is returned 
+                whose second value is the satellite corresponding to the most extreme key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            dtype, tuple, NoneType: The most extreme key, or None if the heap is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if self._size == 0:
+            return None
+
+        pool = self._pool
+        root_index = self._root_index
+        key = pool.key_array[root_index]
+        satellite = pool.satellite_array[root_index] if pool.satellite_array is not None else None
+
+        self._root_index = int(self._merge_pairs(pool.key_array, pool.child_array, pool.sibling_array, int(pool.child_array[root_index]), self._is_min))
+        pool.release(root_index)
+        self._size -= 1
+
+        return (key, satellite) if get_satellite else key
+
+
+    def peek(self, get_satellite=False):
+        """
+        Returns the most extreme key without removing it. If the heap is empty, returns None.
+
+        Args:
+            get_satellite (bool, optional): If True, rather than just the most extreme key, a tuple is returned 
+                whose second value is the satellite corresponding to the most extreme key, or None if satellites are not stored. Defaults to False.
+
+        Returns:
+            dtype, tuple, NoneType: The most extreme key, or None if the heap is empty. If get_satellite is False, this is just the key. Otherwise, this is (key, satellite).
+        """
+
+        if self._size == 0:
+            return None
+
+        key = self._pool.key_array[self._root_index]
+        satellite = self._pool.satellite_array[self._root_index] if self._pool.satellite_array is not None else None
+
+        return (key, satellite) if get_satellite else key
+
+
+    def meld(self, other):
+        """
+        Moves every key and satellite of other into this heap, leaving other empty. 
+        Takes O(1) time if other shares this heap's node pool, and otherwise O(m) time for the m keys of other.
+
+        Args:
+            other (Pairing_heap): The heap to be melded into this one.
+
+        Raises:
+            TypeError: Raised if other is not a Pairing_heap.
+            ValueError: Raised if other is this heap.
+            ValueError: Raised if other has a different heap_type or satellite setting.
+        """
+
+        # Validate other.
+        if not isinstance(other, Pairing_heap):
+            raise TypeError(f"other must be a Pairing_heap.\n"
+                            f"type(other): {type(other)}.")
+        if other is self:
+            raise ValueError(f"A heap cannot be melded into itself.")
+        if other._heap_type != self._heap_type or other._satellites != self._satellites:
+            raise ValueError(f"other must have the same heap_type and satellites.\n"
+                             f"other: heap_type {other._heap_type}, satellites {other._satellites}. "
+                             f"This heap: heap_type {self._heap_type}, satellites {self._satellites}.")
+
+        if other._size == 0:
+            return
+
+        if other._pool is self._pool:
+            other_root_index = other._root_index
+        else:
+            # Copy the nodes of other into this pool, renumbering their child and sibling links, and release them from the pool of other.
+            other_pool = other._pool
+            old_indices = other._get_node_indices()
+            new_indices = self._pool.allocate_block(len(old_indices))
+            renumbering = np.full(len(other_pool.key_array) + 1, -1, np.int64)
+            renumbering[old_indices] = new_indices
+            self._pool.key_array[new_indices] = other_pool.key_array[old_indices]
+            self._pool.child_array[new_indices] = renumbering[other_pool.child_array[old_indices]]
+            self._pool.sibling_array[new_indices] = renumbering[other_pool.sibling_array[old_indices]]
+            if self._pool.satellite_array is not None: self._pool.satellite_array[new_indices] = other_pool.satellite_array[old_indices]
+            other_pool.release(old_indices)
+            other_root_index = int(new_indices[0])
+
+        self._root_index = other_root_index if self._root_index == -1 else self._link(self._root_index, other_root_index)
+        self._size += other._size
+        other._root_index = -1
+        other._size = 0
@@ -0,0 +1,145 @@
+"""
+This file contains tests for the heaps in Heaps.py that need more than a few lines of setup, run with pytest.
+"""
+
+import json
+import threading
+import numpy as np
+import pytest
+
+import Heaps
+from Heaps import Concurrent_N_ary_heap, Infinite_N_ary_heap, Persistent_N_ary_heap
+
+
+def test_concurrent_heap_stress():
+    """Eight producers push distinct keys, with push and push_many, while one consumer pops. Every value must be popped exactly once, with its own satellite."""
+
+    n_producers = 8
+    pushes_per_producer = 5000
+    n_values = n_producers * pushes_per_producer
+    heap = Concurrent_N_ary_heap(n_values, satellites=True, buffer_size=64)
+    keys = np.random.default_rng(0).permutation(n_values).astype(float).reshape(n_producers, pushes_per_producer)
+    start = threading.Barrier(n_producers + 1)
+
+    def produce(producer_keys):
+        start.wait()
+        # Push the first half one at a time and the rest in batches.
+        half = len(producer_keys) // 2
+        for key in producer_keys[:half]:
+            heap.push(key, -key)
+        for batch in np.array_split(producer_keys[half:], 10):
+            heap.push_many(batch, list(-batch))
+
+    popped = []
+
+    def consume():
+        start.wait()
+        while len(popped) < n_values:
+            root = heap.pop(get_satellite=True)
+            if root is not None:
+                popped.append(root)
+
+    threads = [threading.Thread(target=produce, args=(producer_keys,)) for producer_keys in keys] + [threading.Thread(target=consume)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=120)
+        assert not thread.is_alive()
+
+    popped_keys = np.array([key for key, _ in popped])
+    assert np.array_equal(np.sort(popped_keys), np.arange(n_values))
+    assert all(satellite == -key for key, satellite in popped)
+    assert heap.is_empty()
+
+    counters = heap.get_counters()
+    assert counters['pushed'] == n_values
+    assert counters['popped'] == n_values
+    assert counters['discarded'] == 0
+    assert counters['buffered'] == 0
+
+
+def test_concurrent_heap_drops_finished_buffers():
+    """With many short-lived producers, the buffers of finished threads are dropped without losing their values or counts."""
+
+    n_threads = 200
+    heap = Concurrent_N_ary_heap(n_threads * 3, buffer_size=64)
+
+    for index in range(n_threads):
+        # Each thread leaves its values buffered when it finishes.
+        thread = threading.Thread(target=lambda index=index: [heap.push(float(3 * index + offset)) for offset in range(3)])
+        thread.start()
+        thread.join()
+        # Registration drops the buffers merged by the last flush, so only those pushed to since then remain.
+        assert len(heap._buffers) == index % 10 + 1
+        if index % 10 == 9:
+            heap.flush()
+
+    assert len(heap._buffers) <= 10
+    assert heap.get_counters()['pushed'] == 3 * n_threads
+    assert np.array_equal(heap.pop_many(3 * n_threads), np.arange(3 * n_threads))
+
+
+def test_concurrent_heap_rejects_bad_values_in_push():
+    """A key or satellite that does not fit the heap is rejected by the producer's push, without losing the values buffered around it."""
+
+    heap = Concurrent_N_ary_heap(8, satellite_dtype=np.int64)
+    heap.push(1.0, 10)
+    heap.push(2.0, 20)
+    with pytest.raises(ValueError):
+        heap.push('x', 30)
+    with pytest.raises(ValueError):
+        heap.push(3.0, 'y')
+    heap.push(3.0, 30)
+
+    assert [heap.pop(get_satellite=True) for _ in range(3)] == [(1.0, 10), (2.0, 20), (3.0, 30)]
+    assert heap.pop() is None
+    assert heap.get_counters()['pushed'] == 3
+
+def test_persistent_heap_reopens_at_checkpoint_after_crash(tmp_path):
+    """A heap that is not closed is reopened as it was at its last flush, whether it died between flushes or during one."""
+
+    path = str(tmp_path / 'heap.bin')
+    heap = Persistent_N_ary_heap(path, 8, satellite_dtype=np.int64)
+    for key in (3.0, 1.0, 2.0):
+        heap.push(key, 10 * int(key))
+    heap.flush()
+    heap.pop()
+    heap.push(5.0, 50)
+    heap.pop()
+    heap.pop()
+    # Simulate a crash by dropping the mapping without closing the file.
+    heap._unmap()
+
+    heap = Persistent_N_ary_heap.open(path)
+    assert [heap.pop(get_satellite=True) for _ in range(heap.get_size())] == [(1.0, 10), (2.0, 20), (3.0, 30)]
+    heap.push(4.0, 40)
+    heap.flush()
+    heap.push(6.0, 60)
+    # Simulate a crash during the next flush, after the working arrays were marked as the checkpoint.
+    heap._header['working_size'] = heap.get_size()
+    heap._header['copying'] = True
+    heap._checkpoint_key_array[:] = -1.0
+    heap._unmap()
+
+    heap = Persistent_N_ary_heap.open(path)
+    assert [heap.pop(get_satellite=True) for _ in range(heap.get_size())] == [(4.0, 40), (6.0, 60)]
+    heap.close()
+
+
+def test_infinite_heap_auto_n_ary_follows_profile(tmp_path, monkeypatch):
+    """With n_ary='auto', heapify keeps the branching factor it heapified with, and a new heap chooses for its expected size."""
+
+    # A profile preferring a binary heap at 16 values and an 8-ary heap at 10000.
+    profile = [{'dtype': 'float64', 'size': size, 'mix': 'push-pop', 'n_ary': n_ary, 'jit': False, 'us/op': 1.0 if n_ary == best_n_ary else 2.0}
+               for size, best_n_ary in ((16, 2), (10000, 8)) for n_ary in (2, 8)]
+    profile_path = tmp_path / 'n_ary_profile.json'
+    profile_path.write_text(json.dumps(profile))
+    monkeypatch.setattr(Heaps, 'N_ARY_PROFILE_PATH', str(profile_path))
+
+    keys = np.random.default_rng(0).permutation(10000).astype(float)
+    heap = Infinite_N_ary_heap.heapify(keys, n_ary='auto', satellites=False)
+    assert heap._n_ary == 8
+    assert np.array_equal(heap.pop_many(10000), np.arange(10000))
+
+    assert Infinite_N_ary_heap(n_ary='auto')._n_ary == 2
+    assert Infinite_N_ary_heap(n_ary='auto', expected_size=10000)._n_ary == 8